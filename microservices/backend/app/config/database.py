@@ -1,26 +1,193 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from app.config.secrets import cached_database_credentials, get_database_credentials, load_database_credentials
+from app.config.settings import settings
+from typing import Any, Dict
+import threading
+import time
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Use SQLite for demo purposes
-DATABASE_URL = "sqlite:///./carthub.db"
+DATABASE_URL = settings.DATABASE_URL
+
+
+class PoolMetrics:
+    """Counters for time spent waiting on a pooled connection."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def record(self, waited: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_time_total += waited
+            self.wait_time_max = max(self.wait_time_max, waited)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_time_avg_ms": round(self.wait_time_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "wait_time_max_ms": round(self.wait_time_max * 1000, 3),
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+class _InstrumentedPoolMixin:
+    """Times every connection checkout, including waits for a free slot."""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            conn = super().connect()
+        except exc.TimeoutError:
+            pool_metrics.record(time.perf_counter() - start, timed_out=True)
+            raise
+        pool_metrics.record(time.perf_counter() - start)
+        return conn
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def to_async_url(url: str) -> str:
+    """Map a sync database URL onto its asyncio driver (asyncpg / aiosqlite)."""
+    scheme, sep, rest = url.partition("://")
+    dialect = scheme.split("+", 1)[0]
+    if dialect in ("postgresql", "postgres"):
+        return f"postgresql+asyncpg{sep}{rest}"
+    if dialect == "sqlite":
+        return f"sqlite+aiosqlite{sep}{rest}"
+    return url
+
+
+def engine_options(url: str, is_async: bool = False) -> Dict[str, Any]:
+    """Build create_engine keyword arguments from the pool settings."""
+    if url.startswith("sqlite"):
+        # SQLite keeps SQLAlchemy's default pool; sizing does not apply
+        return {"connect_args": {"check_same_thread": False}}
+
+    timeout_ms = str(settings.DB_STATEMENT_TIMEOUT_MS)
+    if is_async:
+        connect_args = {"server_settings": {"statement_timeout": timeout_ms}}
+    else:
+        connect_args = {"options": f"-c statement_timeout={timeout_ms}"}
+
+    return {
+        "poolclass": InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "connect_args": connect_args,
+    }
+
 
 # Create database engine
 engine = create_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False},  # Needed for SQLite
-    echo=False  # Set to True for SQL debugging
+    echo=False,  # Set to True for SQL debugging
+    **engine_options(DATABASE_URL)
 )
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine used by the request handlers so queries don't block the event loop
+ASYNC_DATABASE_URL = to_async_url(DATABASE_URL)
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    echo=False,
+    **engine_options(ASYNC_DATABASE_URL, is_async=True)
+)
+
+
+def _inject_credentials(dialect, conn_rec, cargs, cparams):
+    """Supply the current (cached, rotation-aware) credentials for each new connection."""
+    credentials = get_database_credentials()
+    cparams["user"] = credentials.username
+    cparams["password"] = credentials.password
+
+
+def _inject_cached_credentials(dialect, conn_rec, cargs, cparams):
+    """Like ``_inject_credentials`` but only reads the cache: async connects run on the event loop."""
+    credentials = cached_database_credentials()
+    cparams["user"] = credentials.username
+    cparams["password"] = credentials.password
+
+
+USES_SECRET_CREDENTIALS = not DATABASE_URL.startswith("sqlite") and make_url(DATABASE_URL).password is None
+
+if USES_SECRET_CREDENTIALS:
+    event.listen(engine, "do_connect", _inject_credentials)
+    event.listen(async_engine.sync_engine, "do_connect", _inject_cached_credentials)
+
+
+async def init_database_credentials():
+    """Load database credentials off the event loop; await at startup before using ``async_engine``."""
+    if USES_SECRET_CREDENTIALS:
+        await load_database_credentials()
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False  # Objects stay usable after commit without lazy reloads
+)
+
 # Create Base class
 Base = declarative_base()
 
+
+def dialect_insert(db: AsyncSession):
+    """The session dialect's ``insert`` construct, which supports ON CONFLICT."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return pg_insert
+    if dialect == "sqlite":
+        return sqlite_insert
+    raise NotImplementedError(f"Upsert is not supported on {dialect}")
+
+
+def get_pool_metrics() -> Dict[str, Any]:
+    """Report live pool occupancy and checkout wait times for the async engine."""
+    pool = async_engine.pool
+    metrics: Dict[str, Any] = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        metrics.update({
+            "pool_size": pool.size(),
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+        })
+    metrics.update(pool_metrics.snapshot())
+    return metrics
+
+
 def get_db():
     """Dependency to get database session."""
     db = SessionLocal()
@@ -32,3 +199,14 @@ def get_db():
         raise
     finally:
         db.close()
+
+
+async def get_async_db():
+    """Dependency to get an async database session."""
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except Exception as e:
+            logger.error(f"Database session error: {e}")
+            await db.rollback()
+            raise
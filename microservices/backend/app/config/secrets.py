@@ -0,0 +1,200 @@
+from app.config.settings import settings
+from typing import Callable, NamedTuple, Optional
+import asyncio
+import json
+import os
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseCredentials(NamedTuple):
+    """Database username and password."""
+    username: str
+    password: str
+
+
+def _parse_secret(secret: dict) -> DatabaseCredentials:
+    return DatabaseCredentials(
+        username=secret.get("username", "cartadmin"),
+        password=secret.get("password", "")
+    )
+
+
+class EnvCredentialProvider:
+    """Read credentials from a JSON environment variable (for local development)."""
+
+    def __init__(self, variable: str = "DATABASE_CREDENTIALS"):
+        self.variable = variable
+
+    def fetch(self) -> DatabaseCredentials:
+        return _parse_secret(json.loads(os.environ[self.variable]))
+
+
+class FileCredentialProvider:
+    """Read credentials from a JSON file, e.g. a mounted Kubernetes secret."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def fetch(self) -> DatabaseCredentials:
+        with open(self.path) as f:
+            return _parse_secret(json.load(f))
+
+
+class SecretsManagerCredentialProvider:
+    """Read credentials from AWS Secrets Manager.
+
+    boto3 is imported and the client created on first fetch, so importing
+    the application does not pay for either.
+    """
+
+    def __init__(self, secret_id: str, region: str):
+        self.secret_id = secret_id
+        self.region = region
+        self._client = None
+
+    def fetch(self) -> DatabaseCredentials:
+        if self._client is None:
+            import boto3
+            self._client = boto3.Session().client("secretsmanager", region_name=self.region)
+        response = self._client.get_secret_value(SecretId=self.secret_id)
+        return _parse_secret(json.loads(response["SecretString"]))
+
+
+class CachedCredentials:
+    """Credentials resolved on first use and cached for ``ttl`` seconds.
+
+    If a refresh fails while a previous value is cached, the stale value
+    keeps being served so a slow or unavailable provider does not take the
+    service down. ``start_background_refresh`` re-reads the secret on a
+    timer so rotated passwords are picked up before the cache expires.
+    """
+
+    def __init__(self, provider, ttl: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        self._provider = provider
+        self._ttl = ttl
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._value: Optional[DatabaseCredentials] = None
+        self._expires_at = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def get(self) -> DatabaseCredentials:
+        """Return cached credentials, fetching them if missing or expired."""
+        value = self._value
+        if value is not None and self._clock() < self._expires_at:
+            return value
+        with self._lock:
+            if self._value is not None and self._clock() < self._expires_at:
+                return self._value
+            return self.refresh()
+
+    def refresh(self) -> DatabaseCredentials:
+        """Fetch credentials from the provider and reset the TTL."""
+        with self._lock:
+            try:
+                value = self._provider.fetch()
+            except Exception as e:
+                if self._value is None:
+                    raise
+                logger.warning(f"Credential refresh failed, serving cached value: {e}")
+                return self._value
+            self._value = value
+            self._expires_at = self._clock() + self._ttl
+            return value
+
+    def peek(self) -> Optional[DatabaseCredentials]:
+        """The cached credentials however old, or None if never fetched; never calls the provider."""
+        return self._value
+
+    def invalidate(self):
+        """Force the next ``get`` to fetch, e.g. after an authentication failure."""
+        with self._lock:
+            self._expires_at = 0.0
+
+    def start_background_refresh(self, interval: Optional[float] = None):
+        """Refresh every ``interval`` seconds (default half the TTL) in a daemon thread."""
+        if self._thread is not None:
+            return
+        interval = interval if interval is not None else self._ttl / 2
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.warning(f"Background credential refresh failed: {e}")
+
+        self._thread = threading.Thread(target=run, name="credential-refresh", daemon=True)
+        self._thread.start()
+
+    def stop_background_refresh(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def default_credential_provider():
+    """Pick the credential source: env JSON, then a mounted file, then Secrets Manager."""
+    if os.getenv("DATABASE_CREDENTIALS"):
+        return EnvCredentialProvider()
+    if settings.DATABASE_CREDENTIALS_FILE:
+        return FileCredentialProvider(settings.DATABASE_CREDENTIALS_FILE)
+    return SecretsManagerCredentialProvider(settings.DATABASE_SECRET_ARN, settings.AWS_REGION)
+
+
+_database_credentials: Optional[CachedCredentials] = None
+_init_lock = threading.Lock()
+_FALLBACK_CREDENTIALS = DatabaseCredentials(username="cartadmin", password="password")
+
+
+def get_database_credentials() -> DatabaseCredentials:
+    """Resolve database credentials lazily, with caching and background rotation."""
+    global _database_credentials
+
+    if _database_credentials is None:
+        with _init_lock:
+            if _database_credentials is None:
+                cache = CachedCredentials(
+                    default_credential_provider(),
+                    ttl=settings.DATABASE_CREDENTIALS_TTL
+                )
+                cache.start_background_refresh()
+                _database_credentials = cache
+
+    try:
+        return _database_credentials.get()
+    except Exception as e:
+        logger.warning(f"Could not load database credentials: {e}")
+        # Fallback to default values for local development
+        return _FALLBACK_CREDENTIALS
+
+
+async def load_database_credentials() -> DatabaseCredentials:
+    """Resolve database credentials in a worker thread, so the fetch never blocks the event loop.
+
+    Await this at startup, before the async engine opens its first
+    connection; from then on the background refresh keeps them current.
+    """
+    return await asyncio.to_thread(get_database_credentials)
+
+
+def cached_database_credentials() -> DatabaseCredentials:
+    """Credentials already loaded by ``load_database_credentials``; never fetches.
+
+    Safe to call on the event loop. Raises RuntimeError if they were never
+    loaded; falls back to the local defaults if loading failed.
+    """
+    if _database_credentials is None:
+        raise RuntimeError("Database credentials are not loaded; await load_database_credentials() at startup")
+    value = _database_credentials.peek()
+    if value is None:
+        logger.warning("No database credentials cached, using local defaults")
+        return _FALLBACK_CREDENTIALS
+    return value
@@ -1,8 +1,6 @@
 from pydantic_settings import BaseSettings
 from typing import List
 import os
-import json
-import boto3
 
 
 class Settings(BaseSettings):
@@ -10,12 +8,77 @@ class Settings(BaseSettings):
     
     # Database settings
     DATABASE_URL: str = ""
-    DATABASE_HOST: str = os.getenv("DATABASE_ENDPOINT", "localhost")
+    DATABASE_HOST: str = os.getenv("DATABASE_ENDPOINT", "")
     DATABASE_PORT: int = int(os.getenv("DATABASE_PORT", "5432"))
     DATABASE_NAME: str = os.getenv("DATABASE_NAME", "shoppingcart")
     DATABASE_USER: str = ""
     DATABASE_PASSWORD: str = ""
     
+    # Credential source when DATABASE_USER/DATABASE_PASSWORD are not set
+    # (see app.config.secrets); resolved lazily on first connection
+    DATABASE_SECRET_ARN: str = "shopping-cart-db-credentials"
+    DATABASE_CREDENTIALS_FILE: str = ""
+    DATABASE_CREDENTIALS_TTL: int = 300
+    
+    # Connection pool settings (per process; budget against RDS max_connections)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 5
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 5000
+    
+    # Cart read cache: shared Redis tier when REDIS_URL is set, plus an
+    # in-process tier. Invalidations only reach this process's local tier, so
+    # it is off by default (TTL 0); enable it only with a single replica
+    CART_CACHE_TTL: float = 0.0
+    CART_CACHE_MAX_ENTRIES: int = 10000
+    CART_CACHE_REDIS_TTL: int = 60
+    REDIS_URL: str = ""
+    
+    # Cart writes: retries on transient lock / serialization failures
+    CART_WRITE_RETRIES: int = 3
+    
+    # Idempotency-Key handling: how long responses are replayable, and how
+    # long an unfinished request holds its key before a retry may take over
+    IDEMPOTENCY_TTL: int = 86400
+    IDEMPOTENCY_LOCK_TIMEOUT: int = 60
+    
+    # Outbox worker (python -m app.workers.outbox_worker)
+    OUTBOX_BATCH_SIZE: int = 50
+    OUTBOX_CONCURRENCY: int = 10
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_BACKOFF_BASE: float = 1.0
+    OUTBOX_BACKOFF_MAX: float = 300.0
+    OUTBOX_LEASE_SECONDS: float = 60.0
+    OUTBOX_POLL_INTERVAL: float = 1.0
+    
+    # Inventory reservations: seconds checkout holds stock before the
+    # worker returns it, and how often the worker sweeps for expired holds
+    INVENTORY_RESERVATION_TTL: float = 900.0
+    INVENTORY_RELEASE_INTERVAL: float = 30.0
+    
+    # Product catalog: cart prices come from the products table. The price
+    # cache re-reads the catalog version at most every check interval; with
+    # CATALOG_REQUIRED, products missing from the catalog cannot be added.
+    # Checkout always needs every line in the catalog and active
+    CATALOG_CACHE_MAX_ENTRIES: int = 50000
+    CATALOG_VERSION_CHECK_INTERVAL: float = 1.0
+    CATALOG_REQUIRED: bool = False
+    
+    # Bulk cart reads for admin jobs (CartService.get_carts): carts per query
+    CART_BATCH_SIZE: int = 500
+    
+    # Product listing (GET /api/v1/products): in-process page cache and the
+    # max-age shared caches may serve a page for
+    PRODUCT_PAGE_CACHE_MAX_ENTRIES: int = 2000
+    PRODUCT_PAGE_CACHE_TTL: float = 300.0
+    PRODUCT_LIST_MAX_AGE: int = 30
+    
+    # Product search without Postgres: seconds between catalog version
+    # checks by the in-process inverted index
+    SEARCH_INDEX_CHECK_INTERVAL: float = 1.0
+    
     # CORS settings
     ALLOWED_ORIGINS: List[str] = ["*"]
     
@@ -24,44 +87,28 @@ class Settings(BaseSettings):
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self._load_database_credentials()
         self._build_database_url()
     
-    def _load_database_credentials(self):
-        """Load database credentials from AWS Secrets Manager."""
-        try:
-            # Try to get credentials from environment (for local development)
-            db_credentials = os.getenv("DATABASE_CREDENTIALS")
-            if db_credentials:
-                creds = json.loads(db_credentials)
-                self.DATABASE_USER = creds.get("username", "cartadmin")
-                self.DATABASE_PASSWORD = creds.get("password", "")
-                return
-            
-            # Try to get from AWS Secrets Manager (for production)
-            session = boto3.Session()
-            secrets_client = session.client('secretsmanager', region_name=self.AWS_REGION)
-            
-            # Get the secret ARN from environment or use default pattern
-            secret_name = os.getenv("DATABASE_SECRET_ARN", "shopping-cart-db-credentials")
-            
-            response = secrets_client.get_secret_value(SecretId=secret_name)
-            secret = json.loads(response['SecretString'])
-            
-            self.DATABASE_USER = secret.get("username", "cartadmin")
-            self.DATABASE_PASSWORD = secret.get("password", "")
-            
-        except Exception as e:
-            print(f"Warning: Could not load database credentials: {e}")
-            # Fallback to default values for local development
-            self.DATABASE_USER = "cartadmin"
-            self.DATABASE_PASSWORD = "password"
-    
     def _build_database_url(self):
-        """Build database URL from components."""
+        """Build database URL from components.
+        
+        An explicit DATABASE_URL wins. Without a database host the service
+        falls back to the local SQLite demo database. Unless a password is
+        configured, the URL carries no credentials; they are fetched on first
+        connect (see app.config.database) so nothing blocks at import time.
+        """
+        if self.DATABASE_URL:
+            return
+        if not self.DATABASE_HOST:
+            self.DATABASE_URL = "sqlite:///./carthub.db"
+            return
+        
+        userinfo = ""
+        if self.DATABASE_PASSWORD:
+            userinfo = f"{self.DATABASE_USER or 'cartadmin'}:{self.DATABASE_PASSWORD}@"
         self.DATABASE_URL = (
-            f"postgresql://{self.DATABASE_USER}:{self.DATABASE_PASSWORD}"
-            f"@{self.DATABASE_HOST}:{self.DATABASE_PORT}/{self.DATABASE_NAME}"
+            f"postgresql://{userinfo}"
+            f"{self.DATABASE_HOST}:{self.DATABASE_PORT}/{self.DATABASE_NAME}"
         )
     
     class Config:
@@ -1,19 +1,32 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from app.config.database import init_database_credentials
+from app.services.cart_store import CartFullError, CartStore, InvalidItemError
+from app.utils.json_response import FastJSONResponse
 import logging
+import os
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The async engine's connect hook only reads cached credentials
+    await init_database_credentials()
+    yield
+
 # Create FastAPI app
 app = FastAPI(
     title="Shopping Cart API",
     description="Microservice for shopping cart operations",
     version="2.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -25,8 +38,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Simple in-memory cart storage for demo
-cart_storage = {}
+# Sharded in-memory cart storage for demo
+cart_store = CartStore(
+    num_shards=int(os.getenv("CART_STORE_SHARDS", "16")),
+    max_carts=int(os.getenv("CART_STORE_MAX_CARTS", "10000")),
+    max_lines_per_cart=int(os.getenv("CART_STORE_MAX_LINES", "200"))
+)
 
 # Health check endpoint
 @app.get("/health")
@@ -36,31 +53,30 @@ async def health_check():
 # Cart endpoints
 @app.get("/api/v1/cart/{user_id}")
 async def get_cart(user_id: str):
-    cart = cart_storage.get(user_id, {"items": [], "total": 0})
-    return {"success": True, "data": cart}
+    return {"success": True, "data": cart_store.get_cart(user_id)}
 
 @app.post("/api/v1/cart/{user_id}/items")
 async def add_to_cart(user_id: str, item: dict):
-    if user_id not in cart_storage:
-        cart_storage[user_id] = {"items": [], "total": 0}
-    
-    cart_storage[user_id]["items"].append(item)
-    cart_storage[user_id]["total"] += item.get("price", 0)
-    
-    return {"success": True, "data": cart_storage[user_id]}
+    try:
+        return {"success": True, "data": cart_store.add_item(user_id, item)}
+    except (CartFullError, InvalidItemError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.delete("/api/v1/cart/{user_id}/items/{item_id}")
 async def remove_from_cart(user_id: str, item_id: str):
-    if user_id in cart_storage:
-        cart_storage[user_id]["items"] = [
-            item for item in cart_storage[user_id]["items"] 
-            if item.get("id") != item_id
-        ]
-        cart_storage[user_id]["total"] = sum(
-            item.get("price", 0) for item in cart_storage[user_id]["items"]
-        )
-    
-    return {"success": True, "data": cart_storage.get(user_id, {"items": [], "total": 0})}
+    return {"success": True, "data": cart_store.remove_item(user_id, item_id)}
+
+@app.put("/api/v1/cart/{user_id}/items/{item_id}")
+async def update_cart_item(user_id: str, item_id: str, quantity: int):
+    try:
+        return {"success": True, "data": cart_store.update_quantity(user_id, item_id, quantity)}
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+# Cart store metrics
+@app.get("/api/v1/cart-store/stats")
+async def cart_store_stats():
+    return {"success": True, "data": cart_store.stats()}
 
 # Global exception handler
 @app.exception_handler(Exception)
@@ -1,8 +1,8 @@
-from sqlalchemy import Column, String, Integer, Numeric, DateTime, ForeignKey
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.config.database import Base
-from decimal import Decimal
+from app.models.money import Money, MoneyType
 from typing import List
 
 
@@ -11,11 +11,19 @@ class Cart(Base):
     __tablename__ = "carts"
     
     customer_id = Column(String, primary_key=True, index=True)
+    # Incremented by every mutation; compared-and-swapped for If-Match writes
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
-    # Relationship to cart items
-    items = relationship("CartItem", back_populates="cart", cascade="all, delete-orphan")
+    # Relationship to cart items; must be eager-loaded (see CartService.CART_LOAD_OPTIONS)
+    items = relationship(
+        "CartItem",
+        back_populates="cart",
+        cascade="all, delete-orphan",
+        order_by="CartItem.id",
+        lazy="raise"
+    )
     
     @property
     def total_items(self) -> int:
@@ -23,20 +31,24 @@ class Cart(Base):
         return sum(item.quantity for item in self.items)
     
     @property
-    def subtotal(self) -> Decimal:
+    def subtotal(self) -> Money:
         """Calculate cart subtotal."""
-        return sum(item.subtotal for item in self.items)
+        return Money(sum(item.price.cents * item.quantity for item in self.items))
 
 
 class CartItem(Base):
     """Cart item model for database."""
     __tablename__ = "cart_items"
+    __table_args__ = (
+        # One line per product per cart; target of the add-item upsert
+        UniqueConstraint("customer_id", "product_id", name="uq_cart_items_customer_product"),
+    )
     
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     customer_id = Column(String, ForeignKey("carts.customer_id"), nullable=False)
     product_id = Column(String, nullable=False, index=True)
     product_name = Column(String, nullable=False)
-    price = Column(Numeric(10, 2), nullable=False)
+    price = Column(MoneyType, nullable=False)
     quantity = Column(Integer, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -45,6 +57,6 @@ class CartItem(Base):
     cart = relationship("Cart", back_populates="items")
     
     @property
-    def subtotal(self) -> Decimal:
+    def subtotal(self) -> Money:
         """Calculate item subtotal."""
-        return Decimal(str(self.price)) * self.quantity
+        return Money(self.price.cents * self.quantity)
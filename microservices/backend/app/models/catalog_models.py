@@ -0,0 +1,43 @@
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, Text, Index
+from sqlalchemy.sql import func
+from app.config.database import Base
+from app.models.money import MoneyType
+
+
+class Product(Base):
+    """A catalog product; the server-side source of names and prices.
+
+    ``version`` is the catalog version at which the row last changed, so a
+    price cache can fetch only the products changed since it last synced.
+    """
+    __tablename__ = "products"
+    __table_args__ = (
+        # Keyset pagination for each listing sort, with and without a category filter
+        Index("ix_products_name_id", "name", "id"),
+        Index("ix_products_price_id", "price", "id"),
+        Index("ix_products_category_name_id", "category", "name", "id"),
+        Index("ix_products_category_price_id", "category", "price", "id"),
+    )
+    
+    id = Column(String, primary_key=True)
+    name = Column(String, nullable=False)
+    description = Column(Text, nullable=True)
+    category = Column(String, nullable=True)
+    price = Column(MoneyType, nullable=False)
+    image_url = Column(String, nullable=True)
+    active = Column(Boolean, nullable=False, default=True, server_default="1")
+    version = Column(Integer, nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class CatalogVersion(Base):
+    """Single-row counter bumped by every catalog write.
+
+    Writers increment it in the same transaction as their product changes,
+    so the row lock orders them and each change gets a unique version.
+    """
+    __tablename__ = "catalog_version"
+    
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0, server_default="0")
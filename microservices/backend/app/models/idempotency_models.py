@@ -0,0 +1,20 @@
+from sqlalchemy import Column, String, Integer, Float, LargeBinary, JSON
+from app.config.database import Base
+
+
+class IdempotencyKey(Base):
+    """A client Idempotency-Key and the response it produced.
+
+    ``status_code`` is NULL while the first request is still running.
+    ``expires_at`` is a Unix timestamp so expiry checks are plain numeric
+    comparisons on every backend.
+    """
+    __tablename__ = "idempotency_keys"
+    
+    scope = Column(String, primary_key=True)  # which endpoint the key was used on
+    key = Column(String, primary_key=True)
+    request_hash = Column(String, nullable=False)
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(LargeBinary, nullable=True)
+    response_headers = Column(JSON, nullable=True)
+    expires_at = Column(Float, nullable=False, index=True)
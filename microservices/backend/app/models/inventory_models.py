@@ -0,0 +1,41 @@
+from sqlalchemy import CheckConstraint, Column, String, Integer, Float, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.config.database import Base
+
+
+class Inventory(Base):
+    """Stock on hand per product.
+
+    Products without a row are not stock-tracked and are never refused at
+    checkout. ``available`` excludes quantities held by reservations.
+    """
+    __tablename__ = "inventory"
+    __table_args__ = (
+        CheckConstraint("available >= 0", name="ck_inventory_available_non_negative"),
+    )
+    
+    product_id = Column(String, primary_key=True)
+    available = Column(Integer, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class InventoryReservation(Base):
+    """Stock taken from ``inventory`` for one order line.
+
+    ``held`` reservations are returned to stock once ``expires_at`` (Unix
+    time) passes (status ``expired``), ``committed`` ones are sold, and
+    ``released`` ones were handed back because the order failed.
+    """
+    __tablename__ = "inventory_reservations"
+    __table_args__ = (
+        # Expiry sweep: held reservations past their deadline
+        Index("ix_inventory_reservations_status_expires_at", "status", "expires_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, index=True)
+    product_id = Column(String, nullable=False)
+    quantity = Column(Integer, nullable=False)
+    status = Column(String, nullable=False, default="held", server_default="held")
+    expires_at = Column(Float, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
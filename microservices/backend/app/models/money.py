@@ -0,0 +1,127 @@
+from decimal import Decimal, InvalidOperation
+from functools import total_ordering
+from typing import Any
+from pydantic_core import core_schema
+from sqlalchemy import BigInteger
+from sqlalchemy.types import TypeDecorator
+
+
+@total_ordering
+class Money:
+    """An exact amount of money held as integer cents.
+
+    Arithmetic between amounts (and multiplying by a quantity) is plain int
+    arithmetic on ``cents``. ``str()`` gives the fixed-point form used on
+    the wire, e.g. ``"59.98"``, and amounts compare equal to the Decimal
+    of the same value, so ``Money(5998) == Decimal("59.98")``.
+    """
+
+    __slots__ = ("cents",)
+
+    def __init__(self, cents: int = 0):
+        self.cents = cents
+
+    @classmethod
+    def parse(cls, amount: Any) -> "Money":
+        """Money from a dollar amount (Decimal, str, int or float); refuses fractions of a cent."""
+        if isinstance(amount, Money):
+            return amount
+        if isinstance(amount, bool):
+            raise ValueError(f"{amount!r} is not an amount of money")
+        if isinstance(amount, int):
+            return cls(amount * 100)
+        try:
+            cents = Decimal(str(amount)).scaleb(2)
+        except (InvalidOperation, TypeError):
+            raise ValueError(f"{amount!r} is not an amount of money") from None
+        if not cents.is_finite() or cents != cents.to_integral_value():
+            raise ValueError(f"{amount} is not a whole number of cents")
+        return cls(int(cents))
+
+    def to_decimal(self) -> Decimal:
+        return Decimal(self.cents).scaleb(-2)
+
+    def __str__(self) -> str:
+        whole, cents = divmod(abs(self.cents), 100)
+        return f"{'-' if self.cents < 0 else ''}{whole}.{cents:02d}"
+
+    def __repr__(self) -> str:
+        return f"Money('{self}')"
+
+    def __hash__(self) -> int:
+        return hash(self.to_decimal())
+
+    def __bool__(self) -> bool:
+        return self.cents != 0
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, Money):
+            return self.cents == other.cents
+        if isinstance(other, (Decimal, int)):
+            return self.to_decimal() == other
+        return NotImplemented
+
+    def __lt__(self, other: Any) -> bool:
+        if isinstance(other, Money):
+            return self.cents < other.cents
+        if isinstance(other, (Decimal, int)):
+            return self.to_decimal() < other
+        return NotImplemented
+
+    def __add__(self, other: Any) -> "Money":
+        if isinstance(other, Money):
+            return Money(self.cents + other.cents)
+        if other == 0 and isinstance(other, int):
+            return self  # lets sum() start from 0
+        return NotImplemented
+
+    __radd__ = __add__
+
+    def __sub__(self, other: Any) -> "Money":
+        if isinstance(other, Money):
+            return Money(self.cents - other.cents)
+        return NotImplemented
+
+    def __mul__(self, quantity: Any) -> "Money":
+        if isinstance(quantity, int) and not isinstance(quantity, bool):
+            return Money(self.cents * quantity)
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    def __neg__(self) -> "Money":
+        return Money(-self.cents)
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source: Any, handler: Any) -> core_schema.CoreSchema:
+        # Accepts the same inputs as a Decimal field; serializes to "59.98" in JSON
+        return core_schema.no_info_plain_validator_function(
+            cls.parse,
+            serialization=core_schema.plain_serializer_function_ser_schema(str, when_used="json")
+        )
+
+    @classmethod
+    def __get_pydantic_json_schema__(cls, schema: core_schema.CoreSchema, handler: Any) -> dict:
+        return {"anyOf": [{"type": "number"}, {"type": "string"}]}
+
+
+class MoneyType(TypeDecorator):
+    """Column type storing :class:`Money` as a BIGINT number of cents.
+
+    Bound values may be Money or any dollar amount ``Money.parse``
+    accepts, so filters like ``Product.price >= Decimal("10")`` compare
+    in cents.
+    """
+
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value: Any, dialect) -> Any:
+        if value is None:
+            return None
+        return Money.parse(value).cents
+
+    def process_result_value(self, value: Any, dialect) -> Any:
+        if value is None:
+            return None
+        return Money(value)
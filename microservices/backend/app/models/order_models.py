@@ -0,0 +1,42 @@
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.config.database import Base
+from app.models.money import MoneyType
+
+
+class Order(Base):
+    """Order model for database; a snapshot of a cart taken at checkout."""
+    __tablename__ = "orders"
+    
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    customer_id = Column(String, nullable=False, index=True)
+    total_amount = Column(MoneyType, nullable=False)
+    status = Column(String, nullable=False, default="pending", server_default="pending", index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    # Lines are written in bulk at checkout; load them explicitly when needed
+    items = relationship(
+        "OrderItem",
+        back_populates="order",
+        cascade="all, delete-orphan",
+        order_by="OrderItem.id",
+        lazy="raise"
+    )
+
+
+class OrderItem(Base):
+    """Order line model for database."""
+    __tablename__ = "order_items"
+    
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, index=True)
+    product_id = Column(String, nullable=False)
+    product_name = Column(String, nullable=False)
+    price = Column(MoneyType, nullable=False)
+    quantity = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Relationship to order
+    order = relationship("Order", back_populates="items")
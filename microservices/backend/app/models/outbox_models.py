@@ -0,0 +1,29 @@
+from sqlalchemy import Column, String, Integer, Float, Text, DateTime, JSON, Index
+from sqlalchemy.sql import func
+from app.config.database import Base
+
+
+class OutboxEvent(Base):
+    """An event written in the same transaction as the change it describes.
+
+    The outbox worker delivers pending events to their handlers after
+    commit, retrying failures with backoff until ``max_attempts`` when the
+    event is parked as ``failed``. ``available_at`` (Unix time) is when the
+    event may next be picked up; claiming a batch pushes it forward by the
+    lease so other workers skip it.
+    """
+    __tablename__ = "outbox_events"
+    __table_args__ = (
+        # Worker poll: pending events that are due, oldest first
+        Index("ix_outbox_events_status_available_at", "status", "available_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    event_type = Column(String, nullable=False)
+    aggregate_id = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(String, nullable=False, default="pending", server_default="pending")
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    available_at = Column(Float, nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
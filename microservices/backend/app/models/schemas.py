@@ -1,20 +1,25 @@
 from pydantic import BaseModel, Field, validator
-from decimal import Decimal
-from typing import List, Optional
+from typing import Any, Dict, List, Literal, Optional
 from datetime import datetime
+from app.models.money import Money
 
 
 class CartItemRequest(BaseModel):
-    """Request model for adding items to cart."""
+    """Request model for adding items to cart.
+    
+    ``product_name`` and ``price`` are ignored for catalog products, which
+    are always priced server-side; they are only needed for products the
+    catalog does not know.
+    """
     customer_id: str = Field(..., min_length=1, max_length=100)
     product_id: str = Field(..., min_length=1, max_length=100)
-    product_name: str = Field(..., min_length=1, max_length=200)
-    price: Decimal = Field(..., gt=0, decimal_places=2)
+    product_name: Optional[str] = Field(None, min_length=1, max_length=200)
+    price: Optional[Money] = None
     quantity: int = Field(..., gt=0)
     
     @validator('price')
     def validate_price(cls, v):
-        if v <= 0:
+        if v is not None and v <= 0:
             raise ValueError('Price must be greater than 0')
         return v
     
@@ -29,9 +34,9 @@ class CartItemResponse(BaseModel):
     """Response model for cart items."""
     product_id: str
     product_name: str
-    price: Decimal
+    price: Money
     quantity: int
-    subtotal: Decimal
+    subtotal: Money
     
     class Config:
         from_attributes = True
@@ -41,8 +46,9 @@ class CartResponse(BaseModel):
     """Response model for cart."""
     customer_id: str
     total_items: int
-    subtotal: Decimal
+    subtotal: Money
     items: List[CartItemResponse]
+    version: int = 0  # bumped by every mutation; 0 means no cart row yet
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
     
@@ -58,6 +64,37 @@ class CartOperationResponse(BaseModel):
     error: Optional[str] = None
 
 
+MAX_BULK_LINES = 500
+
+
+class BulkCartItemsRequest(BaseModel):
+    """Request model for adding or updating many cart lines at once.
+
+    Each entry in ``items`` is validated on its own as a ``CartItemRequest``
+    (``customer_id`` is taken from the batch), so a bad line is reported
+    back instead of rejecting the whole request.
+    """
+    customer_id: str = Field(..., min_length=1, max_length=100)
+    items: List[Dict[str, Any]] = Field(..., min_length=1, max_length=MAX_BULK_LINES)
+    mode: Literal["add", "set"] = "add"  # add to existing quantities, or replace them
+
+
+class BulkLineError(BaseModel):
+    """A batch line that was not applied."""
+    index: int
+    product_id: Optional[str] = None
+    error: str
+
+
+class BulkCartOperationResponse(BaseModel):
+    """Response model for batch cart operations."""
+    success: bool
+    message: str
+    cart: Optional[CartResponse] = None
+    applied: int = 0
+    failed: List[BulkLineError] = []
+
+
 class CheckoutRequest(BaseModel):
     """Request model for checkout."""
     customer_id: str = Field(..., min_length=1, max_length=100)
@@ -69,11 +106,30 @@ class CheckoutResponse(BaseModel):
     """Response model for checkout."""
     success: bool
     order_id: Optional[str] = None
-    total_amount: Optional[Decimal] = None
+    total_amount: Optional[Money] = None
     message: str
     error: Optional[str] = None
 
 
+class ProductResponse(BaseModel):
+    """A catalog product as listed to shoppers."""
+    id: str
+    name: str
+    description: Optional[str] = None
+    category: Optional[str] = None
+    price: Money
+    image_url: Optional[str] = None
+    
+    class Config:
+        from_attributes = True
+
+
+class ProductListResponse(BaseModel):
+    """One page of products; pass ``next_cursor`` back as ``cursor`` for the next page."""
+    items: List[ProductResponse]
+    next_cursor: Optional[str] = None
+
+
 class HealthResponse(BaseModel):
     """Response model for health check."""
     status: str
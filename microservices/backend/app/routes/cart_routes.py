@@ -1,65 +1,278 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.config.database import get_db
-from app.services.cart_service import CartService
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config.database import get_async_db
+from app.services.cart_cache import cart_etag
+from app.services.cart_service import CartService, CartVersionConflict
+from app.services.inventory_service import InsufficientStock
+from app.services.idempotency import (
+    IdempotencyKeyInProgress,
+    IdempotencyKeyMismatch,
+    IdempotencyStore,
+    StoredResponse,
+    request_fingerprint
+)
+from app.utils.json_response import FastJSONResponse, dumps
+from app.models.order_models import Order
 from app.models.schemas import (
+    BulkCartItemsRequest,
+    BulkCartOperationResponse,
+    BulkLineError,
     CartItemRequest, 
     CartOperationResponse, 
+    CartResponse,
     CheckoutRequest, 
     CheckoutResponse
 )
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
 import logging
-import uuid
 
 logger = logging.getLogger(__name__)
-router = APIRouter()
+router = APIRouter(default_response_class=FastJSONResponse)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def expected_version(if_match: Optional[str]) -> Optional[int]:
+    """Read the cart version a client expects from its If-Match header.
+
+    Returns None when there is no precondition (header absent or ``*``).
+    The catalog part of a GET ETag (``"3.17"``) does not matter to a write,
+    so only the cart version is read. A tag that is not a cart version can
+    never match, so it is a 412.
+    """
+    if not if_match or if_match.strip() == "*":
+        return None
+    version, _, catalog_version = if_match.strip().removeprefix("W/").strip('"').partition(".")
+    try:
+        if catalog_version and not catalog_version.isdigit():
+            raise ValueError(catalog_version)
+        return int(version)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="If-Match does not name a cart version"
+        )
+
+
+def version_conflict(e: CartVersionConflict) -> HTTPException:
+    logger.info(f"Version conflict: {e}")
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="Cart was modified; fetch it again and retry"
+    )
+
+
+async def idempotent(
+    db: AsyncSession,
+    scope: str,
+    idempotency_key: Optional[str],
+    fingerprint: str,
+    handle: Callable[[Optional[Callable[[Any], Awaitable[None]]]], Awaitable[Any]],
+    render: Callable[[Any], Response]
+) -> Response:
+    """Run ``handle`` at most once per Idempotency-Key and ``render`` its result.
+    
+    ``handle`` gets a ``before_commit`` hook to pass to ``CartService``, so
+    the rendered response is stored in the same transaction as the
+    mutation: once the change is committed, so is its replay. Retries with
+    the same key get the first response back (marked with
+    ``Idempotent-Replayed: true``) without re-running the mutation. Client
+    errors are stored and replayed too; server errors release the key so
+    the request can be retried, unless the mutation already committed.
+    """
+    if not idempotency_key:
+        return render(await handle(None))
+    
+    store = IdempotencyStore(db)
+    try:
+        stored = await store.reserve(scope, idempotency_key, fingerprint)
+    except IdempotencyKeyMismatch as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except IdempotencyKeyInProgress as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    
+    if stored is not None:
+        return Response(
+            content=stored.body,
+            status_code=stored.status_code,
+            media_type="application/json",
+            headers={**stored.headers, "Idempotent-Replayed": "true"}
+        )
+    
+    staged: Optional[Response] = None
+    
+    async def stage(result: Any):
+        nonlocal staged
+        staged = render(result)
+        await store.stage(scope, idempotency_key, stored_response(staged))
+    
+    try:
+        result = await handle(stage)
+    except HTTPException as e:
+        if e.status_code >= 500:
+            await release_key(store, scope, idempotency_key)
+        else:
+            await record_response(store, scope, idempotency_key, StoredResponse(e.status_code, dumps({"detail": e.detail}), {}))
+        raise
+    except Exception:
+        await release_key(store, scope, idempotency_key)
+        raise
+    
+    if staged is not None:
+        return staged
+    # Nothing was written (e.g. a batch with no valid lines), so record it on its own
+    response = render(result)
+    await record_response(store, scope, idempotency_key, stored_response(response))
+    return response
+
+
+def stored_response(response: Response) -> StoredResponse:
+    headers = {"ETag": response.headers["etag"]} if "etag" in response.headers else {}
+    return StoredResponse(response.status_code, bytes(response.body), headers)
+
+
+async def record_response(store: IdempotencyStore, scope: str, key: str, response: StoredResponse):
+    # The request is done; failing to record its response must not fail it
+    try:
+        await store.complete(scope, key, response)
+    except Exception as e:
+        logger.error(f"Could not store response for Idempotency-Key {key}: {e}")
+
+
+async def release_key(store: IdempotencyStore, scope: str, key: str):
+    try:
+        await store.release(scope, key)
+    except Exception as e:
+        logger.error(f"Could not release Idempotency-Key {key}: {e}")
 
 
 @router.post("/items", response_model=CartOperationResponse)
 async def add_item_to_cart(
     request: CartItemRequest,
-    db: Session = Depends(get_db)
+    if_match: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Add item to shopping cart."""
-    try:
-        cart_service = CartService(db)
-        cart = cart_service.add_item_to_cart(request)
-        
-        return CartOperationResponse(
+    """Add item to shopping cart. Honors Idempotency-Key."""
+    version = expected_version(if_match)
+    
+    def render(cart: CartResponse) -> Response:
+        return FastJSONResponse(CartOperationResponse(
             success=True,
             message="Item added to cart successfully",
             cart=cart
-        )
+        ), headers={"ETag": cart_etag(cart.version)})
+    
+    async def handle(before_commit) -> CartResponse:
+        try:
+            cart_service = CartService(db, before_commit=before_commit)
+            return await cart_service.add_item_to_cart(request, version)
+            
+        except CartVersionConflict as e:
+            raise version_conflict(e)
+        except ValueError as e:
+            logger.warning(f"Validation error: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        except Exception as e:
+            logger.error(f"Error adding item to cart: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to add item to cart"
+            )
+
+    return await idempotent(
+        db, "add_item", idempotency_key,
+        request_fingerprint(request.model_dump_json(), str(version)),
+        handle, render
+    )
+
+
+@router.post("/items/batch", response_model=BulkCartOperationResponse)
+async def add_items_to_cart(
+    request: BulkCartItemsRequest,
+    if_match: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Add or update many cart lines in one transaction.
+    
+    Invalid lines are skipped and listed in ``failed``; the rest are
+    applied. Responds 400 if no line is valid. Honors Idempotency-Key.
+    """
+    version = expected_version(if_match)
+    
+    def render(result: Tuple[CartResponse, List[BulkLineError]]) -> Response:
+        cart, failed = result
+        applied = len(request.items) - len(failed)
         
-    except ValueError as e:
-        logger.warning(f"Validation error: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=str(e)
-        )
-    except Exception as e:
-        logger.error(f"Error adding item to cart: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to add item to cart"
-        )
+        if not applied:
+            return FastJSONResponse(BulkCartOperationResponse(
+                success=False,
+                message="No valid items in batch",
+                cart=cart,
+                failed=failed
+            ), status_code=status.HTTP_400_BAD_REQUEST)
+        
+        return FastJSONResponse(BulkCartOperationResponse(
+            success=not failed,
+            message=f"Applied {applied} of {len(request.items)} items",
+            cart=cart,
+            applied=applied,
+            failed=failed
+        ), headers={"ETag": cart_etag(cart.version)})
+    
+    async def handle(before_commit) -> Tuple[CartResponse, List[BulkLineError]]:
+        try:
+            cart_service = CartService(db, before_commit=before_commit)
+            return await cart_service.add_items_to_cart(request, version)
+            
+        except CartVersionConflict as e:
+            raise version_conflict(e)
+        except Exception as e:
+            logger.error(f"Error applying items to cart: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to add items to cart"
+            )
+
+    return await idempotent(
+        db, "add_items", idempotency_key,
+        request_fingerprint(request.model_dump_json(), str(version)),
+        handle, render
+    )
 
 
 @router.get("/{customer_id}", response_model=CartOperationResponse)
 async def get_cart(
     customer_id: str,
-    db: Session = Depends(get_db)
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get customer's cart."""
+    """Get customer's cart.
+    
+    Serves the cached response bytes directly and answers 304 when the
+    client's If-None-Match already holds the current ETag.
+    """
     try:
         cart_service = CartService(db)
-        cart = cart_service.get_cart(customer_id)
+        snapshot = await cart_service.get_cart_snapshot(customer_id)
+        headers = {"ETag": snapshot.etag, "Cache-Control": "private, no-cache"}
         
-        return CartOperationResponse(
-            success=True,
-            message="Cart retrieved successfully",
-            cart=cart
-        )
+        if etag_matches(if_none_match, snapshot.etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        
+        return Response(content=snapshot.body, media_type="application/json", headers=headers)
         
     except Exception as e:
         logger.error(f"Error getting cart: {e}")
@@ -74,22 +287,26 @@ async def update_item_quantity(
     customer_id: str,
     product_id: str,
     quantity: int,
-    db: Session = Depends(get_db)
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update item quantity in cart."""
+    version = expected_version(if_match)
     try:
         if quantity < 0:
             raise ValueError("Quantity cannot be negative")
         
         cart_service = CartService(db)
-        cart = cart_service.update_item_quantity(customer_id, product_id, quantity)
+        cart = await cart_service.update_item_quantity(customer_id, product_id, quantity, version)
         
-        return CartOperationResponse(
+        return FastJSONResponse(CartOperationResponse(
             success=True,
             message="Item quantity updated successfully",
             cart=cart
-        )
+        ), headers={"ETag": cart_etag(cart.version)})
         
+    except CartVersionConflict as e:
+        raise version_conflict(e)
     except ValueError as e:
         logger.warning(f"Validation error: {e}")
         raise HTTPException(
@@ -108,19 +325,23 @@ async def update_item_quantity(
 async def remove_item_from_cart(
     customer_id: str,
     product_id: str,
-    db: Session = Depends(get_db)
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Remove item from cart."""
+    version = expected_version(if_match)
     try:
         cart_service = CartService(db)
-        cart = cart_service.remove_item_from_cart(customer_id, product_id)
+        cart = await cart_service.remove_item_from_cart(customer_id, product_id, version)
         
-        return CartOperationResponse(
+        return FastJSONResponse(CartOperationResponse(
             success=True,
             message="Item removed from cart successfully",
             cart=cart
-        )
+        ), headers={"ETag": cart_etag(cart.version)})
         
+    except CartVersionConflict as e:
+        raise version_conflict(e)
     except Exception as e:
         logger.error(f"Error removing item from cart: {e}")
         raise HTTPException(
@@ -132,24 +353,28 @@ async def remove_item_from_cart(
 @router.delete("/{customer_id}")
 async def clear_cart(
     customer_id: str,
-    db: Session = Depends(get_db)
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Clear all items from cart."""
+    version = expected_version(if_match)
     try:
         cart_service = CartService(db)
-        success = cart_service.clear_cart(customer_id)
+        success = await cart_service.clear_cart(customer_id, version)
         
         if success:
-            return CartOperationResponse(
+            return FastJSONResponse(CartOperationResponse(
                 success=True,
                 message="Cart cleared successfully"
-            )
+            ))
         else:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to clear cart"
             )
         
+    except CartVersionConflict as e:
+        raise version_conflict(e)
     except Exception as e:
         logger.error(f"Error clearing cart: {e}")
         raise HTTPException(
@@ -161,45 +386,62 @@ async def clear_cart(
 @router.post("/checkout", response_model=CheckoutResponse)
 async def checkout(
     request: CheckoutRequest,
-    db: Session = Depends(get_db)
+    if_match: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Process cart checkout."""
-    try:
-        cart_service = CartService(db)
-        cart = cart_service.get_cart(request.customer_id)
-        
-        if not cart.items:
-            raise ValueError("Cannot checkout empty cart")
-        
-        # Generate order ID
-        order_id = str(uuid.uuid4())
-        
-        # In a real implementation, you would:
-        # 1. Process payment
-        # 2. Create order record
-        # 3. Update inventory
-        # 4. Send confirmation email
-        # 5. Clear cart
-        
-        # For now, just clear the cart
-        cart_service.clear_cart(request.customer_id)
-        
-        return CheckoutResponse(
+    """Process cart checkout.
+    
+    Persists the order and its lines and empties the cart in one
+    transaction; payment and the confirmation email run afterwards from
+    the outbox worker. Checking out an empty (or already checked out)
+    cart is a 400; asking for more of a product than is in stock is a 409
+    and leaves the cart untouched. Honors Idempotency-Key, so a retried
+    checkout returns the same order instead of a 400.
+    """
+    version = expected_version(if_match)
+    
+    def render(order: Order) -> Response:
+        return FastJSONResponse(CheckoutResponse(
             success=True,
-            order_id=order_id,
-            total_amount=cart.subtotal,
+            order_id=str(order.id),
+            total_amount=order.total_amount,
             message="Checkout completed successfully"
-        )
-        
-    except ValueError as e:
-        logger.warning(f"Checkout validation error: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=str(e)
-        )
-    except Exception as e:
-        logger.error(f"Error during checkout: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Checkout failed"
-        )
+        ))
+    
+    async def handle(before_commit) -> Order:
+        try:
+            cart_service = CartService(db, before_commit=before_commit)
+            return await cart_service.checkout(
+                request.customer_id,
+                version,
+                payment_method=request.payment_method,
+                shipping_address=request.shipping_address
+            )
+            
+        except CartVersionConflict as e:
+            raise version_conflict(e)
+        except InsufficientStock as e:
+            logger.info(f"Checkout refused: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=str(e)
+            )
+        except ValueError as e:
+            logger.warning(f"Checkout validation error: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        except Exception as e:
+            logger.error(f"Error during checkout: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Checkout failed"
+            )
+
+    return await idempotent(
+        db, "checkout", idempotency_key,
+        request_fingerprint(request.model_dump_json(), str(version)),
+        handle, render
+    )
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from app.config.database import get_db
+from app.config.database import get_async_db, get_pool_metrics
 from app.models.schemas import HealthResponse
+from app.services.cart_cache import cart_cache
 from datetime import datetime
 import logging
 
@@ -11,11 +12,11 @@ router = APIRouter()
 
 
 @router.get("/", response_model=HealthResponse)
-async def health_check(db: Session = Depends(get_db)):
+async def health_check(db: AsyncSession = Depends(get_async_db)):
     """Health check endpoint."""
     try:
         # Test database connection
-        db.execute(text("SELECT 1"))
+        await db.execute(text("SELECT 1"))
         db_status = "healthy"
         
     except Exception as e:
@@ -31,11 +32,11 @@ async def health_check(db: Session = Depends(get_db)):
 
 
 @router.get("/ready")
-async def readiness_check(db: Session = Depends(get_db)):
+async def readiness_check(db: AsyncSession = Depends(get_async_db)):
     """Readiness check for Kubernetes."""
     try:
         # Test database connection
-        db.execute(text("SELECT 1"))
+        await db.execute(text("SELECT 1"))
         return {"status": "ready"}
         
     except Exception as e:
@@ -47,3 +48,15 @@ async def readiness_check(db: Session = Depends(get_db)):
 async def liveness_check():
     """Liveness check for Kubernetes."""
     return {"status": "alive"}
+
+
+@router.get("/pool")
+async def pool_metrics():
+    """Database connection pool metrics."""
+    return get_pool_metrics()
+
+
+@router.get("/cache")
+async def cache_metrics():
+    """Cart cache hit/miss counters."""
+    return cart_cache.stats()
@@ -0,0 +1,86 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config.database import get_async_db
+from app.config.settings import settings
+from app.models.schemas import ProductListResponse, ProductResponse
+from app.routes.cart_routes import etag_matches
+from app.services.catalog_service import CatalogService
+from app.services.search_service import SearchService
+from app.utils.json_response import FastJSONResponse
+from decimal import Decimal
+from typing import Literal, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter(default_response_class=FastJSONResponse)
+
+
+def page_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": f"public, max-age={settings.PRODUCT_LIST_MAX_AGE}"}
+
+
+@router.get("", response_model=ProductListResponse)
+async def list_products(
+    category: Optional[str] = Query(None, min_length=1, max_length=100),
+    min_price: Optional[Decimal] = Query(None, ge=0),
+    max_price: Optional[Decimal] = Query(None, ge=0),
+    sort: Literal["name", "price_asc", "price_desc"] = "name",
+    limit: int = Query(24, ge=1, le=100),
+    cursor: Optional[str] = Query(None, max_length=1000),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """List active products, one keyset-paginated page at a time.
+    
+    Follow ``next_cursor`` for the next page; it is only valid with the
+    same sort. Pages are served as cached bytes with an ETag and a short
+    public max-age, and answer 304 to a matching If-None-Match.
+    """
+    query = dict(
+        category=category,
+        min_price=min_price,
+        max_price=max_price,
+        sort=sort,
+        limit=limit,
+        cursor=cursor
+    )
+    catalog = CatalogService(db)
+    try:
+        if if_none_match is not None:
+            etag = await catalog.page_etag(**query)
+            if etag_matches(if_none_match, etag):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=page_headers(etag))
+        page = await catalog.product_page(**query)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error listing products: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to list products"
+        )
+    
+    return Response(content=page.body, media_type="application/json", headers=page_headers(page.etag))
+
+
+@router.get("/search", response_model=ProductListResponse)
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Full-text product search, most relevant first.
+    
+    Uses Postgres full-text search when available and the in-process
+    inverted index otherwise; the last word also matches as a prefix.
+    """
+    try:
+        rows = await SearchService(db).search(q, limit)
+    except Exception as e:
+        logger.error(f"Error searching products: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to search products"
+        )
+    
+    return FastJSONResponse(ProductListResponse(items=[ProductResponse.model_validate(row) for row in rows]))
@@ -0,0 +1,258 @@
+from collections import OrderedDict
+from app.config.settings import settings
+from app.models.schemas import CartOperationResponse, CartResponse
+from app.utils.json_response import dumps
+from typing import Any, Dict, Optional, Tuple
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def cart_etag(version: int, catalog_version: Optional[int] = None) -> str:
+    """ETag for a cart version; sent back in If-None-Match / If-Match.
+
+    A body priced from the catalog also names the catalog version it was
+    priced at (``"3.17"``), so a price change is a new ETag too.
+    """
+    if catalog_version is None:
+        return f'"{version}"'
+    return f'"{version}.{catalog_version}"'
+
+
+class CachedCart:
+    """A cart snapshot kept as the exact response bytes served by GET.
+
+    The ETag is the cart's ``version``, which every mutation bumps, and
+    ``catalog_version``, the catalog version the lines were priced at, so it
+    can be checked for If-None-Match and If-Match without re-serializing.
+    A snapshot from an older catalog is rebuilt rather than served.
+    """
+
+    __slots__ = ("body", "etag", "catalog_version", "_cart")
+
+    def __init__(self, body: bytes, etag: str, cart: Optional[CartResponse] = None, catalog_version: int = 0):
+        self.body = body
+        self.etag = etag
+        self.catalog_version = catalog_version
+        self._cart = cart
+
+    @classmethod
+    def from_cart(cls, cart: CartResponse, catalog_version: int = 0) -> "CachedCart":
+        envelope = CartOperationResponse(
+            success=True,
+            message="Cart retrieved successfully",
+            cart=cart
+        )
+        return cls(dumps(envelope), cart_etag(cart.version, catalog_version), cart, catalog_version)
+
+    @property
+    def version(self) -> int:
+        """The cart version, read from the ETag."""
+        return int(self.etag.strip('"').partition(".")[0])
+
+    @property
+    def cart(self) -> CartResponse:
+        """The cart model, parsed from the body only if it was not kept."""
+        if self._cart is None:
+            self._cart = CartOperationResponse.model_validate_json(self.body).cart
+        return self._cart
+
+
+class LocalCartCache:
+    """In-process cache tier with a TTL and LRU eviction.
+
+    A ``ttl`` of 0 or less turns the tier off: nothing is stored.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 5.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisCartCache:
+    """Shared cache tier over any asyncio Redis-protocol client.
+
+    The client only needs ``get``, ``set(name, value, ex=...)`` and
+    ``delete`` coroutines, e.g. ``redis.asyncio.Redis``. Errors are logged
+    and treated as misses so an unavailable Redis never fails a request.
+    Values are stored as ``<etag>\n<catalog_version>\n<body>``.
+    """
+
+    def __init__(self, client, ttl: int = 60, prefix: str = "cart:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[CachedCart]:
+        try:
+            raw = await self.client.get(self.prefix + key)
+        except Exception as e:
+            logger.warning(f"Redis cache get failed: {e}")
+            return None
+        if raw is None:
+            return None
+        etag, _, rest = raw.partition(b"\n")
+        catalog_version, _, body = rest.partition(b"\n")
+        if not catalog_version.isdigit():
+            return None
+        return CachedCart(body, etag.decode(), catalog_version=int(catalog_version))
+
+    async def set(self, key: str, value: CachedCart):
+        raw = b"%s\n%d\n%s" % (value.etag.encode(), value.catalog_version, value.body)
+        try:
+            await self.client.set(self.prefix + key, raw, ex=self.ttl)
+        except Exception as e:
+            logger.warning(f"Redis cache set failed: {e}")
+
+    async def delete(self, key: str):
+        try:
+            await self.client.delete(self.prefix + key)
+        except Exception as e:
+            logger.warning(f"Redis cache delete failed: {e}")
+
+
+class CartCache:
+    """Read-through cart cache: in-process tier first, then optional Redis tier.
+
+    A reader fills the cache with what it read from the database, which can
+    race a writer that commits and invalidates in between. Readers take a
+    ``fill_token()`` before reading and pass it to ``set``; the fill is
+    dropped if the cart was invalidated since, or if a newer cart version is
+    already cached. Invalidations are numbered in sequence and the latest
+    one per cart is remembered (up to the local tier's size; the sequence
+    of the last one forgotten stands in for older carts). This covers
+    writers in this process; a fill racing a writer in another process is
+    bounded by the Redis TTL.
+    """
+
+    def __init__(self, local: LocalCartCache, remote: Optional[RedisCartCache] = None):
+        self.local = local
+        self.remote = remote
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._invalidated: "OrderedDict[str, int]" = OrderedDict()
+        self._forgotten = 0
+        self.hits = 0
+        self.misses = 0
+        self.remote_hits = 0
+        self.invalidations = 0
+        self.stale_fills = 0
+
+    async def get(self, customer_id: str) -> Optional[CachedCart]:
+        cart = self.local.get(customer_id)
+        if cart is None and self.remote is not None:
+            cart = await self.remote.get(customer_id)
+            if cart is not None:
+                self.local.set(customer_id, cart)
+                with self._lock:
+                    self.remote_hits += 1
+
+        with self._lock:
+            if cart is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return cart
+
+    def fill_token(self) -> int:
+        """Mark taken before reading a cart from the database; pass it to ``set``."""
+        with self._lock:
+            return self._sequence
+
+    async def set(self, customer_id: str, cart: CachedCart, token: Optional[int] = None):
+        """Cache a snapshot; with a ``token``, only if nothing newer happened since it was taken."""
+        with self._lock:
+            if token is not None and not self._fill_is_current(customer_id, cart, token):
+                self.stale_fills += 1
+                return
+            self.local.set(customer_id, cart)
+        if self.remote is not None:
+            await self.remote.set(customer_id, cart)
+            if token is not None and self._invalidated_since(customer_id, token):
+                # A writer invalidated while the Redis write was in flight
+                await self.remote.delete(customer_id)
+
+    async def invalidate(self, customer_id: str):
+        with self._lock:
+            self._sequence += 1
+            self._invalidated[customer_id] = self._sequence
+            self._invalidated.move_to_end(customer_id)
+            while len(self._invalidated) > self.local.max_entries:
+                _, self._forgotten = self._invalidated.popitem(last=False)
+            self.local.delete(customer_id)
+            self.invalidations += 1
+        if self.remote is not None:
+            await self.remote.delete(customer_id)
+
+    def _invalidated_since(self, customer_id: str, token: int) -> bool:
+        return self._invalidated.get(customer_id, self._forgotten) > token
+
+    def _fill_is_current(self, customer_id: str, cart: CachedCart, token: int) -> bool:
+        if self._invalidated_since(customer_id, token):
+            return False
+        cached = self.local.get(customer_id)
+        return cached is None or cached.version <= cart.version
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "remote_hits": self.remote_hits,
+                "invalidations": self.invalidations,
+                "stale_fills": self.stale_fills,
+                "local_entries": len(self.local),
+                "remote_enabled": self.remote is not None,
+            }
+
+
+def _build_cart_cache() -> CartCache:
+    remote = None
+    if settings.REDIS_URL:
+        import redis.asyncio
+        remote = RedisCartCache(redis.asyncio.from_url(settings.REDIS_URL), ttl=settings.CART_CACHE_REDIS_TTL)
+    return CartCache(
+        LocalCartCache(max_entries=settings.CART_CACHE_MAX_ENTRIES, ttl=settings.CART_CACHE_TTL),
+        remote
+    )
+
+
+cart_cache = _build_cart_cache()
@@ -1,174 +1,664 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import Integer, String, delete, func, insert, literal, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from app.config.database import dialect_insert
+from app.config.settings import settings
 from app.models.cart_models import Cart, CartItem
-from app.models.schemas import CartItemRequest, CartResponse, CartItemResponse
-from decimal import Decimal
+from app.models.order_models import Order, OrderItem
+from app.models.outbox_models import OutboxEvent
+from app.models.schemas import (
+    BulkCartItemsRequest,
+    BulkLineError,
+    CartItemRequest,
+    CartItemResponse,
+    CartResponse
+)
+from app.models.money import Money
+from app.services.cart_cache import CachedCart, CartCache, cart_cache
+from app.services.catalog_service import CatalogService, ProductPrice
+from app.services.inventory_service import ReservationService
+from pydantic import ValidationError
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+import asyncio
 import logging
+import random
+import time
 
 logger = logging.getLogger(__name__)
 
+# Eager-load options applied to every cart query
+CART_LOAD_OPTIONS = (joinedload(Cart.items),)
+
+# Postgres serialization failure and deadlock; safe to retry the whole transaction
+RETRYABLE_SQLSTATES = {"40001", "40P01"}
+
+
+class CartVersionConflict(Exception):
+    """Raised when a write's expected cart version (If-Match) is not the stored one."""
+
+    def __init__(self, customer_id: str, expected_version: int):
+        super().__init__(f"Cart {customer_id} is no longer at version {expected_version}")
+        self.customer_id = customer_id
+        self.expected_version = expected_version
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether a failed cart transaction can simply be run again."""
+    if not isinstance(error, DBAPIError):
+        return False
+    if getattr(error.orig, "pgcode", None) in RETRYABLE_SQLSTATES:
+        return True
+    return "database is locked" in str(error.orig)
+
 
 class CartService:
-    """Service class for cart operations."""
-    
-    def __init__(self, db: Session):
+    """Service class for cart operations.
+
+    Every mutation bumps ``carts.version`` in the same transaction, taking
+    the cart row lock first so concurrent writers to one cart are
+    serialized. When the caller passes ``expected_version`` (from If-Match)
+    the bump is a compare-and-swap and ``CartVersionConflict`` is raised if
+    the cart has moved on.
+
+    Names and prices come from the product catalog: client-sent values are
+    only shown for products the catalog does not know (and refused when
+    ``CATALOG_REQUIRED`` is set), withdrawn products are refused, and lines
+    are repriced from the catalog whenever a cart is read. Checkout charges
+    catalog prices only.
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        cache: Optional[CartCache] = None,
+        catalog: Optional[CatalogService] = None,
+        before_commit: Optional[Callable[[Any], Awaitable[None]]] = None
+    ):
         self.db = db
-    
-    def add_item_to_cart(self, request: CartItemRequest) -> CartResponse:
-        """Add item to cart or update quantity if item exists."""
-        try:
-            # Get or create cart
-            cart = self.db.query(Cart).filter(Cart.customer_id == request.customer_id).first()
-            if not cart:
-                cart = Cart(customer_id=request.customer_id)
-                self.db.add(cart)
-                self.db.flush()  # Flush to get the cart in the session
-            
-            # Check if item already exists in cart
-            existing_item = self.db.query(CartItem).filter(
-                CartItem.customer_id == request.customer_id,
-                CartItem.product_id == request.product_id
-            ).first()
-            
-            if existing_item:
-                # Update existing item quantity
-                existing_item.quantity += request.quantity
-                existing_item.price = request.price  # Update price in case it changed
-                existing_item.product_name = request.product_name  # Update name in case it changed
-                logger.info(f"Updated item {request.product_id} quantity to {existing_item.quantity}")
+        self.cache = cache if cache is not None else cart_cache
+        self.catalog = catalog if catalog is not None else CatalogService(db)
+        self.before_commit = before_commit
+
+    async def add_item_to_cart(self, request: CartItemRequest, expected_version: Optional[int] = None) -> CartResponse:
+        """Add item to cart or update quantity if item exists.
+
+        The line is written with INSERT ... ON CONFLICT DO UPDATE, adding to
+        the stored quantity in SQL. On Postgres the cart row is created (or
+        its version bumped) in the same statement; SQLite cannot nest an
+        INSERT in a CTE, so it upserts the cart first within the same
+        transaction. The updated cart is read back in one query before commit.
+        """
+        request = self._apply_catalog_price(request, await self.catalog.get_prices([request.product_id]))
+        response = None
+
+        async def apply() -> bool:
+            nonlocal response
+            if expected_version is None and self._dialect() == "postgresql":
+                await self.db.execute(self._pg_add_item_statement(request))
             else:
-                # Add new item to cart
-                new_item = CartItem(
+                await self._claim_version(request.customer_id, expected_version)
+                await self.db.execute(self._item_upsert(self._insert()(CartItem).values(
                     customer_id=request.customer_id,
                     product_id=request.product_id,
                     product_name=request.product_name,
                     price=request.price,
                     quantity=request.quantity
-                )
-                self.db.add(new_item)
-                logger.info(f"Added new item {request.product_id} to cart")
-            
-            self.db.commit()
-            
-            # Refresh cart to get updated items
-            self.db.refresh(cart)
-            
-            return self._cart_to_response(cart)
-            
+                )))
+            response = await self._priced_response(await self._get_cart(request.customer_id))
+            await self._stage_result(response)
+            return True
+
+        try:
+            await self._write(request.customer_id, apply)
+            logger.info(f"Added {request.quantity} x {request.product_id} to cart {request.customer_id}")
+            return response
+
         except Exception as e:
-            self.db.rollback()
             logger.error(f"Error adding item to cart: {e}")
             raise
-    
-    def get_cart(self, customer_id: str) -> CartResponse:
+
+    async def add_items_to_cart(
+        self,
+        request: BulkCartItemsRequest,
+        expected_version: Optional[int] = None
+    ) -> Tuple[CartResponse, List[BulkLineError]]:
+        """Apply many lines to one cart in a single transaction.
+
+        Lines are validated first and invalid ones are returned as failures.
+        Valid lines are merged per product and written with one multi-row
+        upsert; in ``"set"`` mode the given quantity replaces the stored one
+        instead of being added to it. Returns the cart snapshot and the
+        failed lines.
+        """
+        lines, failed = self.validate_lines(request)
+        lines, unpriced = self._apply_catalog_prices(
+            lines, await self.catalog.get_prices(line.product_id for line in lines)
+        )
+        if unpriced:
+            index = {
+                raw["product_id"]: i for i, raw in enumerate(request.items)
+                if isinstance(raw.get("product_id"), str)
+            }
+            failed = sorted(failed + [
+                BulkLineError(index=index[line.product_id], product_id=line.product_id, error=error)
+                for line, error in unpriced
+            ], key=lambda error: error.index)
+        if not lines:
+            cart = await self._get_cart(request.customer_id)
+            return await self._priced_response(cart) if cart else self._empty_cart(request.customer_id), failed
+
+        result = None
+
+        async def apply() -> bool:
+            nonlocal result
+            await self._claim_version(request.customer_id, expected_version)
+            await self.db.execute(self._item_upsert(
+                self._insert()(CartItem).values([
+                    {
+                        "customer_id": request.customer_id,
+                        "product_id": line.product_id,
+                        "product_name": line.product_name,
+                        "price": line.price,
+                        "quantity": line.quantity
+                    }
+                    for line in lines
+                ]),
+                merge_quantity=request.mode == "add"
+            ))
+            result = await self._priced_response(await self._get_cart(request.customer_id)), failed
+            await self._stage_result(result)
+            return True
+
+        try:
+            await self._write(request.customer_id, apply)
+            logger.info(f"Applied {len(lines)} lines to cart {request.customer_id} ({len(failed)} rejected)")
+            return result
+
+        except Exception as e:
+            logger.error(f"Error applying batch to cart: {e}")
+            raise
+
+    @staticmethod
+    def validate_lines(request: BulkCartItemsRequest) -> Tuple[List[CartItemRequest], List[BulkLineError]]:
+        """Validate batch lines in one pass, merging repeated products.
+
+        A multi-row upsert may not touch the same row twice, so lines for
+        the same product are combined: quantities are summed in ``"add"``
+        mode and the last line wins in ``"set"`` mode.
+        """
+        merged: Dict[str, CartItemRequest] = {}
+        failed: List[BulkLineError] = []
+        for index, raw in enumerate(request.items):
+            product_id = raw.get("product_id")
+            if raw.get("customer_id", request.customer_id) != request.customer_id:
+                failed.append(BulkLineError(index=index, product_id=product_id, error="customer_id does not match the batch"))
+                continue
+            try:
+                line = CartItemRequest.model_validate({**raw, "customer_id": request.customer_id})
+            except ValidationError as e:
+                error = "; ".join(
+                    f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()
+                )
+                failed.append(BulkLineError(index=index, product_id=product_id if isinstance(product_id, str) else None, error=error))
+                continue
+
+            previous = merged.get(line.product_id)
+            if previous is not None and request.mode == "add":
+                line = line.model_copy(update={"quantity": previous.quantity + line.quantity})
+            merged[line.product_id] = line
+        return list(merged.values()), failed
+
+    async def get_cart(self, customer_id: str) -> CartResponse:
         """Get cart for customer."""
+        return (await self.get_cart_snapshot(customer_id)).cart
+
+    async def get_carts(self, customer_ids: Iterable[str], batch_size: Optional[int] = None) -> Dict[str, CartResponse]:
+        """Get many carts at once, e.g. for abandoned-cart sweeps or repricing.
+
+        Carts are loaded ``batch_size`` at a time (``CART_BATCH_SIZE`` by
+        default) with their items joined, and every line is priced from
+        one catalog lookup. Customers without a cart are left out. The
+        cart cache is neither read nor filled.
+        """
+        customer_ids = list(dict.fromkeys(customer_ids))
+        batch_size = batch_size or settings.CART_BATCH_SIZE
+        carts: List[Cart] = []
+        for start in range(0, len(customer_ids), batch_size):
+            result = await self.db.execute(
+                select(Cart)
+                .options(*CART_LOAD_OPTIONS)
+                .where(Cart.customer_id.in_(customer_ids[start:start + batch_size]))
+                .execution_options(populate_existing=True)
+            )
+            carts.extend(result.unique().scalars())
+
+        prices = await self.catalog.get_prices({item.product_id for cart in carts for item in cart.items})
+        return {cart.customer_id: self._cart_to_response(cart, prices) for cart in carts}
+
+    async def get_cart_snapshot(self, customer_id: str) -> CachedCart:
+        """Get the cart with its serialized response and ETag, served from the cache when possible.
+
+        A cached snapshot priced at an older catalog version is rebuilt. The
+        rebuilt snapshot is only cached if no write invalidated the cart
+        while it was being read.
+        """
         try:
-            cart = self.db.query(Cart).filter(Cart.customer_id == customer_id).first()
+            token = self.cache.fill_token()
+            catalog_version = await self.catalog.version()
+            cached = await self.cache.get(customer_id)
+            if cached is not None and cached.catalog_version == catalog_version:
+                return cached
+
+            cart = await self._get_cart(customer_id)
             if not cart:
                 # Return empty cart
-                return CartResponse(
-                    customer_id=customer_id,
-                    total_items=0,
-                    subtotal=Decimal('0.00'),
-                    items=[]
-                )
-            
-            return self._cart_to_response(cart)
-            
+                response = self._empty_cart(customer_id)
+            else:
+                response = await self._priced_response(cart)
+
+            snapshot = CachedCart.from_cart(response, catalog_version)
+            await self.cache.set(customer_id, snapshot, token)
+            return snapshot
+
         except Exception as e:
             logger.error(f"Error getting cart: {e}")
             raise
-    
-    def update_item_quantity(self, customer_id: str, product_id: str, quantity: int) -> CartResponse:
+
+    async def update_item_quantity(
+        self,
+        customer_id: str,
+        product_id: str,
+        quantity: int,
+        expected_version: Optional[int] = None
+    ) -> CartResponse:
         """Update item quantity in cart."""
-        try:
-            if quantity <= 0:
-                return self.remove_item_from_cart(customer_id, product_id)
-            
-            item = self.db.query(CartItem).filter(
-                CartItem.customer_id == customer_id,
-                CartItem.product_id == product_id
-            ).first()
-            
-            if not item:
+        if quantity <= 0:
+            return await self.remove_item_from_cart(customer_id, product_id, expected_version)
+
+        async def apply() -> bool:
+            await self._claim_version(customer_id, expected_version)
+            result = await self.db.execute(
+                update(CartItem)
+                .where(
+                    CartItem.customer_id == customer_id,
+                    CartItem.product_id == product_id
+                )
+                .values(quantity=quantity, updated_at=func.now())
+            )
+            if not result.rowcount:
                 raise ValueError(f"Item {product_id} not found in cart")
-            
-            item.quantity = quantity
-            self.db.commit()
-            
+            return True
+
+        try:
+            await self._write(customer_id, apply)
+
             # Get updated cart
-            cart = self.db.query(Cart).filter(Cart.customer_id == customer_id).first()
-            return self._cart_to_response(cart)
-            
+            cart = await self._get_cart(customer_id)
+            return await self._priced_response(cart)
+
         except Exception as e:
-            self.db.rollback()
             logger.error(f"Error updating item quantity: {e}")
             raise
-    
-    def remove_item_from_cart(self, customer_id: str, product_id: str) -> CartResponse:
+
+    async def remove_item_from_cart(
+        self,
+        customer_id: str,
+        product_id: str,
+        expected_version: Optional[int] = None
+    ) -> CartResponse:
         """Remove item from cart."""
+        async def apply() -> bool:
+            await self._claim_version(customer_id, expected_version)
+            result = await self.db.execute(
+                delete(CartItem).where(
+                    CartItem.customer_id == customer_id,
+                    CartItem.product_id == product_id
+                )
+            )
+            return bool(result.rowcount)
+
         try:
-            item = self.db.query(CartItem).filter(
-                CartItem.customer_id == customer_id,
-                CartItem.product_id == product_id
-            ).first()
-            
-            if item:
-                self.db.delete(item)
-                self.db.commit()
+            if await self._write(customer_id, apply):
                 logger.info(f"Removed item {product_id} from cart")
-            
+
             # Get updated cart
-            cart = self.db.query(Cart).filter(Cart.customer_id == customer_id).first()
+            cart = await self._get_cart(customer_id)
             if cart:
-                return self._cart_to_response(cart)
+                return await self._priced_response(cart)
             else:
-                return CartResponse(
-                    customer_id=customer_id,
-                    total_items=0,
-                    subtotal=Decimal('0.00'),
-                    items=[]
-                )
-            
+                return self._empty_cart(customer_id)
+
         except Exception as e:
-            self.db.rollback()
             logger.error(f"Error removing item from cart: {e}")
             raise
-    
-    def clear_cart(self, customer_id: str) -> bool:
-        """Clear all items from cart."""
+
+    async def clear_cart(self, customer_id: str, expected_version: Optional[int] = None) -> bool:
+        """Clear all items from cart.
+
+        The cart row is kept so its version keeps counting up; a deleted
+        row would restart at 1 and could reuse an ETag a client holds.
+        """
+        async def apply() -> bool:
+            await self._claim_version(customer_id, expected_version)
+            result = await self.db.execute(delete(CartItem).where(CartItem.customer_id == customer_id))
+            return bool(result.rowcount)
+
         try:
-            # Delete all cart items
-            self.db.query(CartItem).filter(CartItem.customer_id == customer_id).delete()
-            
-            # Delete cart
-            self.db.query(Cart).filter(Cart.customer_id == customer_id).delete()
-            
-            self.db.commit()
+            await self._write(customer_id, apply)
             logger.info(f"Cleared cart for customer {customer_id}")
             return True
-            
+
         except Exception as e:
-            self.db.rollback()
             logger.error(f"Error clearing cart: {e}")
             raise
-    
-    def _cart_to_response(self, cart: Cart) -> CartResponse:
-        """Convert cart model to response."""
+
+    async def checkout(
+        self,
+        customer_id: str,
+        expected_version: Optional[int] = None,
+        payment_method: Optional[str] = None,
+        shipping_address: Optional[Dict[str, Any]] = None
+    ) -> Order:
+        """Turn the cart into an order in one transaction.
+
+        Lines are repriced from the catalog, stock is reserved and an
+        ``order.created`` outbox event is queued; the locked cart is then
+        emptied, so a double submit cannot create two orders.
+        """
+        order = None
+
+        async def apply() -> bool:
+            nonlocal order
+            result = await self.db.execute(self._locked_cart_query(customer_id))
+            cart = result.unique().scalar_one_or_none()
+            if cart is None or not cart.items:
+                raise ValueError("Cannot checkout empty cart")
+
+            prices = await self.catalog.get_prices((item.product_id for item in cart.items), fresh=True)
+            unavailable = [
+                item.product_id for item in cart.items
+                if item.product_id not in prices or not prices[item.product_id].active
+            ]
+            if unavailable:
+                # Only catalog prices are ever charged, never the ones stored from the client
+                raise ValueError(f"Products not available for checkout: {', '.join(unavailable)}")
+            snapshot = self._cart_to_response(cart, prices)
+            await self._claim_version(customer_id, expected_version if expected_version is not None else cart.version)
+
+            order = Order(customer_id=customer_id, total_amount=snapshot.subtotal, status="pending")
+            self.db.add(order)
+            await self.db.flush()
+
+            await self.db.execute(insert(OrderItem).values([
+                {
+                    "order_id": order.id,
+                    "product_id": item.product_id,
+                    "product_name": item.product_name,
+                    "price": item.price,
+                    "quantity": item.quantity
+                }
+                for item in snapshot.items
+            ]))
+            await ReservationService(self.db).reserve(
+                order.id, {item.product_id: item.quantity for item in snapshot.items}
+            )
+            await self.db.execute(insert(OutboxEvent).values(
+                event_type="order.created",
+                aggregate_id=str(order.id),
+                payload={
+                    "order_id": order.id,
+                    "customer_id": customer_id,
+                    "total_amount": str(snapshot.subtotal),
+                    "payment_method": payment_method,
+                    "shipping_address": shipping_address or {},
+                    "items": [
+                        {"product_id": item.product_id, "quantity": item.quantity}
+                        for item in snapshot.items
+                    ]
+                },
+                available_at=time.time()
+            ))
+            await self.db.execute(delete(CartItem).where(CartItem.customer_id == customer_id))
+            await self._stage_result(order)
+            return True
+
+        try:
+            await self._write(customer_id, apply, retry_conflicts=expected_version is None)
+            logger.info(f"Created order {order.id} for customer {customer_id}")
+            return order
+
+        except Exception as e:
+            logger.error(f"Error during checkout: {e}")
+            raise
+
+    async def _stage_result(self, result: Any):
+        """Hand a write's result to ``before_commit`` so whatever it records commits with the write."""
+        if self.before_commit is not None:
+            await self.before_commit(result)
+
+    async def _write(
+        self,
+        customer_id: str,
+        apply: Callable[[], Awaitable[bool]],
+        retry_conflicts: bool = False
+    ) -> bool:
+        """Run ``apply`` in a transaction, retrying transient lock failures.
+
+        ``apply`` returns whether it changed anything; if not, the
+        transaction is rolled back and the cache left alone. Version
+        conflicts are only retried with ``retry_conflicts``, i.e. when the
+        expected version was read inside ``apply`` rather than supplied by
+        the caller; a stale If-Match cannot succeed on retry.
+        """
+        attempts = settings.CART_WRITE_RETRIES + 1
+        for attempt in range(attempts):
+            try:
+                changed = await apply()
+                if not changed:
+                    await self.db.rollback()
+                    return False
+                await self.db.commit()
+                await self.cache.invalidate(customer_id)
+                return True
+            except CartVersionConflict:
+                await self.db.rollback()
+                if retry_conflicts and attempt + 1 < attempts:
+                    continue
+                raise
+            except Exception as e:
+                await self.db.rollback()
+                if attempt + 1 < attempts and is_retryable(e):
+                    logger.warning(f"Retrying cart write for {customer_id} after: {e}")
+                    await asyncio.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+                    continue
+                raise
+
+    async def _claim_version(self, customer_id: str, expected_version: Optional[int]):
+        """Lock the cart row and bump its version before touching its lines.
+
+        Without ``expected_version`` the cart is created or bumped
+        unconditionally. Otherwise the bump is a compare-and-swap; version 0
+        means the cart must not exist yet.
+        """
+        if expected_version is None:
+            await self.db.execute(self._cart_upsert(self._insert(), customer_id))
+            return
+
+        if expected_version == 0:
+            stmt = self._insert()(Cart).values(customer_id=customer_id).on_conflict_do_nothing(
+                index_elements=[Cart.customer_id]
+            )
+        else:
+            stmt = (
+                update(Cart)
+                .where(Cart.customer_id == customer_id, Cart.version == expected_version)
+                .values(version=Cart.version + 1, updated_at=func.now())
+            )
+        result = await self.db.execute(stmt)
+        if result.rowcount != 1:
+            raise CartVersionConflict(customer_id, expected_version)
+
+    def _dialect(self) -> str:
+        return self.db.get_bind().dialect.name
+
+    def _insert(self):
+        """The dialect's ``insert`` construct, which supports ON CONFLICT."""
+        return dialect_insert(self.db)
+
+    @staticmethod
+    def _cart_upsert(insert, customer_id: str):
+        """Create the cart row at version 1, or bump the version if it already exists."""
+        stmt = insert(Cart).values(customer_id=customer_id)
+        return stmt.on_conflict_do_update(
+            index_elements=[Cart.customer_id],
+            set_={"version": Cart.version + 1, "updated_at": func.now()}
+        )
+
+    @staticmethod
+    def _item_upsert(stmt, merge_quantity: bool = True):
+        """Merge an INSERT into ``cart_items`` with any existing line for the product.
+
+        With ``merge_quantity`` the inserted quantity is added to the stored
+        one; otherwise it replaces it.
+        """
+        return stmt.on_conflict_do_update(
+            index_elements=[CartItem.customer_id, CartItem.product_id],
+            set_={
+                "quantity": CartItem.quantity + stmt.excluded.quantity if merge_quantity else stmt.excluded.quantity,
+                "price": stmt.excluded.price,  # Update price in case it changed
+                "product_name": stmt.excluded.product_name,  # Update name in case it changed
+                "updated_at": func.now()
+            }
+        )
+
+    def _pg_add_item_statement(self, request: CartItemRequest):
+        """Build the single Postgres statement that upserts both the cart and the line.
+
+        The cart upsert runs as a data-modifying CTE and the line is inserted
+        from its RETURNING row, so the foreign key is satisfied in the same
+        statement.
+        """
+        cart_cte = (
+            self._cart_upsert(pg_insert, request.customer_id)
+            .returning(Cart.customer_id)
+            .cte("upserted_cart")
+        )
+        line = select(
+            cart_cte.c.customer_id,
+            literal(request.product_id, String),
+            literal(request.product_name, String),
+            literal(request.price, CartItem.price.type),
+            literal(request.quantity, Integer)
+        )
+        stmt = pg_insert(CartItem).from_select(
+            ["customer_id", "product_id", "product_name", "price", "quantity"],
+            line
+        )
+        return self._item_upsert(stmt)
+
+    @staticmethod
+    def _locked_cart_query(customer_id: str):
+        """Cart with its lines, locking only the cart row (Postgres rejects
+        FOR UPDATE on the nullable side of the outer join)."""
+        return (
+            select(Cart)
+            .options(*CART_LOAD_OPTIONS)
+            .where(Cart.customer_id == customer_id)
+            .with_for_update(of=Cart)
+            .execution_options(populate_existing=True)
+        )
+
+    async def _get_cart(self, customer_id: str) -> Optional[Cart]:
+        """Load a cart and its items in one query.
+
+        Every cart fetch uses ``CART_LOAD_OPTIONS`` so the items are always
+        eagerly joined; ``Cart.items`` raises on lazy access.
+        """
+        result = await self.db.execute(
+            select(Cart)
+            .options(*CART_LOAD_OPTIONS)
+            .where(Cart.customer_id == customer_id)
+            .execution_options(populate_existing=True)
+        )
+        return result.unique().scalar_one_or_none()
+
+    @staticmethod
+    def _empty_cart(customer_id: str) -> CartResponse:
+        return CartResponse(
+            customer_id=customer_id,
+            total_items=0,
+            subtotal=Money(0),
+            items=[]
+        )
+
+    async def _priced_response(self, cart: Cart, fresh: bool = False) -> CartResponse:
+        """Build the cart response with every line repriced from the catalog in one lookup."""
+        prices = await self.catalog.get_prices((item.product_id for item in cart.items), fresh)
+        return self._cart_to_response(cart, prices)
+
+    @staticmethod
+    def _apply_catalog_price(request: CartItemRequest, prices: Dict[str, ProductPrice]) -> CartItemRequest:
+        """Replace client-sent name and price with the catalog's; raises ValueError if it has none."""
+        priced, unpriced = CartService._apply_catalog_prices([request], prices)
+        if unpriced:
+            raise ValueError(unpriced[0][1])
+        return priced[0]
+
+    @staticmethod
+    def _apply_catalog_prices(
+        lines: List[CartItemRequest],
+        prices: Dict[str, ProductPrice]
+    ) -> Tuple[List[CartItemRequest], List[Tuple[CartItemRequest, str]]]:
+        priced: List[CartItemRequest] = []
+        unpriced: List[Tuple[CartItemRequest, str]] = []
+        for line in lines:
+            price = prices.get(line.product_id)
+            if price is not None and not price.active:
+                unpriced.append((line, f"Product {line.product_id} is no longer available"))
+            elif price is not None:
+                priced.append(line.model_copy(update={"product_name": price.name, "price": price.price}))
+            elif settings.CATALOG_REQUIRED:
+                unpriced.append((line, f"Product {line.product_id} is not in the catalog"))
+            elif line.price is None or line.product_name is None:
+                unpriced.append((line, f"Product {line.product_id} is not in the catalog; price and product_name are required"))
+            else:
+                priced.append(line)
+        return priced, unpriced
+
+    def _cart_to_response(self, cart: Cart, prices: Optional[Dict[str, ProductPrice]] = None) -> CartResponse:
+        """Convert cart model to response, computing totals in a single pass.
+
+        Lines for active products in ``prices`` show the catalog name and
+        price; others keep the values stored when they were added.
+        """
+        prices = prices or {}
         items = []
+        total_items = 0
+        subtotal = 0
         for item in cart.items:
+            catalog = prices.get(item.product_id)
+            if catalog is not None and not catalog.active:
+                catalog = None
+            price = catalog.price if catalog is not None else item.price
+            line_subtotal = Money(price.cents * item.quantity)
+            total_items += item.quantity
+            subtotal += line_subtotal.cents
             items.append(CartItemResponse(
                 product_id=item.product_id,
-                product_name=item.product_name,
-                price=item.price,
+                product_name=catalog.name if catalog is not None else item.product_name,
+                price=price,
                 quantity=item.quantity,
-                subtotal=item.subtotal
+                subtotal=line_subtotal
             ))
-        
+
         return CartResponse(
             customer_id=cart.customer_id,
-            total_items=cart.total_items,
-            subtotal=cart.subtotal,
+            total_items=total_items,
+            subtotal=Money(subtotal),
             items=items,
+            version=cart.version,
             created_at=cart.created_at,
             updated_at=cart.updated_at
         )
@@ -0,0 +1,240 @@
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import math
+import threading
+import zlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CartFullError(ValueError):
+    """Raised when adding a line would take a cart past its line limit."""
+
+
+class InvalidItemError(ValueError):
+    """Raised when an item's quantity or price is not usable."""
+
+
+def _parse_item(item: Dict[str, Any]) -> Tuple[int, Any]:
+    """Coerce and check an item's quantity (an int > 0) and price (a finite number >= 0)."""
+    quantity = item.get("quantity", 1)
+    try:
+        if isinstance(quantity, bool) or (isinstance(quantity, float) and not quantity.is_integer()):
+            raise ValueError
+        quantity = int(quantity)
+    except (TypeError, ValueError):
+        raise InvalidItemError(f"quantity must be a whole number, got {quantity!r}")
+    if quantity <= 0:
+        raise InvalidItemError("quantity must be greater than 0")
+
+    price = item.get("price", 0)
+    if isinstance(price, str):
+        try:
+            price = float(price)
+        except ValueError:
+            pass
+    if isinstance(price, bool) or not isinstance(price, (int, float)) or not math.isfinite(price) or price < 0:
+        raise InvalidItemError(f"price must be a non-negative number, got {item.get('price')!r}")
+    return quantity, price
+
+
+class InMemoryCart:
+    """Cart lines indexed by item id with an incrementally maintained total.
+
+    Adding an item that is already in the cart merges the quantities, and
+    add, remove and quantity updates only touch the affected line and
+    return it, so each mutation is O(1) regardless of how many lines the
+    cart holds. Only ``snapshot`` copies every line.
+    """
+
+    __slots__ = ("lines", "total", "version")
+
+    def __init__(self):
+        self.lines: Dict[Any, Dict[str, Any]] = {}
+        self.total = 0
+        self.version = 0
+
+    def add(self, item: Dict[str, Any], max_lines: Optional[int] = None) -> Dict[str, Any]:
+        """Add an item, merging its quantity into an existing line with the same id.
+
+        A new line is refused with ``CartFullError`` once the cart holds
+        ``max_lines`` lines; merging into an existing line always works.
+        A bad quantity or price raises ``InvalidItemError``. Everything is
+        checked before the cart is touched, so a refused add changes nothing.
+        Returns the new line.
+        """
+        quantity, price = _parse_item(item)
+        item_id = item.get("id")
+        key = item_id if item_id is not None else ("line", self.version)
+
+        line = self.lines.get(key)
+        if line is None:
+            if max_lines is not None and len(self.lines) >= max_lines:
+                raise CartFullError(f"Cart is full ({max_lines} lines maximum)")
+            new_line = {**item, "quantity": quantity}
+            if "price" in item:
+                new_line["price"] = price
+        else:
+            # Replace rather than mutate so earlier snapshots stay intact
+            price = line.get("price", 0)
+            new_line = {**line, "quantity": line["quantity"] + quantity}
+        delta = price * quantity
+
+        self.lines[key] = new_line
+        self.total += delta
+        self.version += 1
+        return new_line
+
+    def remove(self, item_id: str) -> Optional[Dict[str, Any]]:
+        """Remove the line for ``item_id`` if present; returns the removed line."""
+        line = self.lines.pop(item_id, None)
+        if line is not None:
+            self.total -= line.get("price", 0) * line["quantity"]
+            if not self.lines:
+                self.total = 0  # Drop accumulated float error on empty carts
+        self.version += 1
+        return line
+
+    def set_quantity(self, item_id: str, quantity: int) -> Optional[Dict[str, Any]]:
+        """Set the quantity of an existing line; zero or less removes it. Returns the new line, or None if removed."""
+        if quantity <= 0:
+            self.remove(item_id)
+            return None
+
+        line = self.lines.get(item_id)
+        if line is None:
+            raise KeyError(item_id)
+        price = line.get("price", 0)
+        self.total += price * (quantity - line["quantity"])
+        line = self.lines[item_id] = {**line, "quantity": quantity}
+        self.version += 1
+        return line
+
+    def change(self, line: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Result of a mutation: the changed line (None if it is gone) and the cart totals."""
+        return {"item": line, "line_count": len(self.lines), "total": self.total, "version": self.version}
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a copy that is safe to hand out after the lock is released."""
+        return {"items": list(self.lines.values()), "total": self.total, "version": self.version}
+
+
+class _Shard:
+    """One partition of the store with its own lock and LRU order."""
+
+    __slots__ = ("lock", "carts", "capacity", "evictions")
+
+    def __init__(self, capacity: int):
+        self.lock = threading.Lock()
+        self.carts: "OrderedDict[str, InMemoryCart]" = OrderedDict()
+        self.capacity = capacity
+        self.evictions = 0
+
+
+class CartStore:
+    """Sharded in-memory cart store with per-shard locks and LRU eviction.
+
+    Carts are spread across ``num_shards`` partitions by a stable hash of the
+    user id, so operations on different users rarely contend for the same
+    lock. Reads return the whole cart; mutations return only the changed
+    line and the totals (see ``InMemoryCart.change``), so they stay O(1)
+    under the shard lock. Each shard holds at most ``max_carts / num_shards``
+    carts and evicts the least recently used one when full, and each cart
+    at most ``max_lines_per_cart`` lines, so memory is bounded by both.
+    Every mutation bumps the cart's version.
+    """
+
+    def __init__(self, num_shards: int = 16, max_carts: int = 10000, max_lines_per_cart: int = 200):
+        if num_shards <= 0:
+            raise ValueError("num_shards must be greater than 0")
+        if max_carts < num_shards:
+            raise ValueError("max_carts must be at least num_shards")
+        if max_lines_per_cart <= 0:
+            raise ValueError("max_lines_per_cart must be greater than 0")
+
+        per_shard = -(-max_carts // num_shards)  # ceiling division
+        self.num_shards = num_shards
+        self.max_carts = per_shard * num_shards
+        self.max_lines_per_cart = max_lines_per_cart
+        self._shards = [_Shard(per_shard) for _ in range(num_shards)]
+
+    def _shard_for(self, user_id: str) -> _Shard:
+        return self._shards[zlib.crc32(user_id.encode("utf-8")) % self.num_shards]
+
+    def _get_or_create(self, shard: _Shard, user_id: str) -> InMemoryCart:
+        """Return the cart for ``user_id``, creating it if needed. Caller holds the lock."""
+        entry = shard.carts.get(user_id)
+        if entry is not None:
+            shard.carts.move_to_end(user_id)
+            return entry
+
+        if len(shard.carts) >= shard.capacity:
+            evicted_id, _ = shard.carts.popitem(last=False)
+            shard.evictions += 1
+            logger.info(f"Evicted cart {evicted_id} from in-memory store")
+
+        entry = InMemoryCart()
+        shard.carts[user_id] = entry
+        return entry
+
+    def get_cart(self, user_id: str) -> Dict[str, Any]:
+        """Return a snapshot of the user's cart, or an empty cart."""
+        shard = self._shard_for(user_id)
+        with shard.lock:
+            entry = shard.carts.get(user_id)
+            if entry is None:
+                return {"items": [], "total": 0, "version": 0}
+            shard.carts.move_to_end(user_id)
+            return entry.snapshot()
+
+    def add_item(self, user_id: str, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Add an item to the user's cart; returns the changed line and the cart totals.
+
+        Raises ``CartFullError`` if the item needs a new line and the cart
+        is at ``max_lines_per_cart``.
+        """
+        shard = self._shard_for(user_id)
+        with shard.lock:
+            entry = self._get_or_create(shard, user_id)
+            return entry.change(entry.add(item, self.max_lines_per_cart))
+
+    def remove_item(self, user_id: str, item_id: str) -> Dict[str, Any]:
+        """Remove the line for ``item_id``; returns the removed line and the cart totals."""
+        shard = self._shard_for(user_id)
+        with shard.lock:
+            entry = shard.carts.get(user_id)
+            if entry is None:
+                return {"item": None, "line_count": 0, "total": 0, "version": 0}
+
+            shard.carts.move_to_end(user_id)
+            return entry.change(entry.remove(item_id))
+
+    def update_quantity(self, user_id: str, item_id: str, quantity: int) -> Dict[str, Any]:
+        """Set the quantity of a line; returns the changed line and the cart totals."""
+        shard = self._shard_for(user_id)
+        with shard.lock:
+            entry = shard.carts.get(user_id)
+            if entry is None or item_id not in entry.lines:
+                raise ValueError(f"Item {item_id} not found in cart")
+
+            shard.carts.move_to_end(user_id)
+            return entry.change(entry.set_quantity(item_id, quantity))
+
+    def stats(self) -> Dict[str, Any]:
+        """Report shard occupancy and eviction counts."""
+        occupancy = []
+        evictions = 0
+        for shard in self._shards:
+            with shard.lock:
+                occupancy.append(len(shard.carts))
+                evictions += shard.evictions
+
+        return {
+            "shards": self.num_shards,
+            "max_carts": self.max_carts,
+            "max_lines_per_cart": self.max_lines_per_cart,
+            "carts": sum(occupancy),
+            "occupancy": occupancy,
+            "evictions": evictions,
+        }
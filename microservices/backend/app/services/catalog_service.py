@@ -0,0 +1,368 @@
+from collections import OrderedDict
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config.database import dialect_insert
+from app.config.settings import settings
+from app.models.catalog_models import CatalogVersion, Product
+from app.models.money import Money
+from app.models.schemas import ProductListResponse, ProductResponse
+from app.services.cart_cache import LocalCartCache
+from app.utils.json_response import dumps
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+import base64
+import hashlib
+import json
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION_ID = 1
+
+# Listing sorts: sort key column and whether it descends; ties break on id
+PRODUCT_SORTS = {
+    "name": (Product.name, False),
+    "price_asc": (Product.price, False),
+    "price_desc": (Product.price, True),
+}
+
+
+class ProductPrice(NamedTuple):
+    """The name and price a cart line should show for a product.
+
+    ``active`` is False for a withdrawn product: it is still in the
+    catalog, but can no longer be added to a cart or bought.
+    """
+    product_id: str
+    name: str
+    price: Money
+    version: int
+    active: bool = True
+
+
+class PriceCache:
+    """In-process product price cache with versioned invalidation.
+
+    Every catalog write bumps the ``catalog_version`` row. At most once per
+    ``check_interval`` a lookup reads that version; if it moved, only the
+    products changed since the cached version are reloaded, so a price
+    change is seen by every process within the interval without
+    flushing the whole cache. Withdrawn (inactive) products are cached with
+    ``active=False`` so they are never mistaken for unknown ones; unknown
+    product ids are remembered as misses until the next version change,
+    at most ``max_entries`` of them, least recently asked-for dropped first.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 50000,
+        check_interval: float = 1.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_entries = max_entries
+        self.check_interval = check_interval
+        self.clock = clock
+        self.version = -1
+        self._checked_at: Optional[float] = None
+        self._entries: "OrderedDict[str, ProductPrice]" = OrderedDict()
+        self._misses: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.syncs = 0
+
+    async def current_version(self, db: AsyncSession, fresh: bool = False) -> int:
+        """The catalog version prices are valid for, syncing if due (or ``fresh``)."""
+        now = self.clock()
+        if fresh or self._checked_at is None or now - self._checked_at >= self.check_interval:
+            await self._sync(db)
+            self._checked_at = now
+        return self.version
+
+    async def get_prices(
+        self,
+        db: AsyncSession,
+        product_ids: Iterable[str],
+        fresh: bool = False
+    ) -> Dict[str, ProductPrice]:
+        """Prices for the given ids that are in the catalog (withdrawn ones included), loading misses in one query."""
+        await self.current_version(db, fresh)
+        prices: Dict[str, ProductPrice] = {}
+        missing: List[str] = []
+        with self._lock:
+            for product_id in dict.fromkeys(product_ids):
+                price = self._entries.get(product_id)
+                if price is not None:
+                    self._entries.move_to_end(product_id)
+                    prices[product_id] = price
+                elif product_id in self._misses:
+                    self._misses.move_to_end(product_id)
+                else:
+                    missing.append(product_id)
+            self.hits += len(prices)
+
+        if missing:
+            version = self.version
+            loaded = await self._load(db, Product.id.in_(missing))
+            with self._lock:
+                self.loads += 1
+                # A sync that ran meanwhile may have newer rows; keep those
+                if self.version == version:
+                    self._store(loaded.values())
+                    self._remember_misses(product_id for product_id in missing if product_id not in loaded)
+            prices.update(loaded)
+        return prices
+
+    def invalidate(self):
+        """Check the catalog version on the next lookup, e.g. after this process wrote to it."""
+        self._checked_at = None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._misses.clear()
+            self.version = -1
+            self._checked_at = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "version": self.version,
+                "entries": len(self._entries),
+                "misses": len(self._misses),
+                "hits": self.hits,
+                "loads": self.loads,
+                "syncs": self.syncs,
+            }
+
+    async def _sync(self, db: AsyncSession):
+        version = await db.scalar(
+            select(CatalogVersion.version).where(CatalogVersion.id == CATALOG_VERSION_ID)
+        ) or 0
+        if version == self.version:
+            return
+
+        if self.version < 0 or version < self.version:
+            # First sync, or the catalog was reset: nothing cached can be trusted
+            with self._lock:
+                self._entries.clear()
+                self._misses.clear()
+                self.version = version
+            return
+
+        changed = await self._load(db, Product.version > self.version)
+        with self._lock:
+            self._misses.clear()
+            self._store(changed.values())
+            self.version = version
+            self.syncs += 1
+        logger.info(f"Price cache synced to catalog version {version} ({len(changed)} products changed)")
+
+    async def _load(self, db: AsyncSession, condition) -> Dict[str, ProductPrice]:
+        result = await db.execute(
+            select(Product.id, Product.name, Product.price, Product.version, Product.active).where(condition)
+        )
+        return {row.id: ProductPrice(row.id, row.name, row.price, row.version, row.active) for row in result}
+
+    def _store(self, prices: Iterable[ProductPrice]):
+        for price in prices:
+            self._entries[price.product_id] = price
+            self._entries.move_to_end(price.product_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _remember_misses(self, product_ids: Iterable[str]):
+        for product_id in product_ids:
+            self._misses[product_id] = None
+            self._misses.move_to_end(product_id)
+        while len(self._misses) > self.max_entries:
+            self._misses.popitem(last=False)
+
+
+class ProductPage(NamedTuple):
+    """A listing page as the exact response bytes, with its ETag."""
+    body: bytes
+    etag: str
+
+
+def encode_cursor(sort: str, key: Any, product_id: str) -> str:
+    """Opaque cursor for the page after the row with this sort key and id."""
+    raw = json.dumps([sort, str(key), product_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[Any, str]:
+    """Read a cursor back into (sort key, product id); raises ValueError if unusable."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, key, product_id = json.loads(raw)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid cursor") from None
+    if cursor_sort != sort:
+        raise ValueError(f"Cursor was issued for sort={cursor_sort}")
+    try:
+        return (key if sort == "name" else Money.parse(key)), str(product_id)
+    except ValueError:
+        raise ValueError("Invalid cursor") from None
+
+
+price_cache = PriceCache(
+    max_entries=settings.CATALOG_CACHE_MAX_ENTRIES,
+    check_interval=settings.CATALOG_VERSION_CHECK_INTERVAL
+)
+
+
+# Listing pages keyed by catalog version and query; a catalog write makes old keys unreachable
+product_pages = LocalCartCache(
+    max_entries=settings.PRODUCT_PAGE_CACHE_MAX_ENTRIES,
+    ttl=settings.PRODUCT_PAGE_CACHE_TTL
+)
+
+
+class CatalogService:
+    """Server-side product catalog: the prices carts are charged at."""
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        cache: Optional[PriceCache] = None,
+        pages: Optional[LocalCartCache] = None
+    ):
+        self.db = db
+        self.cache = cache if cache is not None else price_cache
+        self.pages = pages if pages is not None else product_pages
+
+    async def get_prices(self, product_ids: Iterable[str], fresh: bool = False) -> Dict[str, ProductPrice]:
+        """Bulk price lookup; ids not in the catalog are left out, withdrawn ones have ``active=False``.
+
+        ``fresh`` checks the catalog version first instead of trusting a
+        check made within the last interval, e.g. before taking payment.
+        """
+        return await self.cache.get_prices(self.db, product_ids, fresh)
+
+    async def version(self, fresh: bool = False) -> int:
+        """The catalog version the cached prices reflect."""
+        return await self.cache.current_version(self.db, fresh)
+
+    async def upsert_products(self, products: List[Dict[str, Any]]) -> int:
+        """Create or update products in one transaction; returns the new catalog version.
+
+        Each dict needs ``id``, ``name`` and ``price`` and may carry
+        ``description``, ``category``, ``image_url`` and ``active``.
+        """
+        insert = dialect_insert(self.db)
+        try:
+            version = (await self.db.execute(
+                insert(CatalogVersion)
+                .values(id=CATALOG_VERSION_ID, version=1)
+                .on_conflict_do_update(
+                    index_elements=[CatalogVersion.id],
+                    set_={"version": CatalogVersion.version + 1}
+                )
+                .returning(CatalogVersion.version)
+            )).scalar_one()
+
+            rows = [
+                {
+                    "id": product["id"],
+                    "name": product["name"],
+                    "description": product.get("description"),
+                    "category": product.get("category"),
+                    "price": Money.parse(product["price"]),
+                    "image_url": product.get("image_url"),
+                    "active": product.get("active", True),
+                    "version": version,
+                }
+                for product in products
+            ]
+            stmt = insert(Product).values(rows)
+            await self.db.execute(stmt.on_conflict_do_update(
+                index_elements=[Product.id],
+                set_={
+                    column: stmt.excluded[column]
+                    for column in ("name", "description", "category", "price", "image_url", "active", "version")
+                }
+            ))
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+
+        self.cache.invalidate()
+        logger.info(f"Catalog version {version}: upserted {len(products)} products")
+        return version
+
+    async def list_products(
+        self,
+        category: Optional[str] = None,
+        min_price: Optional[Decimal] = None,
+        max_price: Optional[Decimal] = None,
+        sort: str = "name",
+        limit: int = 24,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Any], Optional[str]]:
+        """One page of active products and the cursor for the next one.
+
+        Pages are read with keyset pagination: the cursor carries the last
+        row's (sort key, id) and the next page starts strictly after it, so
+        every page is one index range scan of ``limit + 1`` rows no matter
+        how deep it is. Nothing is counted.
+        """
+        column, descending = PRODUCT_SORTS[sort]
+        query = select(
+            Product.id, Product.name, Product.description, Product.category, Product.price, Product.image_url
+        ).where(Product.active == True)  # noqa: E712
+        if category is not None:
+            query = query.where(Product.category == category)
+        if min_price is not None:
+            query = query.where(Product.price >= Money.parse(min_price))
+        if max_price is not None:
+            query = query.where(Product.price <= Money.parse(max_price))
+        if cursor is not None:
+            key, product_id = decode_cursor(cursor, sort)
+            after = tuple_(column, Product.id)
+            query = query.where(after < (key, product_id) if descending else after > (key, product_id))
+
+        if descending:
+            query = query.order_by(column.desc(), Product.id.desc())
+        else:
+            query = query.order_by(column, Product.id)
+        rows = (await self.db.execute(query.limit(limit + 1))).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(sort, getattr(last, column.key), last.id)
+        return rows, next_cursor
+
+    async def page_etag(self, **query) -> str:
+        """The ETag ``product_page`` gives this query, without reading any product."""
+        version, digest = await self._page_key(query)
+        return f'"{version}-{digest}"'
+
+    async def product_page(self, **query) -> ProductPage:
+        """A listing page as response bytes, cached per catalog version.
+
+        The ETag depends only on the catalog version and the query, so it is
+        known (and If-None-Match answerable) before any product is read.
+        """
+        version, digest = await self._page_key(query)
+        key = f"{version}:{digest}"
+        page = self.pages.get(key)
+        if page is None:
+            rows, next_cursor = await self.list_products(**query)
+            body = dumps(ProductListResponse(
+                items=[ProductResponse.model_validate(row) for row in rows],
+                next_cursor=next_cursor
+            ))
+            page = ProductPage(body, f'"{version}-{digest}"')
+            self.pages.set(key, page)
+        return page
+
+    async def _page_key(self, query: Dict[str, Any]) -> Tuple[int, str]:
+        version = await self.version()
+        digest = hashlib.sha256(json.dumps(query, sort_keys=True, default=str).encode()).hexdigest()[:16]
+        return version, digest
@@ -0,0 +1,150 @@
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config.database import dialect_insert
+from app.config.settings import settings
+from app.models.idempotency_models import IdempotencyKey
+from typing import Callable, Dict, NamedTuple, Optional
+import hashlib
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class StoredResponse(NamedTuple):
+    """A response recorded under an Idempotency-Key."""
+    status_code: int
+    body: bytes
+    headers: Dict[str, str]
+
+
+class IdempotencyKeyMismatch(Exception):
+    """The key was already used with a different request."""
+
+
+class IdempotencyKeyInProgress(Exception):
+    """The first request with this key has not finished yet."""
+
+
+def request_fingerprint(*parts: str) -> str:
+    """Hash of the request, used to refuse a key reused for a different request."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class IdempotencyStore:
+    """Idempotency keys kept in the ``idempotency_keys`` table.
+
+    ``reserve`` claims a key with a single INSERT ... ON CONFLICT, so two
+    concurrent requests with the same key cannot both run. The winner runs
+    the mutation and calls ``stage`` inside its transaction, so the response
+    is stored exactly when the mutation commits (``complete`` does the same
+    in a transaction of its own, for requests that changed nothing), or
+    ``release`` on failure. Later requests with the key get the stored
+    response back.
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        ttl: Optional[float] = None,
+        lock_timeout: Optional[float] = None,
+        clock: Callable[[], float] = time.time
+    ):
+        self.db = db
+        self.ttl = ttl if ttl is not None else settings.IDEMPOTENCY_TTL
+        self.lock_timeout = lock_timeout if lock_timeout is not None else settings.IDEMPOTENCY_LOCK_TIMEOUT
+        self.clock = clock
+
+    async def reserve(self, scope: str, key: str, request_hash: str) -> Optional[StoredResponse]:
+        """Claim ``key`` for this request, or return the response stored under it.
+
+        Returns None when the caller now owns the key and should run the
+        request. Raises ``IdempotencyKeyMismatch`` if the key was used for
+        a different request and ``IdempotencyKeyInProgress`` if its first
+        request is still running. Expired keys are taken over.
+        """
+        now = self.clock()
+        insert = dialect_insert(self.db)
+        stmt = insert(IdempotencyKey).values(
+            scope=scope,
+            key=key,
+            request_hash=request_hash,
+            expires_at=now + self.lock_timeout
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[IdempotencyKey.scope, IdempotencyKey.key],
+            set_={
+                "request_hash": stmt.excluded.request_hash,
+                "status_code": None,
+                "response_body": None,
+                "response_headers": None,
+                "expires_at": stmt.excluded.expires_at
+            },
+            where=IdempotencyKey.expires_at < now
+        )
+        result = await self.db.execute(stmt)
+        if result.rowcount == 1:
+            await self.db.commit()
+            return None
+
+        record = (await self.db.execute(
+            select(
+                IdempotencyKey.request_hash,
+                IdempotencyKey.status_code,
+                IdempotencyKey.response_body,
+                IdempotencyKey.response_headers
+            ).where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+        )).one()
+        await self.db.rollback()
+
+        if record.request_hash != request_hash:
+            raise IdempotencyKeyMismatch(f"Idempotency-Key {key} was used for a different request")
+        if record.status_code is None:
+            raise IdempotencyKeyInProgress(f"Request with Idempotency-Key {key} is still in progress")
+        return StoredResponse(record.status_code, record.response_body, record.response_headers or {})
+
+    async def complete(self, scope: str, key: str, response: StoredResponse):
+        """Record the response for a reserved key and keep it for the TTL."""
+        await self.stage(scope, key, response)
+        await self.db.commit()
+
+    async def stage(self, scope: str, key: str, response: StoredResponse):
+        """Record the response in the current transaction; it commits (or not) with it."""
+        result = await self.db.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+            .values(
+                status_code=response.status_code,
+                response_body=response.body,
+                response_headers=response.headers,
+                expires_at=self.clock() + self.ttl
+            )
+        )
+        if not result.rowcount:
+            logger.warning(f"Idempotency-Key {key} expired before its response was stored")
+
+    async def release(self, scope: str, key: str):
+        """Drop a reserved key so a retry can run the request again.
+
+        A key whose response was already committed is kept: the mutation
+        happened, so a retry must replay it rather than run again.
+        """
+        await self.db.rollback()
+        await self.db.execute(
+            delete(IdempotencyKey).where(
+                IdempotencyKey.scope == scope,
+                IdempotencyKey.key == key,
+                IdempotencyKey.status_code.is_(None)
+            )
+        )
+        await self.db.commit()
+
+    async def purge_expired(self) -> int:
+        """Delete expired keys; returns how many were removed."""
+        result = await self.db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < self.clock()))
+        await self.db.commit()
+        return result.rowcount
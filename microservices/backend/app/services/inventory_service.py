@@ -0,0 +1,175 @@
+from sqlalchemy import case, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config.settings import settings
+from app.models.inventory_models import Inventory, InventoryReservation
+from typing import Callable, Dict, List, Optional, Tuple
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientStock(Exception):
+    """Raised when a reservation asks for more than is available.
+
+    ``shortages`` maps product id to ``(requested, available)``.
+    """
+
+    def __init__(self, shortages: Dict[str, Tuple[int, int]]):
+        details = ", ".join(
+            f"{product_id} (requested {requested}, available {available})"
+            for product_id, (requested, available) in sorted(shortages.items())
+        )
+        super().__init__(f"Insufficient stock for {details}")
+        self.shortages = shortages
+
+
+class ReservationService:
+    """Reserves stock for orders within the caller's transaction.
+
+    Stock rows are always locked in product id order (SELECT ... FOR
+    UPDATE), so two checkouts sharing products queue behind each other
+    instead of deadlocking. All lines are then decremented by one
+    conditional UPDATE (``available >= requested``); if it touches fewer
+    rows than were locked, another writer got there first and the whole
+    reservation fails. Nothing here commits: the caller commits or rolls
+    back, so an order and its reservations succeed or fail together.
+    """
+
+    def __init__(self, db: AsyncSession, ttl: Optional[float] = None, clock: Callable[[], float] = time.time):
+        self.db = db
+        self.ttl = ttl if ttl is not None else settings.INVENTORY_RESERVATION_TTL
+        self.clock = clock
+
+    async def reserve(self, order_id: int, lines: Dict[str, int]) -> Dict[str, int]:
+        """Take stock for an order's lines and record held reservations.
+
+        Returns the quantities reserved for stock-tracked products; the
+        others are left alone. Raises ``InsufficientStock`` if any tracked
+        product is short.
+        """
+        reserved = await self._decrement(lines)
+        if reserved:
+            expires_at = self.clock() + self.ttl
+            await self.db.execute(insert(InventoryReservation).values([
+                {"order_id": order_id, "product_id": product_id, "quantity": quantity, "expires_at": expires_at}
+                for product_id, quantity in reserved.items()
+            ]))
+        return reserved
+
+    async def confirm(self, order_id: int):
+        """Mark an order's reservations sold.
+
+        Reservations that expired before confirmation are taken from stock
+        again, which raises ``InsufficientStock`` if it has since sold out.
+        Released reservations (a failed order) are left alone, so confirming
+        twice is harmless.
+        """
+        rows = await self._reservations(order_id, ("held", "expired"))
+        expired = [row for row in rows if row.status == "expired"]
+        if expired:
+            await self._decrement(self._totals(expired))
+        if rows:
+            await self._set_status([row.id for row in rows], "committed")
+
+    async def release(self, order_id: int) -> int:
+        """Return an order's held or sold stock, e.g. when payment fails."""
+        rows = await self._reservations(order_id, ("held", "committed"))
+        if rows:
+            await self._restock(self._totals(rows))
+            await self._set_status([row.id for row in rows], "released")
+        return len(rows)
+
+    async def release_expired(self, limit: int = 500) -> int:
+        """Return stock held by reservations past their TTL; returns how many."""
+        rows = (await self.db.execute(
+            select(InventoryReservation.id, InventoryReservation.product_id, InventoryReservation.quantity)
+            .where(InventoryReservation.status == "held", InventoryReservation.expires_at <= self.clock())
+            .order_by(InventoryReservation.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )).all()
+        if rows:
+            await self._restock(self._totals(rows))
+            await self._set_status([row.id for row in rows], "expired")
+            logger.info(f"Released {len(rows)} expired inventory reservations")
+        return len(rows)
+
+    async def _decrement(self, lines: Dict[str, int]) -> Dict[str, int]:
+        stock = await self._lock(lines)
+        requested = {product_id: lines[product_id] for product_id in stock}
+        if not requested:
+            return {}
+
+        shortages = {
+            product_id: (quantity, stock[product_id])
+            for product_id, quantity in requested.items()
+            if stock[product_id] < quantity
+        }
+        if shortages:
+            raise InsufficientStock(shortages)
+
+        amount = case(requested, value=Inventory.product_id)
+        result = await self.db.execute(
+            update(Inventory)
+            .where(Inventory.product_id.in_(requested), Inventory.available >= amount)
+            .values(available=Inventory.available - amount)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != len(requested):
+            # Only without row locks (SQLite): stock moved between read and write
+            stock = await self._lock(requested)
+            raise InsufficientStock({
+                product_id: (quantity, stock.get(product_id, 0))
+                for product_id, quantity in requested.items()
+                if stock.get(product_id, 0) < quantity
+            })
+        return requested
+
+    async def _restock(self, quantities: Dict[str, int]):
+        await self._lock(quantities)
+        amount = case(quantities, value=Inventory.product_id)
+        await self.db.execute(
+            update(Inventory)
+            .where(Inventory.product_id.in_(quantities))
+            .values(available=Inventory.available + amount)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def _lock(self, product_ids) -> Dict[str, int]:
+        """Lock the tracked products' stock rows in a fixed order; returns availability."""
+        result = await self.db.execute(
+            select(Inventory.product_id, Inventory.available)
+            .where(Inventory.product_id.in_(sorted(product_ids)))
+            .order_by(Inventory.product_id)
+            .with_for_update()
+        )
+        return dict(result.all())
+
+    async def _reservations(self, order_id: int, statuses: Tuple[str, ...]) -> List:
+        result = await self.db.execute(
+            select(
+                InventoryReservation.id,
+                InventoryReservation.product_id,
+                InventoryReservation.quantity,
+                InventoryReservation.status
+            )
+            .where(InventoryReservation.order_id == order_id, InventoryReservation.status.in_(statuses))
+            .with_for_update()
+        )
+        return result.all()
+
+    async def _set_status(self, reservation_ids: List[int], new_status: str):
+        await self.db.execute(
+            update(InventoryReservation)
+            .where(InventoryReservation.id.in_(reservation_ids))
+            .values(status=new_status)
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def _totals(rows) -> Dict[str, int]:
+        totals: Dict[str, int] = {}
+        for row in rows:
+            totals[row.product_id] = totals.get(row.product_id, 0) + row.quantity
+        return totals
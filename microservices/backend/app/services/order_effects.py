@@ -0,0 +1,107 @@
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.models.money import Money
+from app.models.order_models import Order
+from app.services.inventory_service import InsufficientStock, ReservationService
+from typing import Any, Dict, List, Optional, Tuple
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentDeclined(Exception):
+    """The payment provider refused the charge; retrying will not help."""
+
+
+class StubPaymentGateway:
+    """Local payment gateway for development and tests.
+
+    Approves every charge except for payment methods listed in
+    ``decline``. Charges are keyed by order id, like a provider
+    idempotency key, so a retried event never charges twice.
+    """
+
+    def __init__(self, decline: Tuple[str, ...] = ("declined",)):
+        self.decline = decline
+        self.charges: Dict[int, Tuple[Money, str]] = {}
+
+    async def charge(self, order_id: int, amount: Money, payment_method: Optional[str]) -> str:
+        if payment_method in self.decline:
+            raise PaymentDeclined(f"Payment method {payment_method} declined")
+        if order_id not in self.charges:
+            self.charges[order_id] = (amount, f"stub-{uuid.uuid4()}")
+            logger.info(f"[stub] Charged {amount} for order {order_id}")
+        return self.charges[order_id][1]
+
+
+class StubEmailSender:
+    """Local email sender that records messages instead of sending them."""
+
+    def __init__(self):
+        self.sent: List[Dict[str, Any]] = []
+
+    async def send_order_confirmation(self, customer_id: str, order_id: int, total_amount: Money):
+        self.sent.append({"customer_id": customer_id, "order_id": order_id, "total_amount": total_amount})
+        logger.info(f"[stub] Sent order confirmation for order {order_id} to {customer_id}")
+
+
+class OrderCreatedHandler:
+    """Side effects of a checkout, run by the outbox worker.
+
+    Confirms the stock reserved at checkout (``out_of_stock`` if the hold
+    expired and the product sold out meanwhile), charges the order, marks
+    it ``paid`` and sends the confirmation email. A declined charge marks
+    it ``payment_failed`` and returns the stock. Each step is safe to
+    repeat because a failed event is delivered again: confirming is
+    idempotent, the charge is keyed by order id and the status update only
+    moves a ``pending`` order.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker, payments, email):
+        self.session_factory = session_factory
+        self.payments = payments
+        self.email = email
+
+    async def __call__(self, payload: Dict[str, Any]):
+        order_id = payload["order_id"]
+        amount = Money.parse(payload["total_amount"])
+
+        async with self.session_factory() as db:
+            try:
+                await ReservationService(db).confirm(order_id)
+            except InsufficientStock as e:
+                await db.rollback()
+                logger.warning(f"Order {order_id}: {e}")
+                await self._fail(db, order_id, "out_of_stock")
+                return
+            await db.commit()
+
+        try:
+            await self.payments.charge(order_id, amount, payload.get("payment_method"))
+        except PaymentDeclined as e:
+            logger.warning(f"Order {order_id}: {e}")
+            async with self.session_factory() as db:
+                await self._fail(db, order_id, "payment_failed")
+            return
+
+        async with self.session_factory() as db:
+            await self._set_status(db, order_id, "paid")
+            await db.commit()
+        await self.email.send_order_confirmation(payload["customer_id"], order_id, amount)
+
+    async def _fail(self, db: AsyncSession, order_id: int, new_status: str):
+        """Mark the order failed and return its stock, in one transaction."""
+        if await self._set_status(db, order_id, new_status):
+            await ReservationService(db).release(order_id)
+        await db.commit()
+
+    @staticmethod
+    async def _set_status(db: AsyncSession, order_id: int, new_status: str) -> bool:
+        """Move a pending order to ``new_status``; False if it had already moved on."""
+        result = await db.execute(
+            update(Order)
+            .where(Order.id == order_id, Order.status == "pending")
+            .values(status=new_status)
+        )
+        return result.rowcount > 0
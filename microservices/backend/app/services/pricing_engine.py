@@ -0,0 +1,264 @@
+"""
+Cart pricing: promotions, shipping and tax in exact integer cents.
+
+Rules are compiled once into per-product lookups and sorted tiers, then a
+cart is priced in a single pass over its lines. ``PricingEngine.price_batch``
+prices many carts at once with NumPy int64 arrays (e.g. to reprice every
+open cart when a promotion changes) and returns exactly what ``price``
+would for each cart. NumPy is imported on first batch use only.
+
+Amounts are :class:`~app.models.money.Money` cents and every percentage
+is an integer rate in parts per million; each discount or tax amount is
+rounded half up to the cent. Line promotions do not stack; a line gets
+the best one.
+"""
+
+from decimal import Decimal
+from itertools import chain
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+from app.models.money import Money
+
+Line = Tuple[str, int, int]  # (product_id, unit price in cents, quantity)
+
+
+RATE_SCALE = 1_000_000  # rates are integer parts per million: 8.875% is 88750
+
+
+def to_rate(percent) -> int:
+    """Percent (e.g. ``8.875``) as an integer rate in parts per million."""
+    rate = Decimal(str(percent)) * (RATE_SCALE // 100)
+    if rate != rate.to_integral_value() or not 0 <= rate <= RATE_SCALE:
+        raise ValueError(f"{percent} is not a percentage between 0 and 100 with at most four decimals")
+    return int(rate)
+
+
+def percent_of(cents: int, rate: int) -> int:
+    """``rate`` (parts per million) of ``cents``, rounded half up to the cent."""
+    return (cents * rate + RATE_SCALE // 2) // RATE_SCALE
+
+
+def cart_lines(cart) -> List[Line]:
+    """Engine lines for a ``CartResponse``."""
+    return [(item.product_id, item.price.cents, item.quantity) for item in cart.items]
+
+
+class PercentOff(NamedTuple):
+    """Percent off the listed products, or every product when ``product_ids`` is None."""
+    percent: Decimal
+    product_ids: Optional[FrozenSet[str]] = None
+
+
+class BuyXGetY(NamedTuple):
+    """For every ``buy`` + ``get`` units of a listed product, ``get`` units are ``percent`` off (BOGO by default)."""
+    product_ids: FrozenSet[str]
+    buy: int = 1
+    get: int = 1
+    percent: Decimal = Decimal("100")
+
+
+class SpendTiers(NamedTuple):
+    """Percent off the whole order by spend: ``((min_subtotal, percent), ...)``; the highest tier reached applies."""
+    tiers: Tuple[Tuple[Decimal, Decimal], ...]
+
+
+class FreeShipping(NamedTuple):
+    """Flat ``rate`` shipping, free once the discounted subtotal reaches ``threshold``."""
+    threshold: Decimal
+    rate: Decimal
+
+
+class RegionalTax(NamedTuple):
+    """Tax percent by region code, with ``default`` for regions not listed."""
+    rates: Tuple[Tuple[str, Decimal], ...]
+    default: Decimal = Decimal("0")
+    shipping_taxable: bool = True
+
+
+class PricedCart(NamedTuple):
+    """A cart's price breakdown in cents."""
+    subtotal: int
+    line_discounts: Tuple[int, ...]
+    order_discount: int
+    shipping: int
+    tax: int
+    total: int
+
+    @property
+    def discount(self) -> int:
+        return sum(self.line_discounts) + self.order_discount
+
+
+class BatchPrices(NamedTuple):
+    """Per-cart price breakdowns in cents as int64 arrays, in input order."""
+    subtotal: "object"
+    discount: "object"
+    shipping: "object"
+    tax: "object"
+    total: "object"
+
+
+class PricingEngine:
+    """A compiled rule set.
+
+    Compilation resolves, per product, the best percent-off and the best
+    buy-X-get-Y deal, sorts the spend tiers (carrying the best percent
+    forward so a lower threshold never beats a higher one), and turns every
+    percentage into an integer rate and every amount into cents.
+    """
+
+    def __init__(self, rules: Iterable = ()):
+        self.percent_all = 0
+        self.percent_by_product: Dict[str, int] = {}
+        self.bogo_by_product: Dict[str, Tuple[int, int, int]] = {}
+        tiers: List[Tuple[int, int]] = []
+        self.shipping_threshold: Optional[int] = None
+        self.shipping_rate = 0
+        self.tax_rates: Dict[str, int] = {}
+        self.tax_default = 0
+        self.shipping_taxable = True
+
+        for rule in rules:
+            if isinstance(rule, PercentOff):
+                points = to_rate(rule.percent)
+                if rule.product_ids is None:
+                    self.percent_all = max(self.percent_all, points)
+                else:
+                    for product_id in rule.product_ids:
+                        self.percent_by_product[product_id] = max(self.percent_by_product.get(product_id, 0), points)
+            elif isinstance(rule, BuyXGetY):
+                if rule.buy < 1 or rule.get < 1:
+                    raise ValueError("buy and get must be at least 1")
+                deal = (rule.buy + rule.get, rule.get, to_rate(rule.percent))
+                for product_id in rule.product_ids:
+                    current = self.bogo_by_product.get(product_id)
+                    # Keep the deal that gives the larger share of units away
+                    if current is None or deal[1] * deal[2] * current[0] > current[1] * current[2] * deal[0]:
+                        self.bogo_by_product[product_id] = deal
+            elif isinstance(rule, SpendTiers):
+                tiers.extend((Money.parse(minimum).cents, to_rate(percent)) for minimum, percent in rule.tiers)
+            elif isinstance(rule, FreeShipping):
+                self.shipping_threshold = Money.parse(rule.threshold).cents
+                self.shipping_rate = Money.parse(rule.rate).cents
+            elif isinstance(rule, RegionalTax):
+                self.tax_rates = {region: to_rate(rate) for region, rate in rule.rates}
+                self.tax_default = to_rate(rule.default)
+                self.shipping_taxable = rule.shipping_taxable
+            else:
+                raise TypeError(f"Unknown pricing rule {rule!r}")
+
+        for product_id, points in self.percent_by_product.items():
+            self.percent_by_product[product_id] = max(points, self.percent_all)
+
+        tiers.sort()
+        self.tier_thresholds: List[int] = []
+        self.tier_points: List[int] = []
+        best = 0
+        for minimum, points in tiers:
+            best = max(best, points)
+            self.tier_thresholds.append(minimum)
+            self.tier_points.append(best)
+
+    def price(self, lines: Iterable[Line], region: Optional[str] = None) -> PricedCart:
+        """Price one cart in a single pass over its lines."""
+        subtotal = 0
+        line_discounts = []
+        for product_id, unit, quantity in lines:
+            amount = unit * quantity
+            subtotal += amount
+            line_discounts.append(self._line_discount(product_id, unit, quantity, amount))
+
+        discounted = subtotal - sum(line_discounts)
+        order_discount = percent_of(discounted, self._tier_points(discounted))
+        discounted -= order_discount
+
+        shipping = 0
+        if line_discounts and self.shipping_threshold is not None and discounted < self.shipping_threshold:
+            shipping = self.shipping_rate
+
+        taxable = discounted + (shipping if self.shipping_taxable else 0)
+        tax = percent_of(taxable, self.tax_rates.get(region, self.tax_default))
+        return PricedCart(
+            subtotal=subtotal,
+            line_discounts=tuple(line_discounts),
+            order_discount=order_discount,
+            shipping=shipping,
+            tax=tax,
+            total=discounted + shipping + tax
+        )
+
+    def price_batch(self, carts: Sequence[Sequence[Line]], regions: Optional[Sequence[Optional[str]]] = None) -> BatchPrices:
+        """Price many carts with vectorized int64 arithmetic; same results as ``price``."""
+        import numpy as np
+
+        regions = regions if regions is not None else [None] * len(carts)
+        sizes = np.fromiter((len(cart) for cart in carts), dtype=np.int64, count=len(carts))
+        line_count = int(sizes.sum())
+
+        lines = list(chain.from_iterable(carts))
+        product_ids = [line[0] for line in lines]
+        units = np.fromiter((line[1] for line in lines), dtype=np.int64, count=line_count)
+        quantities = np.fromiter((line[2] for line in lines), dtype=np.int64, count=line_count)
+
+        # Rules are per product, so look each distinct product up once
+        slots: Dict[str, int] = {}
+        product_index = np.fromiter(
+            (slots.setdefault(p, len(slots)) for p in product_ids), dtype=np.int64, count=line_count
+        )
+        products = list(slots)
+        no_deal = (1, 0, 0)
+        percent = np.array([self.percent_by_product.get(p, self.percent_all) for p in products], dtype=np.int64)[product_index]
+        deals = np.array([self.bogo_by_product.get(p, no_deal) for p in products], dtype=np.int64).reshape(-1, 3)[product_index]
+        group, free, free_points = deals[:, 0], deals[:, 1], deals[:, 2]
+
+        amounts = units * quantities
+        by_percent = (amounts * percent + RATE_SCALE // 2) // RATE_SCALE
+        by_deal = (quantities // group * free * units * free_points + RATE_SCALE // 2) // RATE_SCALE
+        line_discounts = np.maximum(by_percent, by_deal)
+
+        cart_index = np.repeat(np.arange(len(carts)), sizes)
+        subtotal = np.zeros(len(carts), dtype=np.int64)
+        line_discount = np.zeros(len(carts), dtype=np.int64)
+        np.add.at(subtotal, cart_index, amounts)
+        np.add.at(line_discount, cart_index, line_discounts)
+
+        discounted = subtotal - line_discount
+        tier_points = np.zeros(len(carts), dtype=np.int64)
+        if self.tier_thresholds:
+            reached = np.searchsorted(np.array(self.tier_thresholds, dtype=np.int64), discounted, side="right")
+            tier_points = np.concatenate(([0], np.array(self.tier_points, dtype=np.int64)))[reached]
+        order_discount = (discounted * tier_points + RATE_SCALE // 2) // RATE_SCALE
+        discounted = discounted - order_discount
+
+        shipping = np.zeros(len(carts), dtype=np.int64)
+        if self.shipping_threshold is not None:
+            shipping = np.where((sizes > 0) & (discounted < self.shipping_threshold), self.shipping_rate, 0).astype(np.int64)
+
+        tax_points = np.fromiter(
+            (self.tax_rates.get(region, self.tax_default) for region in regions),
+            dtype=np.int64, count=len(carts)
+        )
+        taxable = discounted + (shipping if self.shipping_taxable else 0)
+        tax = (taxable * tax_points + RATE_SCALE // 2) // RATE_SCALE
+        return BatchPrices(
+            subtotal=subtotal,
+            discount=line_discount + order_discount,
+            shipping=shipping,
+            tax=tax,
+            total=discounted + shipping + tax
+        )
+
+    def _line_discount(self, product_id: str, unit: int, quantity: int, amount: int) -> int:
+        discount = percent_of(amount, self.percent_by_product.get(product_id, self.percent_all))
+        deal = self.bogo_by_product.get(product_id)
+        if deal is not None:
+            group, free, points = deal
+            discount = max(discount, percent_of(quantity // group * free * unit, points))
+        return discount
+
+    def _tier_points(self, amount: int) -> int:
+        points = 0
+        for threshold, tier in zip(self.tier_thresholds, self.tier_points):
+            if amount < threshold:
+                break
+            points = tier
+        return points
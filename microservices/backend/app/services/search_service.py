@@ -0,0 +1,293 @@
+from bisect import bisect_left
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config.settings import settings
+from app.models.catalog_models import CatalogVersion, Product
+from app.services.catalog_service import CATALOG_VERSION_ID
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+import asyncio
+import heapq
+import re
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Relevance weights: where a term matched, and how closely
+FIELD_WEIGHTS = {"name": 3, "category": 2, "description": 1}
+EXACT, PREFIX, FUZZY = 3, 2, 1
+
+# Text search configuration; must match the GIN expression index in migrate.py
+TS_CONFIG = "english"
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return TOKEN_PATTERN.findall(text.casefold()) if text else []
+
+
+def trigrams(token: str) -> Set[str]:
+    """Trigrams of a token padded like pg_trgm (two spaces before, one after)."""
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def sql_literal(value: str):
+    """A constant rendered inline; the planner only matches an expression index on literals, not binds."""
+    return literal_column(f"'{value}'")
+
+
+def search_document():
+    """The weighted tsvector products are searched on (name A, category B, description C)."""
+    config, empty = sql_literal(TS_CONFIG), sql_literal("")
+    return (
+        func.setweight(func.to_tsvector(config, func.coalesce(Product.name, empty)), sql_literal("A"))
+        .op("||")(func.setweight(func.to_tsvector(config, func.coalesce(Product.category, empty)), sql_literal("B")))
+        .op("||")(func.setweight(func.to_tsvector(config, func.coalesce(Product.description, empty)), sql_literal("C")))
+    )
+
+
+def prefix_tsquery(query: str) -> Optional[str]:
+    """All terms must match; the last one may be a prefix (search-as-you-type)."""
+    terms = tokenize(query)
+    if not terms:
+        return None
+    return " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+
+
+class InvertedIndex:
+    """In-process full-text index over the catalog, for databases without tsvector.
+
+    Tokens map to postings of ``product_id -> field weight``. A query term
+    matches tokens exactly, by prefix (binary search over the sorted
+    vocabulary) and, when neither finds anything, by trigram similarity so
+    small typos still match. Every term must match; documents are ranked by
+    the summed weight of their best match per term.
+
+    The index is kept current incrementally: at most once per
+    ``check_interval`` it reads the catalog version and re-indexes only
+    the products changed since, as the price cache does. Indexing runs in
+    a worker thread; a full build fills a separate index that is swapped
+    in once complete, so searches never see a half-built one.
+    """
+
+    def __init__(
+        self,
+        check_interval: float = 1.0,
+        max_prefix_expansions: int = 200,
+        min_similarity: float = 0.3,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.check_interval = check_interval
+        self.max_prefix_expansions = max_prefix_expansions
+        self.min_similarity = min_similarity
+        self.clock = clock
+        self.version = -1
+        self._checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._documents: Dict[str, Set[str]] = {}
+        self._vocabulary: List[str] = []
+        self._trigrams: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def add(self, product_id: str, name: str, category: Optional[str] = None, description: Optional[str] = None):
+        """Index (or re-index) one product."""
+        weights: Dict[str, int] = {}
+        for field, text in (("name", name), ("category", category), ("description", description)):
+            for token in tokenize(text):
+                weights[token] = max(weights.get(token, 0), FIELD_WEIGHTS[field])
+
+        with self._lock:
+            self._remove(product_id)
+            for token, weight in weights.items():
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = {}
+                    self._vocabulary.insert(bisect_left(self._vocabulary, token), token)
+                    for gram in trigrams(token):
+                        self._trigrams.setdefault(gram, set()).add(token)
+                postings[product_id] = weight
+            self._documents[product_id] = set(weights)
+
+    def remove(self, product_id: str):
+        with self._lock:
+            self._remove(product_id)
+
+    def clear(self):
+        with self._lock:
+            self._postings.clear()
+            self._documents.clear()
+            self._vocabulary.clear()
+            self._trigrams.clear()
+            self.version = -1
+            self._checked_at = None
+
+    def search(self, query: str, limit: int = 20) -> List[str]:
+        """Product ids matching every term of ``query``, best first."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        with self._lock:
+            expanded = [
+                [(self._postings[token], closeness) for token, closeness in self._expand(term)]
+                for term in terms
+            ]
+            if not all(expanded):
+                return []
+
+            # Score the rarest term in full, then only look up its candidates in the others
+            expanded.sort(key=lambda postings: sum(len(p) for p, _ in postings))
+            scores = self._match(expanded[0])
+            for postings in expanded[1:]:
+                narrowed: Dict[str, int] = {}
+                for product_id, score in scores.items():
+                    best = max((closeness * p[product_id] for p, closeness in postings if product_id in p), default=0)
+                    if best:
+                        narrowed[product_id] = score + best
+                scores = narrowed
+                if not scores:
+                    return []
+        return [product_id for product_id, _ in heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))]
+
+    async def sync(self, db: AsyncSession, fresh: bool = False):
+        """Apply catalog changes since the indexed version, at most once per interval."""
+        now = self.clock()
+        if not fresh and self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
+        if self.version >= 0:
+            # Until the first build is published, every caller syncs rather than search an empty index
+            self._checked_at = now
+
+        version = await db.scalar(
+            select(CatalogVersion.version).where(CatalogVersion.id == CATALOG_VERSION_ID)
+        ) or 0
+        if version == self.version:
+            return
+
+        query = select(Product.id, Product.name, Product.category, Product.description, Product.active)
+        if 0 <= self.version < version:
+            rows = (await db.execute(query.where(Product.version > self.version))).all()
+            await asyncio.to_thread(self._apply, rows)
+        else:
+            # First build, or the catalog was reset: build aside, then swap in
+            rows = (await db.execute(query.where(Product.active == True))).all()  # noqa: E712
+            built = InvertedIndex()
+            await asyncio.to_thread(built._apply, rows)
+            self._publish(built)
+            self._checked_at = now
+        self.version = version
+        logger.info(f"Search index synced to catalog version {version} ({len(rows)} products changed)")
+
+    def _apply(self, rows: Iterable[Any]):
+        for row in rows:
+            if row.active:
+                self.add(row.id, row.name, row.category, row.description)
+            else:
+                self.remove(row.id)
+
+    def _publish(self, built: "InvertedIndex"):
+        with self._lock:
+            self._postings = built._postings
+            self._documents = built._documents
+            self._vocabulary = built._vocabulary
+            self._trigrams = built._trigrams
+
+    def _remove(self, product_id: str):
+        for token in self._documents.pop(product_id, ()):
+            postings = self._postings[token]
+            postings.pop(product_id, None)
+            if not postings:
+                del self._postings[token]
+                del self._vocabulary[bisect_left(self._vocabulary, token)]
+                for gram in trigrams(token):
+                    tokens = self._trigrams[gram]
+                    tokens.discard(token)
+                    if not tokens:
+                        del self._trigrams[gram]
+
+    @staticmethod
+    def _match(postings: List[Tuple[Dict[str, int], int]]) -> Dict[str, int]:
+        """Documents in any of a term's postings, with the best weight each earns."""
+        matches: Dict[str, int] = {}
+        for token_postings, closeness in postings:
+            for product_id, weight in token_postings.items():
+                score = closeness * weight
+                if score > matches.get(product_id, 0):
+                    matches[product_id] = score
+        return matches
+
+    def _expand(self, term: str) -> Iterable[Tuple[str, int]]:
+        expansions: List[Tuple[str, int]] = []
+        start = bisect_left(self._vocabulary, term)
+        for token in self._vocabulary[start:start + self.max_prefix_expansions]:
+            if not token.startswith(term):
+                break
+            expansions.append((token, EXACT if token == term else PREFIX))
+        if expansions or len(term) < 3:
+            return expansions
+
+        grams = trigrams(term)
+        shared: Dict[str, int] = {}
+        for gram in grams:
+            for token in self._trigrams.get(gram, ()):
+                shared[token] = shared.get(token, 0) + 1
+        return [
+            (token, FUZZY) for token, count in shared.items()
+            if count / (len(grams) + len(trigrams(token)) - count) >= self.min_similarity
+        ]
+
+
+search_index = InvertedIndex(check_interval=settings.SEARCH_INDEX_CHECK_INTERVAL)
+
+
+class SearchService:
+    """Product search: Postgres full-text search, or the in-process index elsewhere."""
+
+    def __init__(self, db: AsyncSession, index: Optional[InvertedIndex] = None):
+        self.db = db
+        self.index = index if index is not None else search_index
+
+    async def search(self, query: str, limit: int = 20) -> List[Any]:
+        """Active products matching ``query``, most relevant first."""
+        if self.db.get_bind().dialect.name == "postgresql":
+            return await self._search_postgres(query, limit)
+
+        await self.index.sync(self.db)
+        product_ids = self.index.search(query, limit)
+        if not product_ids:
+            return []
+        rows = (await self.db.execute(
+            self._product_columns().where(Product.id.in_(product_ids), Product.active == True)  # noqa: E712
+        )).all()
+        rank = {product_id: i for i, product_id in enumerate(product_ids)}
+        return sorted(rows, key=lambda row: rank[row.id])
+
+    async def _search_postgres(self, query: str, limit: int) -> List[Any]:
+        tsquery = prefix_tsquery(query)
+        if tsquery is None:
+            return []
+        return (await self.db.execute(self.postgres_query(tsquery, limit))).all()
+
+    @classmethod
+    def postgres_query(cls, tsquery: str, limit: int):
+        """Ranked tsvector match; the GIN expression index on ``search_document()`` serves the @@."""
+        document = search_document()
+        condition = func.to_tsquery(sql_literal(TS_CONFIG), tsquery)
+        return (
+            cls._product_columns()
+            .where(document.op("@@")(condition), Product.active == True)  # noqa: E712
+            .order_by(func.ts_rank(document, condition).desc(), Product.id)
+            .limit(limit)
+        )
+
+    @staticmethod
+    def _product_columns():
+        return select(
+            Product.id, Product.name, Product.description, Product.category, Product.price, Product.image_url
+        )
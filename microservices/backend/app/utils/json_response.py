@@ -0,0 +1,52 @@
+from decimal import Decimal
+from fastapi.responses import JSONResponse
+from app.models.money import Money
+from pydantic import BaseModel
+from typing import Any
+import orjson
+
+
+def encode_decimal(value: Decimal) -> str:
+    """Encode a Decimal as an exact fixed-point string, e.g. ``Decimal('59.98')`` -> ``'59.98'``.
+
+    Amounts are never routed through float, so no precision is lost and
+    exponent forms such as ``'1E+2'`` are written out as ``'100'``.
+    """
+    return format(value, "f")
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, Money):
+        return str(obj)
+    if isinstance(obj, Decimal):
+        return encode_decimal(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize response content to JSON bytes.
+
+    Pydantic models are dumped by pydantic-core in one call. Amounts are
+    :class:`~app.models.money.Money` integer cents, so they always carry
+    two decimal places and serialize as e.g. ``"59.98"``. Anything else
+    goes through orjson, with Money and Decimal written as exact strings.
+    """
+    if isinstance(content, BaseModel):
+        return content.model_dump_json().encode()
+    return orjson.dumps(content, default=_default)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response that skips ``jsonable_encoder`` and the stdlib encoder.
+
+    Return it directly from a route (``return FastJSONResponse(model)``)
+    to serialize the model once; when FastAPI builds it from a
+    ``response_model`` the already-encoded dict goes through orjson.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
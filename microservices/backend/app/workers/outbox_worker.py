@@ -0,0 +1,181 @@
+"""
+Outbox worker: delivers checkout side effects after the order is committed.
+
+Run it next to the API with ``python -m app.workers.outbox_worker``. The
+same process also returns stock from expired checkout reservations.
+"""
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.config.database import AsyncSessionLocal, init_database_credentials
+from app.config.settings import settings
+from app.models.outbox_models import OutboxEvent
+from app.services.order_effects import OrderCreatedHandler, StubEmailSender, StubPaymentGateway
+from app.workers.reservation_reaper import run_reservation_reaper
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import random
+import signal
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+def backoff_delay(attempts: int, base: float, cap: float) -> float:
+    """Exponential backoff with jitter: half fixed, half random, capped."""
+    delay = min(cap, base * 2 ** (attempts - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class OutboxWorker:
+    """Drains ``outbox_events`` in batches.
+
+    Each batch is claimed with SELECT ... FOR UPDATE SKIP LOCKED and leased
+    by pushing ``available_at`` forward, so several workers can run against
+    Postgres without handling the same event. Events in a batch run
+    concurrently (up to ``concurrency``); successes are marked ``done`` in
+    one UPDATE and failures are rescheduled with backoff, or parked as
+    ``failed`` after ``max_attempts``. Delivery is at-least-once, so
+    handlers must be safe to repeat.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        handlers: Dict[str, Handler],
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        backoff_base: Optional[float] = None,
+        backoff_max: Optional[float] = None,
+        lease_seconds: Optional[float] = None,
+        clock: Callable[[], float] = time.time
+    ):
+        self.session_factory = session_factory
+        self.handlers = handlers
+        self.batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+        self.concurrency = concurrency or settings.OUTBOX_CONCURRENCY
+        self.max_attempts = max_attempts or settings.OUTBOX_MAX_ATTEMPTS
+        self.backoff_base = backoff_base if backoff_base is not None else settings.OUTBOX_BACKOFF_BASE
+        self.backoff_max = backoff_max if backoff_max is not None else settings.OUTBOX_BACKOFF_MAX
+        self.lease_seconds = lease_seconds if lease_seconds is not None else settings.OUTBOX_LEASE_SECONDS
+        self.clock = clock
+        self.delivered = 0
+        self.failed = 0
+
+    async def claim_batch(self) -> List[Tuple[int, str, Dict[str, Any], int]]:
+        """Lease up to ``batch_size`` due events; returns (id, type, payload, attempts)."""
+        now = self.clock()
+        async with self.session_factory() as db:
+            rows = (await db.execute(
+                select(OutboxEvent.id, OutboxEvent.event_type, OutboxEvent.payload, OutboxEvent.attempts)
+                .where(OutboxEvent.status == "pending", OutboxEvent.available_at <= now)
+                .order_by(OutboxEvent.available_at, OutboxEvent.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )).all()
+            if rows:
+                await db.execute(
+                    update(OutboxEvent)
+                    .where(OutboxEvent.id.in_([row.id for row in rows]))
+                    .values(available_at=now + self.lease_seconds)
+                )
+            await db.commit()
+        return [tuple(row) for row in rows]
+
+    async def run_once(self) -> int:
+        """Claim and deliver one batch; returns how many events were claimed."""
+        batch = await self.claim_batch()
+        if not batch:
+            return 0
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def deliver(event_type: str, payload: Dict[str, Any]) -> Optional[str]:
+            handler = self.handlers.get(event_type)
+            if handler is None:
+                return f"No handler for event type {event_type}"
+            async with semaphore:
+                try:
+                    await handler(payload)
+                    return None
+                except Exception as e:
+                    return f"{type(e).__name__}: {e}"
+
+        errors = await asyncio.gather(*(deliver(event_type, payload) for _, event_type, payload, _ in batch))
+        await self._record_results(batch, errors)
+        return len(batch)
+
+    async def _record_results(self, batch, errors: List[Optional[str]]):
+        now = self.clock()
+        done = [event_id for (event_id, _, _, _), error in zip(batch, errors) if error is None]
+        async with self.session_factory() as db:
+            if done:
+                await db.execute(
+                    update(OutboxEvent)
+                    .where(OutboxEvent.id.in_(done))
+                    .values(status="done", attempts=OutboxEvent.attempts + 1, last_error=None)
+                )
+            for (event_id, event_type, _, attempts), error in zip(batch, errors):
+                if error is None:
+                    continue
+                attempts += 1
+                if attempts >= self.max_attempts:
+                    logger.error(f"Outbox event {event_id} ({event_type}) failed permanently: {error}")
+                    values = {"status": "failed"}
+                    self.failed += 1
+                else:
+                    delay = backoff_delay(attempts, self.backoff_base, self.backoff_max)
+                    logger.warning(f"Outbox event {event_id} ({event_type}) failed, retrying in {delay:.1f}s: {error}")
+                    values = {"available_at": now + delay}
+                await db.execute(
+                    update(OutboxEvent)
+                    .where(OutboxEvent.id == event_id)
+                    .values(attempts=attempts, last_error=error[:1000], **values)
+                )
+            await db.commit()
+        self.delivered += len(done)
+
+    async def run(self, stop: asyncio.Event, poll_interval: Optional[float] = None):
+        """Deliver batches until ``stop`` is set, sleeping only when idle."""
+        poll_interval = poll_interval if poll_interval is not None else settings.OUTBOX_POLL_INTERVAL
+        while not stop.is_set():
+            try:
+                claimed = await self.run_once()
+            except Exception as e:
+                logger.error(f"Outbox worker batch failed: {e}")
+                claimed = 0
+            if claimed < self.batch_size:
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+
+def build_worker(session_factory: async_sessionmaker = AsyncSessionLocal) -> OutboxWorker:
+    """Worker wired to the local payment and email stubs."""
+    handlers = {
+        "order.created": OrderCreatedHandler(session_factory, StubPaymentGateway(), StubEmailSender())
+    }
+    return OutboxWorker(session_factory, handlers)
+
+
+async def main():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await init_database_credentials()
+    worker = build_worker()
+    logger.info("Outbox worker started")
+    await asyncio.gather(worker.run(stop), run_reservation_reaper(AsyncSessionLocal, stop))
+    logger.info(f"Outbox worker stopped ({worker.delivered} delivered, {worker.failed} failed)")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
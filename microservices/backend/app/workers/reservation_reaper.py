@@ -0,0 +1,57 @@
+"""
+Returns stock held by checkout reservations that were never confirmed, and
+deletes expired Idempotency-Key records on the same schedule.
+
+Runs inside the outbox worker process (see ``app.workers.outbox_worker``).
+"""
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.config.settings import settings
+from app.services.idempotency import IdempotencyStore
+from app.services.inventory_service import ReservationService
+from typing import Optional
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def release_expired_once(session_factory: async_sessionmaker, limit: int = 500) -> int:
+    """Release one batch of expired reservations; returns how many."""
+    async with session_factory() as db:
+        released = await ReservationService(db).release_expired(limit)
+        await db.commit()
+    return released
+
+
+async def purge_idempotency_keys_once(session_factory: async_sessionmaker) -> int:
+    """Delete expired idempotency keys; returns how many."""
+    async with session_factory() as db:
+        return await IdempotencyStore(db).purge_expired()
+
+
+async def run_reservation_reaper(
+    session_factory: async_sessionmaker,
+    stop: asyncio.Event,
+    interval: Optional[float] = None,
+    limit: int = 500
+):
+    """Sweep expired reservations and idempotency keys every ``interval`` seconds until ``stop`` is set."""
+    interval = interval if interval is not None else settings.INVENTORY_RELEASE_INTERVAL
+    while not stop.is_set():
+        try:
+            # Keep going while full batches come back
+            while await release_expired_once(session_factory, limit) == limit:
+                pass
+        except Exception as e:
+            logger.error(f"Reservation sweep failed: {e}")
+        try:
+            purged = await purge_idempotency_keys_once(session_factory)
+            if purged:
+                logger.info(f"Purged {purged} expired idempotency keys")
+        except Exception as e:
+            logger.error(f"Idempotency key purge failed: {e}")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
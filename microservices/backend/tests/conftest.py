@@ -0,0 +1,165 @@
+"""
+Shared fixtures for Carthub Backend tests
+"""
+
+import pytest
+import pytest_asyncio
+from contextlib import contextmanager
+from fastapi import FastAPI
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.config.database import Base, get_async_db
+from app.models import cart_models, catalog_models, idempotency_models, inventory_models, order_models, outbox_models  # noqa: F401  (registers tables on Base)
+from app.routes import cart_routes, health_routes, product_routes
+from app.services.cart_cache import cart_cache
+from app.services.catalog_service import CatalogService, price_cache, product_pages
+from app.services.search_service import search_index
+
+
+class FakeClock:
+    """Settable clock for code that takes a ``clock`` callable, starting at ``start``."""
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRedis:
+    """Minimal asyncio Redis-protocol fake for the shared cache tier."""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, name):
+        return self.data.get(name)
+
+    async def set(self, name, value, ex=None):
+        self.data[name] = value.encode() if isinstance(value, str) else value
+
+    async def delete(self, *names):
+        return sum(1 for name in names if self.data.pop(name, None) is not None)
+
+
+async def add_to_catalog(db, prices):
+    """Put products in the catalog at the given prices, e.g. ``{"a": "10.00"}``; checkout only charges catalog prices."""
+    await CatalogService(db).upsert_products([
+        {"id": product_id, "name": f"Product {product_id}", "price": price} for product_id, price in prices.items()
+    ])
+
+
+@pytest.fixture(autouse=True)
+def reset_cart_cache():
+    """Keep the process-wide caches and search index from leaking between tests."""
+    cart_cache.local.clear()
+    price_cache.clear()
+    product_pages.clear()
+    search_index.clear()
+    yield
+    cart_cache.local.clear()
+    price_cache.clear()
+    product_pages.clear()
+    search_index.clear()
+
+
+@pytest.fixture
+def pinned_price_cache(monkeypatch):
+    """Check the catalog version only on first use (or when forced), so statement counts are stable."""
+    monkeypatch.setattr(price_cache, "check_interval", float("inf"))
+    return price_cache
+
+
+@pytest.fixture
+def fake_redis():
+    return FakeRedis()
+
+
+@pytest_asyncio.fixture
+async def db_engine():
+    """In-memory SQLite engine with the schema created."""
+    engine = create_async_engine(
+        "sqlite+aiosqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def concurrent_session_factory(tmp_path):
+    """Session factory over a file SQLite database with one connection per session.
+
+    Unlike ``db_engine`` this does not share a single connection, so
+    concurrent sessions really contend for the database lock.
+    """
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'carts.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.fixture
+def session_factory(db_engine):
+    """Session factory bound to the test engine."""
+    return async_sessionmaker(db_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+@pytest_asyncio.fixture
+async def db_session(session_factory):
+    """Async session against the test database."""
+    async with session_factory() as session:
+        yield session
+
+
+@pytest.fixture
+def assert_max_queries(db_engine):
+    """Context manager that fails if the block issues more than ``limit`` statements."""
+
+    @contextmanager
+    def _assert_max_queries(limit):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db_engine.sync_engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(db_engine.sync_engine, "before_cursor_execute", record)
+        assert len(statements) <= limit, (
+            f"Expected at most {limit} statements, got {len(statements)}:\n" + "\n".join(statements)
+        )
+
+    return _assert_max_queries
+
+
+@pytest.fixture
+def api_app(session_factory):
+    """FastAPI app exposing the database-backed routers."""
+    app = FastAPI()
+    app.include_router(health_routes.router, prefix="/health")
+    app.include_router(cart_routes.router, prefix="/api/v1/cart")
+    app.include_router(product_routes.router, prefix="/api/v1/products")
+
+    async def override_get_async_db():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    return app
+
+
+@pytest_asyncio.fixture
+async def api_client(api_app):
+    """HTTP client for the database-backed routers."""
+    async with AsyncClient(app=api_app, base_url="http://test") as client:
+        yield client
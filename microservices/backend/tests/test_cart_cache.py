@@ -0,0 +1,216 @@
+"""
+Test suite for the read-through cart cache
+"""
+
+import pytest
+import time
+from decimal import Decimal
+
+from app.models.schemas import CartItemRequest, CartResponse
+from app.services.cart_cache import CachedCart, CartCache, LocalCartCache, RedisCartCache
+from app.services.cart_service import CartService
+
+
+def make_cart(customer_id="customer-123", version=1):
+    return CachedCart.from_cart(
+        CartResponse(customer_id=customer_id, total_items=0, subtotal=Decimal("0.00"), items=[], version=version)
+    )
+
+
+def make_request(product_id="prod-1", quantity=1):
+    return CartItemRequest(
+        customer_id="customer-123",
+        product_id=product_id,
+        product_name="Test Product",
+        price=Decimal("10.00"),
+        quantity=quantity
+    )
+
+
+class TestLocalCartCache:
+    """Test the in-process TTL + LRU tier"""
+
+    def test_entries_expire(self):
+        """Test that entries are dropped after the TTL"""
+        cache = LocalCartCache(ttl=0.01)
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+        time.sleep(0.02)
+        assert cache.get("a") is None
+
+    def test_least_recently_used_is_evicted(self):
+        """Test that the LRU entry goes first when full"""
+        cache = LocalCartCache(max_entries=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+
+class TestCartCache:
+    """Test the tiered cache"""
+
+    @pytest.mark.asyncio
+    async def test_hit_and_miss_counters(self):
+        """Test that lookups are counted"""
+        cache = CartCache(LocalCartCache())
+        assert await cache.get("customer-123") is None
+        await cache.set("customer-123", make_cart())
+        assert await cache.get("customer-123") is not None
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_ratio"] == 0.5
+
+    @pytest.mark.asyncio
+    async def test_remote_tier_backfills_local(self, fake_redis):
+        """Test that a Redis hit repopulates the in-process tier"""
+        remote = RedisCartCache(fake_redis)
+        await CartCache(LocalCartCache(), remote).set("customer-123", make_cart())
+
+        fresh_pod = CartCache(LocalCartCache(), remote)
+        cached = await fresh_pod.get("customer-123")
+        assert cached.cart.customer_id == "customer-123"
+        assert cached.etag == '"1.0"'
+        assert cached.body == make_cart().body
+        assert fresh_pod.stats()["remote_hits"] == 1
+        assert fresh_pod.local.get("customer-123") is not None
+
+    @pytest.mark.asyncio
+    async def test_remote_tier_keeps_catalog_version(self, fake_redis):
+        """Test that the catalog version a cart was priced at survives Redis"""
+        remote = RedisCartCache(fake_redis)
+        cart = make_cart()
+        await remote.set("customer-123", CachedCart(cart.body, cart.etag, catalog_version=7))
+
+        cached = await remote.get("customer-123")
+        assert (cached.etag, cached.catalog_version, cached.body) == (cart.etag, 7, cart.body)
+
+    @pytest.mark.asyncio
+    async def test_remote_errors_are_misses(self):
+        """Test that an unavailable Redis degrades to a miss"""
+        class BrokenRedis:
+            async def get(self, name):
+                raise ConnectionError("down")
+
+        cache = CartCache(LocalCartCache(), RedisCartCache(BrokenRedis()))
+        assert await cache.get("customer-123") is None
+
+
+class TestCachedCart:
+    """Test serialized snapshots"""
+
+    def test_etag_tracks_cart_and_catalog_version(self):
+        """Test that the ETag is the cart version and the catalog version it was priced at"""
+        assert make_cart(version=3).etag == '"3.0"'
+        assert make_cart(version=3).etag != make_cart(version=4).etag
+        cart = make_cart(version=3).cart
+        assert CachedCart.from_cart(cart, catalog_version=17).etag == '"3.17"'
+
+    def test_cart_is_parsed_from_body(self):
+        """Test that a bytes-only snapshot can rebuild the cart model"""
+        cached = CachedCart(make_cart().body, '"1"')
+        assert cached.cart.customer_id == "customer-123"
+        assert cached.cart.subtotal == Decimal("0.00")
+
+
+class TestCartServiceCaching:
+    """Test cache integration in CartService"""
+
+    @pytest.mark.asyncio
+    async def test_repeat_reads_skip_the_database(self, db_session, fake_redis, assert_max_queries, pinned_price_cache):
+        """Test that a cached cart is served without queries"""
+        service = CartService(db_session, CartCache(LocalCartCache(), RedisCartCache(fake_redis)))
+        await service.add_item_to_cart(make_request())
+        await service.get_cart("customer-123")
+
+        with assert_max_queries(0):
+            cart = await service.get_cart("customer-123")
+        assert cart.total_items == 1
+        assert service.cache.stats()["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_every_mutation_invalidates(self, db_session, fake_redis):
+        """Test that reads after writes never see a stale cart"""
+        service = CartService(db_session, CartCache(LocalCartCache(), RedisCartCache(fake_redis)))
+
+        await service.add_item_to_cart(make_request(product_id="a"))
+        assert (await service.get_cart("customer-123")).total_items == 1
+
+        await service.add_item_to_cart(make_request(product_id="b", quantity=2))
+        assert (await service.get_cart("customer-123")).total_items == 3
+
+        await service.update_item_quantity("customer-123", "b", 5)
+        assert (await service.get_cart("customer-123")).total_items == 6
+
+        await service.remove_item_from_cart("customer-123", "a")
+        assert (await service.get_cart("customer-123")).total_items == 5
+
+        await service.clear_cart("customer-123")
+        assert (await service.get_cart("customer-123")).total_items == 0
+        assert service.cache.stats()["invalidations"] == 5
+
+    @pytest.mark.asyncio
+    async def test_fill_racing_a_write_is_dropped(self, db_session, session_factory, fake_redis):
+        """Test a snapshot read before a write is not cached after the write invalidates"""
+        cache = CartCache(LocalCartCache(), RedisCartCache(fake_redis))
+        service = CartService(db_session, cache)
+        await service.add_item_to_cart(make_request())
+        read_cart = service._get_cart
+
+        async def read_then_write(customer_id):
+            cart = await read_cart(customer_id)
+            async with session_factory() as other:
+                await CartService(other, cache).add_item_to_cart(make_request())
+            return cart
+
+        service._get_cart = read_then_write
+        snapshot = await service.get_cart_snapshot("customer-123")
+        assert snapshot.version == 1
+
+        assert await cache.get("customer-123") is None
+        assert fake_redis.data == {}
+        assert cache.stats()["stale_fills"] == 1
+
+        del service._get_cart
+        assert (await service.get_cart_snapshot("customer-123")).cart.total_items == 2
+
+    @pytest.mark.asyncio
+    async def test_fill_never_replaces_a_newer_version(self):
+        """Test an older snapshot does not overwrite a newer cached one"""
+        cache = CartCache(LocalCartCache())
+        token = cache.fill_token()
+        await cache.set("customer-123", make_cart(version=2), cache.fill_token())
+
+        await cache.set("customer-123", make_cart(version=1), token)
+        assert (await cache.get("customer-123")).version == 2
+        assert cache.stats()["stale_fills"] == 1
+
+    @pytest.mark.asyncio
+    async def test_forgotten_invalidations_still_drop_fills(self):
+        """Test a fill stays guarded after its cart's invalidation is no longer remembered"""
+        cache = CartCache(LocalCartCache(max_entries=1))
+        token = cache.fill_token()
+        await cache.invalidate("a")
+        await cache.invalidate("b")
+
+        await cache.set("a", make_cart("a"), token)
+        assert await cache.get("a") is None
+        await cache.set("a", make_cart("a"), cache.fill_token())
+        assert await cache.get("a") is not None
+
+    @pytest.mark.asyncio
+    async def test_other_pod_sees_writes_with_local_tier_off(self, db_session):
+        """Test that with TTL 0 a pod never serves a cart another pod has since changed"""
+        pod_a = CartService(db_session, CartCache(LocalCartCache(ttl=0)))
+        pod_b = CartService(db_session, CartCache(LocalCartCache(ttl=0)))
+        await pod_a.add_item_to_cart(make_request())
+        assert (await pod_b.get_cart("customer-123")).total_items == 1
+
+        await pod_a.add_item_to_cart(make_request())
+        assert (await pod_b.get_cart("customer-123")).total_items == 2
+        assert len(pod_b.cache.local) == 0
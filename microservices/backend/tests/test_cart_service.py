@@ -0,0 +1,569 @@
+"""
+Test suite for the database-backed cart service and routes
+"""
+
+import asyncio
+import pytest
+from decimal import Decimal
+from sqlalchemy.dialects import postgresql
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+
+from app.models.order_models import Order, OrderItem
+from app.models.schemas import BulkCartItemsRequest, CartItemRequest
+from app.services.cart_cache import CartCache, LocalCartCache, RedisCartCache, cart_cache
+from app.services.cart_service import CartService, CartVersionConflict, is_retryable
+from conftest import add_to_catalog
+
+
+def make_request(customer_id="customer-123", product_id="prod-1", price="29.99", quantity=2):
+    return CartItemRequest(
+        customer_id=customer_id,
+        product_id=product_id,
+        product_name=f"Product {product_id}",
+        price=Decimal(price),
+        quantity=quantity
+    )
+
+
+class TestCartService:
+    """Test CartService against an async SQLite database"""
+
+    @pytest.mark.asyncio
+    async def test_get_missing_cart_is_empty(self, db_session):
+        """Test that an unknown customer gets an empty cart"""
+        cart = await CartService(db_session).get_cart("nobody")
+        assert cart.items == []
+        assert cart.total_items == 0
+        assert cart.subtotal == Decimal("0.00")
+
+    @pytest.mark.asyncio
+    async def test_add_item_merges_quantity(self, db_session):
+        """Test that adding the same product twice merges the line"""
+        service = CartService(db_session)
+        await service.add_item_to_cart(make_request(quantity=2))
+        cart = await service.add_item_to_cart(make_request(quantity=3))
+
+        assert len(cart.items) == 1
+        assert cart.items[0].quantity == 5
+        assert cart.total_items == 5
+        assert cart.subtotal == Decimal("149.95")
+
+    def test_postgres_add_item_is_one_statement(self):
+        """Test that the Postgres path upserts cart and line together"""
+        stmt = CartService(None)._pg_add_item_statement(make_request())
+        sql = str(stmt.compile(dialect=postgresql.dialect()))
+        assert sql.startswith("WITH upserted_cart AS")
+        assert "ON CONFLICT (customer_id) DO UPDATE" in sql
+        assert "quantity = (cart_items.quantity + excluded.quantity)" in sql
+
+    @pytest.mark.asyncio
+    async def test_update_and_remove_item(self, db_session):
+        """Test quantity updates and removals"""
+        service = CartService(db_session)
+        await service.add_item_to_cart(make_request(product_id="a", price="10.00", quantity=1))
+        await service.add_item_to_cart(make_request(product_id="b", price="5.00", quantity=1))
+
+        cart = await service.update_item_quantity("customer-123", "a", 4)
+        assert cart.subtotal == Decimal("45.00")
+
+        cart = await service.remove_item_from_cart("customer-123", "b")
+        assert [item.product_id for item in cart.items] == ["a"]
+
+        with pytest.raises(ValueError, match="not found"):
+            await service.update_item_quantity("customer-123", "b", 2)
+
+    @pytest.mark.asyncio
+    async def test_cart_read_issues_at_most_two_statements(self, db_session, assert_max_queries):
+        """Test that reading a large cart does not lazy load per line"""
+        service = CartService(db_session)
+        for i in range(50):
+            await service.add_item_to_cart(make_request(product_id=f"sku-{i}", quantity=1))
+        db_session.expunge_all()
+
+        with assert_max_queries(2):
+            cart = await service.get_cart("customer-123")
+
+        assert len(cart.items) == 50
+        assert cart.total_items == 50
+        assert cart.subtotal == Decimal("1499.50")
+
+    @pytest.mark.asyncio
+    async def test_mutations_read_back_in_one_query(self, db_session, assert_max_queries, pinned_price_cache):
+        """Test that mutations do not add extra reads before the cart snapshot"""
+        service = CartService(db_session)
+        await service.add_item_to_cart(make_request(product_id="a"))
+
+        # catalog price lookup (new product only), version bump, line write, cart snapshot
+        with assert_max_queries(4):
+            await service.add_item_to_cart(make_request(product_id="b"))
+        with assert_max_queries(3):
+            await service.update_item_quantity("customer-123", "a", 5)
+        with assert_max_queries(3):
+            await service.remove_item_from_cart("customer-123", "b")
+
+    @pytest.mark.asyncio
+    async def test_clear_cart(self, db_session):
+        """Test that clearing removes every line"""
+        service = CartService(db_session)
+        await service.add_item_to_cart(make_request())
+        assert await service.clear_cart("customer-123") is True
+
+        cart = await service.get_cart("customer-123")
+        assert cart.items == []
+        assert cart.version == 2
+
+
+class TestCartVersioning:
+    """Test cart versions and compare-and-swap writes"""
+
+    @pytest.mark.asyncio
+    async def test_every_mutation_bumps_version(self, db_session):
+        """Test that the version counts writes and survives clearing"""
+        service = CartService(db_session)
+        assert (await service.get_cart("customer-123")).version == 0
+
+        cart = await service.add_item_to_cart(make_request(product_id="a"))
+        assert cart.version == 1
+        cart = await service.update_item_quantity("customer-123", "a", 3)
+        assert cart.version == 2
+        cart = await service.remove_item_from_cart("customer-123", "missing")
+        assert cart.version == 2
+        await service.clear_cart("customer-123")
+        cart = await service.add_item_to_cart(make_request(product_id="b"))
+        assert cart.version == 4
+
+    @pytest.mark.asyncio
+    async def test_expected_version_is_compare_and_swap(self, db_session):
+        """Test that a stale expected version is rejected and changes nothing"""
+        service = CartService(db_session)
+        cart = await service.add_item_to_cart(make_request(product_id="a"), expected_version=0)
+        assert cart.version == 1
+
+        with pytest.raises(CartVersionConflict):
+            await service.add_item_to_cart(make_request(product_id="b"), expected_version=0)
+
+        cart = await service.update_item_quantity("customer-123", "a", 7, expected_version=1)
+        assert cart.version == 2
+
+        with pytest.raises(CartVersionConflict):
+            await service.update_item_quantity("customer-123", "a", 1, expected_version=1)
+        with pytest.raises(CartVersionConflict):
+            await service.clear_cart("customer-123", expected_version=1)
+
+        cart = await service.get_cart("customer-123")
+        assert [(item.product_id, item.quantity) for item in cart.items] == [("a", 7)]
+
+    def test_postgres_version_check_is_in_the_update(self):
+        """Test that the Postgres add path bumps the version in the same statement"""
+        stmt = CartService(None)._pg_add_item_statement(make_request())
+        sql = str(stmt.compile(dialect=postgresql.dialect()))
+        assert "SET version = (carts.version + " in sql
+
+
+class TestWriteRetry:
+    """Test retries of transient write failures"""
+
+    def test_retryable_errors(self):
+        """Test which database errors are retried"""
+        class PgError(Exception):
+            def __init__(self, pgcode):
+                self.pgcode = pgcode
+
+        assert is_retryable(OperationalError("UPDATE carts", {}, PgError("40P01")))
+        assert is_retryable(OperationalError("UPDATE carts", {}, PgError("40001")))
+        assert is_retryable(OperationalError("UPDATE carts", {}, Exception("database is locked")))
+        assert not is_retryable(OperationalError("UPDATE carts", {}, PgError("23505")))
+        assert not is_retryable(CartVersionConflict("customer-123", 1))
+
+    @pytest.mark.asyncio
+    async def test_locked_database_is_retried(self, db_session, monkeypatch):
+        """Test that a lock failure is retried and the write still lands once"""
+        service = CartService(db_session)
+        claim = service._claim_version
+        failures = iter([OperationalError("UPDATE carts", {}, Exception("database is locked"))])
+
+        async def flaky_claim(customer_id, expected_version):
+            error = next(failures, None)
+            if error is not None:
+                raise error
+            await claim(customer_id, expected_version)
+
+        monkeypatch.setattr(service, "_claim_version", flaky_claim)
+        cart = await service.add_item_to_cart(make_request(quantity=1))
+        assert cart.items[0].quantity == 1
+        assert cart.version == 1
+
+
+class TestCartConcurrency:
+    """Stress concurrent writers against one cart on a file database"""
+
+    WRITERS = 40
+
+    @pytest.mark.asyncio
+    async def test_concurrent_increments_are_not_lost(self, concurrent_session_factory):
+        """Test that parallel adds of the same product all land"""
+        cache = CartCache(LocalCartCache())
+
+        async def add_one():
+            async with concurrent_session_factory() as session:
+                await CartService(session, cache).add_item_to_cart(make_request(quantity=1))
+
+        await asyncio.gather(*(add_one() for _ in range(self.WRITERS)))
+
+        async with concurrent_session_factory() as session:
+            cart = await CartService(session, cache).get_cart("customer-123")
+        assert cart.items[0].quantity == self.WRITERS
+        assert cart.version == self.WRITERS
+
+    @pytest.mark.asyncio
+    async def test_read_modify_write_with_if_match_loses_nothing(self, concurrent_session_factory):
+        """Test that client-side increments guarded by the version never overwrite each other"""
+        cache = CartCache(LocalCartCache(ttl=0))
+        async with concurrent_session_factory() as session:
+            await CartService(session, cache).add_item_to_cart(make_request(quantity=1))
+
+        conflicts = 0
+
+        async def increment():
+            nonlocal conflicts
+            while True:
+                async with concurrent_session_factory() as session:
+                    service = CartService(session, cache)
+                    cart = await service.get_cart("customer-123")
+                    try:
+                        await service.update_item_quantity(
+                            "customer-123", "prod-1", cart.items[0].quantity + 1, expected_version=cart.version
+                        )
+                        return
+                    except CartVersionConflict:
+                        conflicts += 1
+                        await asyncio.sleep(0)
+
+        await asyncio.gather(*(increment() for _ in range(self.WRITERS)))
+
+        async with concurrent_session_factory() as session:
+            cart = await CartService(session, cache).get_cart("customer-123")
+        assert cart.items[0].quantity == 1 + self.WRITERS
+        assert cart.version == 1 + self.WRITERS
+        assert conflicts > 0
+
+
+def make_line(product_id="prod-1", price="10.00", quantity=1):
+    return {
+        "product_id": product_id,
+        "product_name": f"Product {product_id}",
+        "price": price,
+        "quantity": quantity
+    }
+
+
+class TestBulkCartItems:
+    """Test applying many lines in one transaction"""
+
+    @pytest.mark.asyncio
+    async def test_batch_is_one_upsert(self, db_session, assert_max_queries, pinned_price_cache):
+        """Test that a batch of lines costs a fixed number of statements"""
+        service = CartService(db_session)
+        request = BulkCartItemsRequest(
+            customer_id="customer-123",
+            items=[make_line(f"sku-{i}") for i in range(100)]
+        )
+
+        # catalog version check (first use), one price lookup for all lines,
+        # version bump, upsert, cart snapshot
+        with assert_max_queries(5):
+            cart, failed = await service.add_items_to_cart(request)
+
+        assert failed == []
+        assert len(cart.items) == 100
+        assert cart.subtotal == Decimal("1000.00")
+
+    @pytest.mark.asyncio
+    async def test_add_and_set_modes(self, db_session):
+        """Test that add merges quantities and set replaces them, including repeats in one batch"""
+        service = CartService(db_session)
+        await service.add_item_to_cart(make_request(product_id="a", price="10.00", quantity=2))
+
+        cart, _ = await service.add_items_to_cart(BulkCartItemsRequest(
+            customer_id="customer-123",
+            items=[make_line("a", quantity=1), make_line("b"), make_line("a", quantity=3)]
+        ))
+        assert {item.product_id: item.quantity for item in cart.items} == {"a": 6, "b": 1}
+
+        cart, _ = await service.add_items_to_cart(BulkCartItemsRequest(
+            customer_id="customer-123",
+            items=[make_line("a", quantity=4), make_line("a", quantity=1)],
+            mode="set"
+        ))
+        assert {item.product_id: item.quantity for item in cart.items} == {"a": 1, "b": 1}
+
+    @pytest.mark.asyncio
+    async def test_invalid_lines_are_reported(self, db_session):
+        """Test partial failure: bad lines are skipped and listed"""
+        service = CartService(db_session)
+        cart, failed = await service.add_items_to_cart(BulkCartItemsRequest(
+            customer_id="customer-123",
+            items=[
+                make_line("ok"),
+                make_line("bad-qty", quantity=0),
+                {"product_id": "no-name", "price": "1.00", "quantity": 1},
+                {**make_line("other"), "customer_id": "someone-else"}
+            ]
+        ))
+
+        assert [item.product_id for item in cart.items] == ["ok"]
+        assert [(f.index, f.product_id) for f in failed] == [(1, "bad-qty"), (2, "no-name"), (3, "other")]
+        assert "quantity" in failed[0].error
+        assert "product_name" in failed[1].error
+
+    @pytest.mark.asyncio
+    async def test_get_carts_loads_in_batches(self, db_session, assert_max_queries, pinned_price_cache):
+        """Test many carts are read a batch per query with one price lookup"""
+        service = CartService(db_session)
+        for c in range(5):
+            await service.add_items_to_cart(BulkCartItemsRequest(
+                customer_id=f"bulk-{c}",
+                items=[make_line(f"sku-{i}", quantity=c + 1) for i in range(3)]
+            ))
+
+        # three cart queries of two, one price lookup
+        with assert_max_queries(4):
+            carts = await service.get_carts([f"bulk-{c}" for c in range(5)] + ["nobody", "bulk-0"], batch_size=2)
+
+        assert sorted(carts) == [f"bulk-{c}" for c in range(5)]
+        assert carts["bulk-4"].total_items == 15
+        assert carts["bulk-4"].subtotal == Decimal("150.00")
+
+
+class TestCheckout:
+    """Test transactional checkout into orders"""
+
+    @pytest.mark.asyncio
+    async def test_checkout_persists_order_and_empties_cart(self, db_session):
+        """Test that the cart lines are copied into an order"""
+        await add_to_catalog(db_session, {"a": "10.00", "b": "2.50"})
+        service = CartService(db_session)
+        await service.add_item_to_cart(make_request(product_id="a", price="10.00", quantity=2))
+        await service.add_item_to_cart(make_request(product_id="b", price="2.50", quantity=1))
+
+        order = await service.checkout("customer-123")
+        assert order.total_amount == Decimal("22.50")
+        assert order.status == "pending"
+
+        lines = (await db_session.execute(
+            select(OrderItem.product_id, OrderItem.price, OrderItem.quantity)
+            .where(OrderItem.order_id == order.id)
+            .order_by(OrderItem.id)
+        )).all()
+        assert lines == [("a", Decimal("10.00"), 2), ("b", Decimal("2.50"), 1)]
+
+        cart = await service.get_cart("customer-123")
+        assert cart.items == []
+        assert cart.version == 3
+
+    @pytest.mark.asyncio
+    async def test_checkout_cost_does_not_grow_with_lines(self, db_session, assert_max_queries, pinned_price_cache):
+        """Test that checkout issues a fixed number of statements"""
+        await add_to_catalog(db_session, {f"sku-{i}": "10.00" for i in range(50)})
+        service = CartService(db_session)
+        for customer_id, lines in [("small", 1), ("large", 50)]:
+            await service.add_items_to_cart(BulkCartItemsRequest(
+                customer_id=customer_id,
+                items=[make_line(f"sku-{i}") for i in range(lines)]
+            ))
+            # lock + read, catalog version check, version bump, order, order lines,
+            # stock lookup, outbox event, clear cart
+            with assert_max_queries(8):
+                await service.checkout(customer_id)
+
+    @pytest.mark.asyncio
+    async def test_checkout_twice_creates_one_order(self, db_session):
+        """Test that a repeated checkout finds an empty cart"""
+        await add_to_catalog(db_session, {"prod-1": "29.99"})
+        service = CartService(db_session)
+        await service.add_item_to_cart(make_request())
+        await service.checkout("customer-123")
+
+        with pytest.raises(ValueError, match="empty cart"):
+            await service.checkout("customer-123")
+        assert (await db_session.execute(select(func.count()).select_from(Order))).scalar_one() == 1
+
+    @pytest.mark.asyncio
+    async def test_checkout_honours_expected_version(self, db_session):
+        """Test that a stale If-Match version aborts checkout without an order"""
+        await add_to_catalog(db_session, {"a": "29.99", "b": "29.99"})
+        service = CartService(db_session)
+        await service.add_item_to_cart(make_request(product_id="a"))
+        await service.add_item_to_cart(make_request(product_id="b"))
+
+        with pytest.raises(CartVersionConflict):
+            await service.checkout("customer-123", expected_version=1)
+        assert (await db_session.execute(select(func.count()).select_from(Order))).scalar_one() == 0
+
+        order = await service.checkout("customer-123", expected_version=2)
+        assert order.id is not None
+
+    def test_postgres_locks_cart_row(self):
+        """Test that checkout reads the cart with FOR UPDATE on the cart row only"""
+        sql = str(CartService._locked_cart_query("customer-123").compile(dialect=postgresql.dialect()))
+        assert sql.endswith("FOR UPDATE OF carts")
+
+    @pytest.mark.asyncio
+    async def test_concurrent_double_submit(self, concurrent_session_factory):
+        """Test that simultaneous checkouts of one cart create exactly one order"""
+        cache = CartCache(LocalCartCache())
+        async with concurrent_session_factory() as session:
+            await add_to_catalog(session, {"prod-1": "29.99"})
+            await CartService(session, cache).add_item_to_cart(make_request())
+
+        async def submit():
+            async with concurrent_session_factory() as session:
+                try:
+                    return await CartService(session, cache).checkout("customer-123")
+                except ValueError:
+                    return None
+
+        orders = [order for order in await asyncio.gather(*(submit() for _ in range(5))) if order]
+        assert len(orders) == 1
+
+        async with concurrent_session_factory() as session:
+            count = (await session.execute(select(func.count()).select_from(Order))).scalar_one()
+        assert count == 1
+
+
+class TestCartRoutes:
+    """Test the async cart routes end to end"""
+
+    @pytest.mark.asyncio
+    async def test_add_get_and_checkout(self, api_client, db_session):
+        """Test the add, read and checkout flow over HTTP"""
+        await add_to_catalog(db_session, {"prod-456": "29.99"})
+        item = {
+            "customer_id": "customer-123",
+            "product_id": "prod-456",
+            "product_name": "Test Product",
+            "price": "29.99",
+            "quantity": 2
+        }
+        response = await api_client.post("/api/v1/cart/items", json=item)
+        assert response.status_code == 200
+        assert response.json()["cart"]["total_items"] == 2
+
+        response = await api_client.get("/api/v1/cart/customer-123")
+        assert response.status_code == 200
+        assert response.json()["cart"]["subtotal"] == "59.98"
+
+        response = await api_client.post("/api/v1/cart/checkout", json={
+            "customer_id": "customer-123",
+            "payment_method": "card",
+            "shipping_address": {"city": "Seattle"}
+        })
+        assert response.status_code == 200
+        assert response.json()["total_amount"] == "59.98"
+
+        response = await api_client.get("/api/v1/cart/customer-123")
+        assert response.json()["cart"]["items"] == []
+
+    @pytest.mark.asyncio
+    async def test_get_cart_conditional_request(self, api_client, assert_max_queries, fake_redis, monkeypatch):
+        """Test ETag / If-None-Match handling on cart reads"""
+        monkeypatch.setattr(cart_cache, "remote", RedisCartCache(fake_redis))
+        item = {
+            "customer_id": "customer-etag",
+            "product_id": "prod-1",
+            "product_name": "Test Product",
+            "price": "10.00",
+            "quantity": 1
+        }
+        await api_client.post("/api/v1/cart/items", json=item)
+
+        response = await api_client.get("/api/v1/cart/customer-etag")
+        assert response.status_code == 200
+        etag = response.headers["etag"]
+        assert response.json()["cart"]["total_items"] == 1
+
+        with assert_max_queries(0):
+            response = await api_client.get("/api/v1/cart/customer-etag", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+
+        await api_client.post("/api/v1/cart/items", json=item)
+        response = await api_client.get("/api/v1/cart/customer-etag", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+        assert response.json()["cart"]["total_items"] == 2
+
+    @pytest.mark.asyncio
+    async def test_if_match_on_mutations(self, api_client):
+        """Test ETag headers on writes and 412 for a stale If-Match"""
+        item = {
+            "customer_id": "customer-match",
+            "product_id": "prod-1",
+            "product_name": "Test Product",
+            "price": "10.00",
+            "quantity": 1
+        }
+        response = await api_client.post("/api/v1/cart/items", json=item, headers={"If-Match": '"0"'})
+        assert response.status_code == 200
+        assert response.headers["etag"] == '"1"'
+
+        response = await api_client.get("/api/v1/cart/customer-match")
+        assert response.headers["etag"] == '"1.0"'
+        assert response.json()["cart"]["version"] == 1
+
+        # A GET ETag works as If-Match; only its cart version is compared
+        response = await api_client.put(
+            "/api/v1/cart/customer-match/items/prod-1?quantity=3", headers={"If-Match": response.headers["etag"]}
+        )
+        assert response.status_code == 200
+        assert response.headers["etag"] == '"2"'
+
+        for method, url in [
+            ("PUT", "/api/v1/cart/customer-match/items/prod-1?quantity=5"),
+            ("DELETE", "/api/v1/cart/customer-match/items/prod-1"),
+            ("DELETE", "/api/v1/cart/customer-match"),
+        ]:
+            response = await api_client.request(method, url, headers={"If-Match": '"1"'})
+            assert response.status_code == 412, url
+
+        response = await api_client.delete("/api/v1/cart/customer-match", headers={"If-Match": "not-a-version"})
+        assert response.status_code == 412
+
+        response = await api_client.get("/api/v1/cart/customer-match")
+        assert response.json()["cart"]["items"][0]["quantity"] == 3
+
+    @pytest.mark.asyncio
+    async def test_batch_route(self, api_client):
+        """Test the batch endpoint reports partial failures and rejects all-invalid batches"""
+        response = await api_client.post("/api/v1/cart/items/batch", json={
+            "customer_id": "customer-batch",
+            "items": [make_line("a", "29.99", 2), make_line("b", "-1.00")]
+        })
+        assert response.status_code == 200
+        body = response.json()
+        assert body["success"] is False
+        assert body["applied"] == 1
+        assert body["failed"][0]["index"] == 1
+        assert body["cart"]["subtotal"] == "59.98"
+
+        response = await api_client.post("/api/v1/cart/items/batch", json={
+            "customer_id": "customer-batch",
+            "items": [make_line("c", quantity=-1)]
+        })
+        assert response.status_code == 400
+        assert response.json()["cart"]["total_items"] == 2
+
+        response = await api_client.post("/api/v1/cart/items/batch", json={
+            "customer_id": "customer-batch",
+            "items": []
+        })
+        assert response.status_code == 422
+
+    @pytest.mark.asyncio
+    async def test_health_checks_database(self, api_client):
+        """Test that the health route queries the database"""
+        response = await api_client.get("/health/")
+        assert response.status_code == 200
+        assert response.json()["database"] == "healthy"
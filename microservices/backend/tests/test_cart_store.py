@@ -0,0 +1,220 @@
+"""
+Test suite for the sharded in-memory cart store
+"""
+
+import pytest
+import threading
+from fastapi.testclient import TestClient
+
+from app.main import app, cart_store
+from app.services.cart_store import CartFullError, CartStore, InvalidItemError
+
+client = TestClient(app)
+
+
+class TestCartStore:
+    """Test CartStore operations"""
+
+    def test_get_missing_cart_returns_empty(self):
+        """Test that unknown users get an empty cart without creating one"""
+        store = CartStore(num_shards=4, max_carts=8)
+        assert store.get_cart("nobody") == {"items": [], "total": 0, "version": 0}
+        assert store.stats()["carts"] == 0
+
+    def test_add_and_remove_bumps_version(self):
+        """Test that every mutation increments the cart version"""
+        store = CartStore(num_shards=4, max_carts=8)
+        store.add_item("user-1", {"id": "a", "price": 10})
+        cart = store.add_item("user-1", {"id": "b", "price": 5})
+        assert cart["version"] == 2
+        assert cart["total"] == 15
+
+        cart = store.remove_item("user-1", "a")
+        assert cart["version"] == 3
+        assert cart["total"] == 5
+        assert cart["item"]["id"] == "a"
+        assert [item["id"] for item in store.get_cart("user-1")["items"]] == ["b"]
+
+    def test_same_item_merges_quantity(self):
+        """Test that re-adding an item id merges into one line"""
+        store = CartStore(num_shards=4, max_carts=8)
+        store.add_item("user-1", {"id": "a", "price": 10, "quantity": 2})
+        cart = store.add_item("user-1", {"id": "a", "price": 10, "quantity": 3})
+        assert cart["item"] == {"id": "a", "price": 10, "quantity": 5}
+        assert cart["line_count"] == 1
+        assert cart["total"] == 50
+
+    def test_update_quantity_adjusts_total(self):
+        """Test that quantity updates keep the running total in step"""
+        store = CartStore(num_shards=4, max_carts=8)
+        store.add_item("user-1", {"id": "a", "price": 10})
+        store.add_item("user-1", {"id": "b", "price": 3, "quantity": 2})
+        cart = store.update_quantity("user-1", "a", 4)
+        assert cart["total"] == 46
+
+        cart = store.update_quantity("user-1", "b", 0)
+        assert cart["item"] is None
+        assert cart["line_count"] == 1
+        assert cart["total"] == 40
+
+        with pytest.raises(ValueError, match="not found"):
+            store.update_quantity("user-1", "missing", 1)
+
+    def test_removing_last_line_resets_total(self):
+        """Test that float totals do not drift once the cart is empty"""
+        store = CartStore(num_shards=4, max_carts=8)
+        store.add_item("user-1", {"id": "a", "price": 0.1})
+        store.add_item("user-1", {"id": "b", "price": 0.2})
+        store.remove_item("user-1", "a")
+        assert store.remove_item("user-1", "b")["total"] == 0
+
+    def test_snapshot_is_isolated_from_store(self):
+        """Test that returned carts and lines are not mutated by later writes"""
+        store = CartStore(num_shards=4, max_carts=8)
+        added = store.add_item("user-1", {"id": "a", "price": 10})
+        snapshot = store.get_cart("user-1")
+        store.add_item("user-1", {"id": "a", "price": 10})
+        store.add_item("user-1", {"id": "b", "price": 5})
+        assert added["item"] == {"id": "a", "price": 10, "quantity": 1}
+        assert snapshot["items"] == [{"id": "a", "price": 10, "quantity": 1}]
+
+    def test_lru_eviction_when_shard_is_full(self):
+        """Test that the least recently used cart is evicted at capacity"""
+        store = CartStore(num_shards=1, max_carts=2)
+        store.add_item("user-1", {"id": "a", "price": 1})
+        store.add_item("user-2", {"id": "a", "price": 1})
+        store.get_cart("user-1")  # user-2 is now least recently used
+        store.add_item("user-3", {"id": "a", "price": 1})
+
+        assert store.get_cart("user-2")["items"] == []
+        assert len(store.get_cart("user-1")["items"]) == 1
+        stats = store.stats()
+        assert stats["carts"] == 2
+        assert stats["evictions"] == 1
+
+    def test_concurrent_adds_are_not_lost(self):
+        """Test that parallel adds for the same user all land"""
+        store = CartStore(num_shards=4, max_carts=8, max_lines_per_cart=1600)
+
+        def worker(n):
+            for i in range(200):
+                store.add_item("hot-user", {"id": f"{n}-{i}", "price": 1})
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        cart = store.get_cart("hot-user")
+        assert len(cart["items"]) == 1600
+        assert cart["total"] == 1600
+        assert cart["version"] == 1600
+
+    def test_line_limit_per_cart(self):
+        """Test that a full cart refuses new lines but still merges into existing ones"""
+        store = CartStore(num_shards=4, max_carts=8, max_lines_per_cart=2)
+        store.add_item("user-1", {"id": "a", "price": 1})
+        store.add_item("user-1", {"price": 1})
+
+        with pytest.raises(CartFullError):
+            store.add_item("user-1", {"id": "c", "price": 1})
+        with pytest.raises(CartFullError):
+            store.add_item("user-1", {"price": 1})
+        cart = store.add_item("user-1", {"id": "a", "price": 1})
+        assert cart["line_count"] == 2
+        assert cart["total"] == 3
+        assert cart["version"] == 3
+
+    def test_quantity_and_price_are_coerced(self):
+        """Test that numeric strings are stored as numbers"""
+        store = CartStore(num_shards=4, max_carts=8)
+        cart = store.add_item("user-1", {"id": "a", "price": "2.5", "quantity": "2"})
+        assert cart["item"] == {"id": "a", "price": 2.5, "quantity": 2}
+        assert cart["total"] == 5
+
+    @pytest.mark.parametrize("item", [
+        {"id": "b", "price": "abc"},
+        {"id": "b", "price": None},
+        {"id": "b", "price": -1},
+        {"id": "b", "price": 1, "quantity": 0},
+        {"id": "b", "price": 1, "quantity": -2},
+        {"id": "b", "price": 1, "quantity": "two"},
+        {"id": "b", "price": 1, "quantity": 1.5},
+        {"id": "a", "quantity": "x"},
+    ])
+    def test_bad_items_leave_the_cart_untouched(self, item):
+        """Test that a refused add changes neither lines, total nor version"""
+        store = CartStore(num_shards=4, max_carts=8)
+        store.add_item("user-1", {"id": "a", "price": 10})
+        before = store.get_cart("user-1")
+
+        with pytest.raises(InvalidItemError):
+            store.add_item("user-1", item)
+        assert store.get_cart("user-1") == before
+
+    def test_invalid_configuration(self):
+        """Test that nonsensical sizes are rejected"""
+        with pytest.raises(ValueError):
+            CartStore(num_shards=0)
+        with pytest.raises(ValueError):
+            CartStore(num_shards=8, max_carts=4)
+        with pytest.raises(ValueError):
+            CartStore(max_lines_per_cart=0)
+
+
+class TestCartStoreEndpoints:
+    """Test demo endpoints backed by the cart store"""
+
+    def test_add_get_remove_flow(self):
+        """Test the demo cart endpoints end to end"""
+        response = client.post("/api/v1/cart/store-user/items", json={"id": "p1", "price": 20})
+        assert response.status_code == 200
+        assert response.json()["data"]["total"] == 20
+
+        response = client.get("/api/v1/cart/store-user")
+        assert response.json()["data"]["items"] == [{"id": "p1", "price": 20, "quantity": 1}]
+
+        response = client.put("/api/v1/cart/store-user/items/p1", params={"quantity": 3})
+        assert response.json()["data"]["total"] == 60
+
+        response = client.put("/api/v1/cart/store-user/items/missing", params={"quantity": 3})
+        assert response.status_code == 404
+
+        response = client.delete("/api/v1/cart/store-user/items/p1")
+        data = response.json()["data"]
+        assert data["item"]["id"] == "p1"
+        assert data["line_count"] == 0
+        assert data["total"] == 0
+
+    def test_full_cart_is_rejected(self, monkeypatch):
+        """Test that adding past the line limit answers 400 and leaves the cart alone"""
+        monkeypatch.setattr(cart_store, "max_lines_per_cart", 1)
+        assert client.post("/api/v1/cart/full-user/items", json={"id": "p1", "price": 20}).status_code == 200
+
+        response = client.post("/api/v1/cart/full-user/items", json={"id": "p2", "price": 5})
+        assert response.status_code == 400
+        assert "Cart is full" in response.json()["detail"]
+        assert client.get("/api/v1/cart/full-user").json()["data"]["total"] == 20
+
+    def test_bad_item_is_rejected(self):
+        """Test that bad input answers 400 and later removes still work"""
+        response = client.post("/api/v1/cart/bad-user/items", json={"id": "p1", "price": "abc"})
+        assert response.status_code == 400
+        response = client.post("/api/v1/cart/bad-user/items", json={"id": "p1", "price": 5, "quantity": -1})
+        assert response.status_code == 400
+        assert client.get("/api/v1/cart/bad-user").json()["data"]["items"] == []
+
+        response = client.post("/api/v1/cart/bad-user/items", json={"id": "p1", "price": 5, "quantity": "2"})
+        assert response.json()["data"]["total"] == 10
+        response = client.delete("/api/v1/cart/bad-user/items/p1")
+        assert response.status_code == 200
+        assert response.json()["data"]["total"] == 0
+
+    def test_stats_endpoint(self):
+        """Test that store metrics are exposed"""
+        response = client.get("/api/v1/cart-store/stats")
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert data["shards"] == len(data["occupancy"])
+        assert "evictions" in data
@@ -0,0 +1,234 @@
+"""
+Test suite for the product catalog and server-side cart pricing
+"""
+
+import pytest
+from decimal import Decimal
+from sqlalchemy import func, select
+
+from app.config.settings import settings
+from app.models.order_models import Order
+from app.models.schemas import BulkCartItemsRequest, CartItemRequest
+from app.services.cart_service import CartService
+from app.services.catalog_service import CatalogService, PriceCache, ProductPrice
+from conftest import FakeClock
+
+
+def make_product(product_id, price, name=None, **extra):
+    return {"id": product_id, "name": name or f"Product {product_id}", "price": price, **extra}
+
+
+class TestPriceCache:
+    """Test bulk price lookups and versioned invalidation"""
+
+    @pytest.mark.asyncio
+    async def test_bulk_lookup_skips_unknown_products(self, db_session, assert_max_queries):
+        """Test prices load in one query and are then served from memory"""
+        catalog = CatalogService(db_session, PriceCache())
+        await catalog.upsert_products([make_product("a", "10.00"), make_product("b", "2.50")])
+
+        with assert_max_queries(2):
+            prices = await catalog.get_prices(["a", "b", "nope"])
+        assert prices == {
+            "a": ProductPrice("a", "Product a", Decimal("10.00"), 1),
+            "b": ProductPrice("b", "Product b", Decimal("2.50"), 1),
+        }
+
+        with assert_max_queries(0):
+            assert set(await catalog.get_prices(["b", "a", "nope"])) == {"a", "b"}
+
+    @pytest.mark.asyncio
+    async def test_remembered_misses_are_bounded(self, db_session, assert_max_queries):
+        """Test unknown ids are capped like entries, oldest dropped first"""
+        cache = PriceCache(max_entries=3)
+        catalog = CatalogService(db_session, cache)
+        await catalog.upsert_products([make_product("a", "10.00")])
+
+        await catalog.get_prices([f"nope-{i}" for i in range(10)])
+        assert cache.stats()["misses"] == 3
+
+        with assert_max_queries(0):
+            await catalog.get_prices(["nope-9"])
+        with assert_max_queries(1):
+            await catalog.get_prices(["nope-0"])
+
+    @pytest.mark.asyncio
+    async def test_other_writers_seen_after_interval(self, db_session, assert_max_queries):
+        """Test a price change from another process is picked up by version, changed rows only"""
+        clock = FakeClock()
+        reader = CatalogService(db_session, PriceCache(check_interval=1.0, clock=clock))
+        writer = CatalogService(db_session, PriceCache())
+        await writer.upsert_products([make_product(f"p{i}", "1.00") for i in range(20)])
+        await reader.get_prices([f"p{i}" for i in range(20)])
+
+        await writer.upsert_products([make_product("p3", "4.00")])
+        assert (await reader.get_prices(["p3"]))["p3"].price == Decimal("1.00")
+
+        clock.now += 1.0
+        with assert_max_queries(2) as statements:
+            prices = await reader.get_prices(["p3", "p4"])
+        assert "products.version >" in statements[1]
+        assert prices["p3"].price == Decimal("4.00")
+        assert prices["p4"].price == Decimal("1.00")
+        assert await reader.version() == 2
+
+    @pytest.mark.asyncio
+    async def test_local_writes_invalidate_immediately(self, db_session):
+        """Test the writing process does not wait for the interval"""
+        catalog = CatalogService(db_session, PriceCache(check_interval=3600.0))
+        await catalog.upsert_products([make_product("a", "10.00")])
+        await catalog.get_prices(["a", "new"])
+
+        await catalog.upsert_products([make_product("a", "12.00"), make_product("new", "1.00")])
+        prices = await catalog.get_prices(["a", "new"])
+        assert prices["a"].price == Decimal("12.00")
+        assert prices["new"].price == Decimal("1.00")
+
+    @pytest.mark.asyncio
+    async def test_inactive_products_are_withdrawn(self, db_session):
+        """Test withdrawn products are reported as inactive, not unknown"""
+        catalog = CatalogService(db_session, PriceCache())
+        await catalog.upsert_products([make_product("a", "10.00")])
+        assert (await catalog.get_prices(["a"]))["a"].active
+
+        await catalog.upsert_products([make_product("a", "10.00", active=False)])
+        assert not (await catalog.get_prices(["a"]))["a"].active
+
+        await catalog.upsert_products([make_product("b", "5.00", active=False)])
+        fresh = CatalogService(db_session, PriceCache())
+        assert {id: price.active for id, price in (await fresh.get_prices(["b", "nope"])).items()} == {"b": False}
+
+
+class TestCartPricing:
+    """Test carts are priced from the catalog"""
+
+    @pytest.mark.asyncio
+    async def test_client_price_is_ignored(self, db_session):
+        """Test catalog products use the server's name and price"""
+        await CatalogService(db_session).upsert_products([make_product("a", "20.00", name="Real Name")])
+        service = CartService(db_session)
+
+        cart = await service.add_item_to_cart(CartItemRequest(
+            customer_id="customer-123", product_id="a", product_name="Fake", price=Decimal("0.01"), quantity=2
+        ))
+        assert [(item.product_name, item.price) for item in cart.items] == [("Real Name", Decimal("20.00"))]
+        assert cart.subtotal == Decimal("40.00")
+
+    @pytest.mark.asyncio
+    async def test_catalog_product_needs_no_price(self, db_session):
+        """Test lines for catalog products can omit name and price"""
+        await CatalogService(db_session).upsert_products([make_product("a", "20.00")])
+        service = CartService(db_session)
+
+        cart = await service.add_item_to_cart(CartItemRequest(customer_id="customer-123", product_id="a", quantity=1))
+        assert cart.subtotal == Decimal("20.00")
+
+        with pytest.raises(ValueError, match="price and product_name are required"):
+            await service.add_item_to_cart(CartItemRequest(customer_id="customer-123", product_id="b", quantity=1))
+
+    @pytest.mark.asyncio
+    async def test_reads_and_checkout_reprice(self, db_session):
+        """Test a price change shows on the next read and is what checkout charges"""
+        catalog = CatalogService(db_session)
+        await catalog.upsert_products([make_product("a", "20.00")])
+        service = CartService(db_session)
+        await service.add_item_to_cart(CartItemRequest(customer_id="customer-123", product_id="a", quantity=2))
+        assert (await service.get_cart("customer-123")).subtotal == Decimal("40.00")
+
+        await catalog.upsert_products([make_product("a", "15.00")])
+        snapshot = await service.get_cart_snapshot("customer-123")
+        assert snapshot.cart.subtotal == Decimal("30.00")
+        assert snapshot.etag == '"1.2"'
+
+        order = await service.checkout("customer-123")
+        assert order.total_amount == Decimal("30.00")
+
+    @pytest.mark.asyncio
+    async def test_withdrawn_products_are_refused(self, db_session):
+        """Test a withdrawn product cannot be added at the client's price"""
+        await CatalogService(db_session).upsert_products([make_product("p1", "100.00", active=False)])
+        service = CartService(db_session)
+
+        with pytest.raises(ValueError, match="no longer available"):
+            await service.add_item_to_cart(CartItemRequest(
+                customer_id="customer-123", product_id="p1", product_name="P1", price=Decimal("0.01"), quantity=3
+            ))
+
+        cart, failed = await service.add_items_to_cart(BulkCartItemsRequest(
+            customer_id="customer-123",
+            items=[{"product_id": "p1", "product_name": "P1", "price": "0.01", "quantity": 3}]
+        ))
+        assert cart.items == []
+        assert [(error.index, error.product_id) for error in failed] == [(0, "p1")]
+
+    @pytest.mark.asyncio
+    async def test_checkout_refuses_lines_without_catalog_price(self, db_session):
+        """Test checkout never charges a stored client price"""
+        catalog = CatalogService(db_session)
+        await catalog.upsert_products([make_product("a", "20.00")])
+        service = CartService(db_session)
+        await service.add_item_to_cart(CartItemRequest(customer_id="customer-123", product_id="a", quantity=1))
+        await service.add_item_to_cart(CartItemRequest(
+            customer_id="customer-123", product_id="b", product_name="B", price=Decimal("0.01"), quantity=1
+        ))
+
+        with pytest.raises(ValueError, match="not available for checkout: b"):
+            await service.checkout("customer-123")
+
+        await service.remove_item_from_cart("customer-123", "b")
+        await catalog.upsert_products([make_product("a", "20.00", active=False)])
+        with pytest.raises(ValueError, match="not available for checkout: a"):
+            await service.checkout("customer-123")
+
+        assert (await db_session.execute(select(func.count()).select_from(Order))).scalar_one() == 0
+        assert [item.product_id for item in (await service.get_cart("customer-123")).items] == ["a"]
+
+    @pytest.mark.asyncio
+    async def test_catalog_required(self, db_session, monkeypatch):
+        """Test unknown products are refused when the catalog is authoritative"""
+        monkeypatch.setattr(settings, "CATALOG_REQUIRED", True)
+        await CatalogService(db_session).upsert_products([make_product("a", "20.00")])
+        service = CartService(db_session)
+
+        with pytest.raises(ValueError, match="not in the catalog"):
+            await service.add_item_to_cart(CartItemRequest(
+                customer_id="customer-123", product_id="b", product_name="B", price=Decimal("1.00"), quantity=1
+            ))
+
+        cart, failed = await service.add_items_to_cart(BulkCartItemsRequest(
+            customer_id="customer-123",
+            items=[
+                {"product_id": "b", "product_name": "B", "price": "1.00", "quantity": 1},
+                {"product_id": "a", "quantity": 1},
+            ]
+        ))
+        assert [item.product_id for item in cart.items] == ["a"]
+        assert [(error.index, error.product_id) for error in failed] == [(0, "b")]
+
+    @pytest.mark.asyncio
+    async def test_add_route_rejects_unpriced_product(self, api_client):
+        """Test the route answers 400 for an unknown product without a price"""
+        response = await api_client.post("/api/v1/cart/items", json={
+            "customer_id": "customer-123", "product_id": "unknown", "quantity": 1
+        })
+        assert response.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_get_etag_changes_with_prices(self, api_client, db_session):
+        """Test a price change gives the cart a new ETag while If-Match still sees the cart version"""
+        catalog = CatalogService(db_session)
+        await catalog.upsert_products([make_product("a", "20.00")])
+        await api_client.post("/api/v1/cart/items", json={"customer_id": "customer-123", "product_id": "a", "quantity": 1})
+        etag = (await api_client.get("/api/v1/cart/customer-123")).headers["etag"]
+        assert etag == '"1.1"'
+
+        await catalog.upsert_products([make_product("a", "15.00")])
+        response = await api_client.get("/api/v1/cart/customer-123", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] == '"1.2"'
+        assert response.json()["cart"]["subtotal"] == "15.00"
+
+        response = await api_client.put("/api/v1/cart/customer-123/items/a?quantity=2", headers={"If-Match": etag})
+        assert response.status_code == 200
+        response = await api_client.put("/api/v1/cart/customer-123/items/a?quantity=3", headers={"If-Match": '"2.x"'})
+        assert response.status_code == 412
@@ -0,0 +1,66 @@
+"""
+Test suite for database engine configuration
+"""
+
+import pytest
+from unittest.mock import patch
+from sqlalchemy import create_engine, exc
+
+from app.config import database
+from app.config.database import InstrumentedQueuePool, engine_options, to_async_url
+
+
+class TestEngineOptions:
+    """Test engine construction from settings"""
+
+    def test_async_url_mapping(self):
+        """Test that sync URLs map onto asyncio drivers"""
+        assert to_async_url("postgresql://u:p@h:5432/db") == "postgresql+asyncpg://u:p@h:5432/db"
+        assert to_async_url("postgresql+psycopg2://u:p@h/db") == "postgresql+asyncpg://u:p@h/db"
+        assert to_async_url("sqlite:///./carthub.db") == "sqlite+aiosqlite:///./carthub.db"
+
+    def test_postgres_pool_options_come_from_settings(self):
+        """Test that pool sizing and statement timeout are tunable"""
+        with patch.multiple(database.settings, DB_POOL_SIZE=3, DB_MAX_OVERFLOW=2,
+                            DB_POOL_RECYCLE=600, DB_STATEMENT_TIMEOUT_MS=2500):
+            options = engine_options("postgresql+asyncpg://u:p@h/db", is_async=True)
+            sync_options = engine_options("postgresql://u:p@h/db")
+
+        assert options["pool_size"] == 3
+        assert options["max_overflow"] == 2
+        assert options["pool_recycle"] == 600
+        assert options["pool_pre_ping"] is True
+        assert options["connect_args"] == {"server_settings": {"statement_timeout": "2500"}}
+        assert sync_options["connect_args"] == {"options": "-c statement_timeout=2500"}
+
+    def test_sqlite_keeps_default_pool(self):
+        """Test that pool sizing is not applied to SQLite"""
+        assert "pool_size" not in engine_options("sqlite+aiosqlite:///./carthub.db", is_async=True)
+
+
+class TestPoolMetrics:
+    """Test connection pool instrumentation"""
+
+    def test_checkout_waits_and_timeouts_are_recorded(self):
+        """Test that exhausting the pool shows up in the metrics"""
+        engine = create_engine("sqlite://", poolclass=InstrumentedQueuePool,
+                               pool_size=1, max_overflow=0, pool_timeout=0.05)
+        before = database.pool_metrics.snapshot()
+
+        held = engine.connect()
+        assert engine.pool.checkedout() == 1
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+        held.close()
+
+        after = database.pool_metrics.snapshot()
+        assert after["checkouts"] == before["checkouts"] + 1
+        assert after["timeouts"] == before["timeouts"] + 1
+        assert after["wait_time_max_ms"] >= 50
+        engine.dispose()
+
+    def test_metrics_report_pool_class(self):
+        """Test that the metrics endpoint payload is well formed"""
+        metrics = database.get_pool_metrics()
+        assert "pool_class" in metrics
+        assert "wait_time_avg_ms" in metrics
@@ -0,0 +1,195 @@
+"""
+Test suite for Idempotency-Key handling
+"""
+
+import asyncio
+import pytest
+from sqlalchemy import func, select
+
+from app.models.idempotency_models import IdempotencyKey
+from app.models.order_models import Order
+from app.services.cart_cache import cart_cache
+from app.services.idempotency import (
+    IdempotencyKeyInProgress,
+    IdempotencyKeyMismatch,
+    IdempotencyStore,
+    StoredResponse,
+    request_fingerprint
+)
+from app.workers.reservation_reaper import run_reservation_reaper
+from conftest import FakeClock, add_to_catalog
+
+
+ITEM = {
+    "customer_id": "customer-123",
+    "product_id": "prod-1",
+    "product_name": "Test Product",
+    "price": "29.99",
+    "quantity": 1
+}
+
+
+class TestIdempotencyStore:
+    """Test the SQL-backed key store"""
+
+    @pytest.mark.asyncio
+    async def test_reserve_complete_replay(self, db_session):
+        """Test that a completed key replays its response"""
+        store = IdempotencyStore(db_session)
+        assert await store.reserve("checkout", "key-1", "hash") is None
+
+        await store.complete("checkout", "key-1", StoredResponse(200, b'{"ok":true}', {"ETag": '"2"'}))
+        stored = await store.reserve("checkout", "key-1", "hash")
+        assert stored == StoredResponse(200, b'{"ok":true}', {"ETag": '"2"'})
+
+    @pytest.mark.asyncio
+    async def test_keys_are_scoped(self, db_session):
+        """Test that the same key on another endpoint is independent"""
+        store = IdempotencyStore(db_session)
+        assert await store.reserve("checkout", "key-1", "a") is None
+        assert await store.reserve("add_item", "key-1", "b") is None
+
+    @pytest.mark.asyncio
+    async def test_mismatch_and_in_progress(self, db_session):
+        """Test reuse with another request and concurrent retries are refused"""
+        store = IdempotencyStore(db_session)
+        await store.reserve("checkout", "key-1", "hash")
+
+        with pytest.raises(IdempotencyKeyInProgress):
+            await store.reserve("checkout", "key-1", "hash")
+        with pytest.raises(IdempotencyKeyMismatch):
+            await store.reserve("checkout", "key-1", "other-hash")
+
+    @pytest.mark.asyncio
+    async def test_expired_keys_are_reclaimed_and_purged(self, db_session):
+        """Test TTL expiry for abandoned and completed keys"""
+        clock = FakeClock(1000.0)
+        store = IdempotencyStore(db_session, ttl=100, lock_timeout=10, clock=clock)
+
+        await store.reserve("checkout", "abandoned", "hash")
+        clock.now += 11
+        assert await store.reserve("checkout", "abandoned", "hash") is None
+
+        await store.complete("checkout", "abandoned", StoredResponse(200, b"{}", {}))
+        clock.now += 50
+        assert await store.reserve("checkout", "abandoned", "hash") is not None
+        clock.now += 51
+        assert await store.purge_expired() == 1
+
+    @pytest.mark.asyncio
+    async def test_release_allows_retry(self, db_session):
+        """Test that a released key can be reserved again"""
+        store = IdempotencyStore(db_session)
+        await store.reserve("checkout", "key-1", "hash")
+        await store.release("checkout", "key-1")
+        assert await store.reserve("checkout", "key-1", "hash") is None
+
+    @pytest.mark.asyncio
+    async def test_release_keeps_committed_response(self, db_session):
+        """Test that a key whose response committed is not released for a rerun"""
+        store = IdempotencyStore(db_session)
+        await store.reserve("checkout", "key-1", "hash")
+        await store.stage("checkout", "key-1", StoredResponse(200, b"{}", {}))
+        await db_session.commit()
+
+        await store.release("checkout", "key-1")
+        assert await store.reserve("checkout", "key-1", "hash") == StoredResponse(200, b"{}", {})
+
+    @pytest.mark.asyncio
+    async def test_reaper_purges_expired_keys(self, session_factory):
+        """Test the worker's sweep deletes expired keys"""
+        async with session_factory() as db:
+            store = IdempotencyStore(db, ttl=-1)
+            await store.reserve("checkout", "old", "hash")
+            await store.complete("checkout", "old", StoredResponse(200, b"{}", {}))
+            await IdempotencyStore(db).reserve("checkout", "live", "hash")
+
+        stop = asyncio.Event()
+        sweeper = asyncio.create_task(run_reservation_reaper(session_factory, stop, interval=60))
+        try:
+            for _ in range(100):
+                async with session_factory() as db:
+                    keys = (await db.execute(select(IdempotencyKey.key))).scalars().all()
+                if keys == ["live"]:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            stop.set()
+            await sweeper
+        assert keys == ["live"]
+
+    def test_fingerprint_separates_parts(self):
+        """Test that fingerprints do not collide across part boundaries"""
+        assert request_fingerprint("ab", "c") != request_fingerprint("a", "bc")
+
+
+class TestIdempotentRoutes:
+    """Test Idempotency-Key on the cart routes"""
+
+    @pytest.mark.asyncio
+    async def test_retried_add_item_is_applied_once(self, api_client):
+        """Test that a retried add replays instead of adding again"""
+        headers = {"Idempotency-Key": "add-1"}
+        first = await api_client.post("/api/v1/cart/items", json=ITEM, headers=headers)
+        retry = await api_client.post("/api/v1/cart/items", json=ITEM, headers=headers)
+
+        assert retry.status_code == 200
+        assert retry.headers["idempotent-replayed"] == "true"
+        assert retry.headers["etag"] == first.headers["etag"]
+        assert retry.content == first.content
+
+        cart = (await api_client.get("/api/v1/cart/customer-123")).json()["cart"]
+        assert cart["items"][0]["quantity"] == 1
+
+        response = await api_client.post("/api/v1/cart/items", json={**ITEM, "quantity": 2}, headers=headers)
+        assert response.status_code == 422
+
+    @pytest.mark.asyncio
+    async def test_retried_checkout_returns_same_order(self, api_client, db_session):
+        """Test that a retried checkout does not create a second order"""
+        await add_to_catalog(db_session, {"prod-1": "29.99"})
+        await api_client.post("/api/v1/cart/items", json=ITEM)
+        checkout = {"customer_id": "customer-123", "payment_method": "card", "shipping_address": {}}
+        headers = {"Idempotency-Key": "checkout-1"}
+
+        first = await api_client.post("/api/v1/cart/checkout", json=checkout, headers=headers)
+        retry = await api_client.post("/api/v1/cart/checkout", json=checkout, headers=headers)
+        assert first.status_code == retry.status_code == 200
+        assert retry.json()["order_id"] == first.json()["order_id"]
+
+        count = (await db_session.execute(select(func.count()).select_from(Order))).scalar_one()
+        assert count == 1
+
+        # Without the key a second checkout sees the emptied cart
+        response = await api_client.post("/api/v1/cart/checkout", json=checkout)
+        assert response.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_response_commits_with_the_mutation(self, api_client, monkeypatch):
+        """Test a failure after the write commits still replays instead of writing again"""
+        async def broken_invalidate(customer_id):
+            raise RuntimeError("cache down")
+
+        headers = {"Idempotency-Key": "add-after-commit"}
+        monkeypatch.setattr(cart_cache, "invalidate", broken_invalidate)
+        first = await api_client.post("/api/v1/cart/items", json=ITEM, headers=headers)
+        assert first.status_code == 500
+
+        monkeypatch.undo()
+        retry = await api_client.post("/api/v1/cart/items", json=ITEM, headers=headers)
+        assert retry.status_code == 200
+        assert retry.headers["idempotent-replayed"] == "true"
+        cart = (await api_client.get("/api/v1/cart/customer-123")).json()["cart"]
+        assert cart["items"][0]["quantity"] == 1
+
+    @pytest.mark.asyncio
+    async def test_client_errors_are_replayed(self, api_client):
+        """Test that a 4xx result is stored like a success"""
+        checkout = {"customer_id": "nobody", "payment_method": "card", "shipping_address": {}}
+        headers = {"Idempotency-Key": "checkout-empty"}
+
+        first = await api_client.post("/api/v1/cart/checkout", json=checkout, headers=headers)
+        retry = await api_client.post("/api/v1/cart/checkout", json=checkout, headers=headers)
+        assert first.status_code == retry.status_code == 400
+        assert retry.json() == first.json()
+        assert retry.headers["idempotent-replayed"] == "true"
@@ -0,0 +1,220 @@
+"""
+Test suite for stock reservations
+"""
+
+import pytest
+import time
+from decimal import Decimal
+from sqlalchemy import select
+
+from app.models.inventory_models import Inventory, InventoryReservation
+from app.models.order_models import Order
+from app.models.schemas import BulkCartItemsRequest
+from app.services.cart_service import CartService
+from app.services.inventory_service import InsufficientStock, ReservationService
+from app.services.order_effects import OrderCreatedHandler, StubEmailSender, StubPaymentGateway
+from app.workers.reservation_reaper import release_expired_once
+from conftest import FakeClock, add_to_catalog
+
+
+async def stock_up(db, **levels):
+    for product_id, available in levels.items():
+        db.add(Inventory(product_id=product_id, available=available))
+    await db.commit()
+
+
+async def stock_levels(db):
+    return dict((await db.execute(select(Inventory.product_id, Inventory.available))).all())
+
+
+async def reservation_statuses(db, order_id):
+    result = await db.execute(
+        select(InventoryReservation.product_id, InventoryReservation.status)
+        .where(InventoryReservation.order_id == order_id)
+    )
+    return dict(result.all())
+
+
+async def add_order(db, customer_id="customer-123"):
+    order = Order(customer_id=customer_id, total_amount=Decimal("10.00"))
+    db.add(order)
+    await db.flush()
+    return order.id
+
+
+async def fill_cart(db, customer_id="customer-123", **quantities):
+    await add_to_catalog(db, {product_id: "5.00" for product_id in quantities})
+    await CartService(db).add_items_to_cart(BulkCartItemsRequest(
+        customer_id=customer_id,
+        items=[
+            {"product_id": product_id, "product_name": product_id, "price": "5.00", "quantity": quantity}
+            for product_id, quantity in quantities.items()
+        ]
+    ))
+
+
+class TestReservationService:
+    """Test reserving, confirming and releasing stock"""
+
+    @pytest.mark.asyncio
+    async def test_reserve_decrements_tracked_products(self, db_session):
+        """Test reservations take stock only for products with an inventory row"""
+        await stock_up(db_session, a=5, b=3)
+        order_id = await add_order(db_session)
+
+        reserved = await ReservationService(db_session).reserve(order_id, {"b": 3, "a": 2, "untracked": 9})
+        await db_session.commit()
+
+        assert reserved == {"a": 2, "b": 3}
+        assert await stock_levels(db_session) == {"a": 3, "b": 0}
+        assert await reservation_statuses(db_session, order_id) == {"a": "held", "b": "held"}
+
+    @pytest.mark.asyncio
+    async def test_shortage_takes_nothing(self, db_session):
+        """Test one short product fails the whole reservation"""
+        await stock_up(db_session, a=5, b=1)
+        order_id = await add_order(db_session)
+
+        with pytest.raises(InsufficientStock) as exc_info:
+            await ReservationService(db_session).reserve(order_id, {"a": 2, "b": 2})
+        await db_session.rollback()
+
+        assert exc_info.value.shortages == {"b": (2, 1)}
+        assert await stock_levels(db_session) == {"a": 5, "b": 1}
+
+    @pytest.mark.asyncio
+    async def test_confirm_and_release(self, db_session):
+        """Test confirmed stock stays sold until the order is released"""
+        await stock_up(db_session, a=5)
+        order_id = await add_order(db_session)
+        service = ReservationService(db_session)
+        await service.reserve(order_id, {"a": 2})
+
+        await service.confirm(order_id)
+        await service.confirm(order_id)
+        assert await reservation_statuses(db_session, order_id) == {"a": "committed"}
+        assert await stock_levels(db_session) == {"a": 3}
+
+        assert await service.release(order_id) == 1
+        assert await service.release(order_id) == 0
+        assert await stock_levels(db_session) == {"a": 5}
+
+    @pytest.mark.asyncio
+    async def test_expired_holds_are_returned(self, db_session):
+        """Test the sweep returns held stock after the TTL, and only then"""
+        await stock_up(db_session, a=5)
+        clock = FakeClock(time.time())
+        service = ReservationService(db_session, ttl=60.0, clock=clock)
+        order_id = await add_order(db_session)
+        await service.reserve(order_id, {"a": 4})
+
+        assert await service.release_expired() == 0
+        clock.now += 61.0
+        assert await service.release_expired() == 1
+        assert await stock_levels(db_session) == {"a": 5}
+        assert await reservation_statuses(db_session, order_id) == {"a": "expired"}
+
+    @pytest.mark.asyncio
+    async def test_confirm_after_expiry_retakes_stock(self, db_session):
+        """Test a late confirmation takes the stock again, or fails if it sold out"""
+        await stock_up(db_session, a=5)
+        clock = FakeClock(time.time())
+        service = ReservationService(db_session, ttl=60.0, clock=clock)
+        late, early = await add_order(db_session), await add_order(db_session)
+        await service.reserve(late, {"a": 3})
+        clock.now += 61.0
+        await service.release_expired()
+
+        await service.confirm(late)
+        assert await stock_levels(db_session) == {"a": 2}
+
+        await service.reserve(early, {"a": 2})
+        clock.now += 61.0
+        await service.release_expired()
+        await service.reserve(await add_order(db_session), {"a": 2})
+        with pytest.raises(InsufficientStock):
+            await service.confirm(early)
+
+    @pytest.mark.asyncio
+    async def test_reaper_commits(self, session_factory):
+        """Test the worker sweep releases and commits"""
+        async with session_factory() as db:
+            await stock_up(db, a=5)
+            service = ReservationService(db, ttl=-1.0)
+            await service.reserve(await add_order(db), {"a": 5})
+            await db.commit()
+
+        assert await release_expired_once(session_factory) == 1
+        async with session_factory() as db:
+            assert await stock_levels(db) == {"a": 5}
+
+
+class TestCheckoutReservations:
+    """Test checkout reserves stock and the worker settles it"""
+
+    @pytest.mark.asyncio
+    async def test_checkout_reserves_stock(self, db_session):
+        """Test checkout holds stock for the order's lines"""
+        await stock_up(db_session, a=5)
+        await fill_cart(db_session, a=2, untracked=1)
+
+        order = await CartService(db_session).checkout("customer-123")
+
+        assert await stock_levels(db_session) == {"a": 3}
+        assert await reservation_statuses(db_session, order.id) == {"a": "held"}
+
+    @pytest.mark.asyncio
+    async def test_checkout_out_of_stock_keeps_cart(self, db_session):
+        """Test a short product refuses checkout and leaves the cart alone"""
+        await stock_up(db_session, a=1)
+        await fill_cart(db_session, a=2)
+        service = CartService(db_session)
+
+        with pytest.raises(InsufficientStock):
+            await service.checkout("customer-123")
+
+        cart = await service.get_cart("customer-123")
+        assert [(item.product_id, item.quantity) for item in cart.items] == [("a", 2)]
+        assert await stock_levels(db_session) == {"a": 1}
+        assert (await db_session.execute(select(Order))).first() is None
+
+    @pytest.mark.asyncio
+    async def test_checkout_route_returns_409(self, api_client, session_factory):
+        """Test the checkout route maps a shortage to 409"""
+        async with session_factory() as db:
+            await stock_up(db, a=1)
+            await fill_cart(db, a=2)
+
+        response = await api_client.post("/api/v1/cart/checkout", json={
+            "customer_id": "customer-123",
+            "payment_method": "card",
+            "shipping_address": {"city": "Springfield"}
+        })
+        assert response.status_code == 409
+        assert "Insufficient stock for a" in response.json()["detail"]
+
+    @pytest.mark.asyncio
+    async def test_payment_confirms_or_returns_stock(self, concurrent_session_factory):
+        """Test paid orders keep their stock and declined ones give it back"""
+        async with concurrent_session_factory() as db:
+            await stock_up(db, a=5)
+            await fill_cart(db, "paid", a=2)
+            await fill_cart(db, "declined", a=3)
+            paid = await CartService(db).checkout("paid")
+            declined = await CartService(db).checkout("declined")
+
+        handler = OrderCreatedHandler(concurrent_session_factory, StubPaymentGateway(), StubEmailSender())
+        for order, method in ((paid, "card"), (declined, "declined")):
+            await handler({
+                "order_id": order.id,
+                "customer_id": order.customer_id,
+                "total_amount": str(order.total_amount),
+                "payment_method": method
+            })
+
+        async with concurrent_session_factory() as db:
+            assert await stock_levels(db) == {"a": 3}
+            assert await reservation_statuses(db, paid.id) == {"a": "committed"}
+            assert await reservation_statuses(db, declined.id) == {"a": "released"}
+            statuses = dict((await db.execute(select(Order.id, Order.status))).all())
+            assert statuses == {paid.id: "paid", declined.id: "payment_failed"}
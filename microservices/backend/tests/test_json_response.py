@@ -0,0 +1,59 @@
+"""
+Test suite for the fast JSON response class
+"""
+
+import json
+from decimal import Decimal
+
+from app.models.schemas import CartItemResponse, CartResponse, CheckoutResponse
+from app.utils.json_response import FastJSONResponse, dumps, encode_decimal
+
+
+class TestDecimalEncoding:
+    """Test the Decimal-to-string policy"""
+
+    def test_fixed_point_strings(self):
+        """Test that amounts are encoded exactly, never as floats or exponents"""
+        assert encode_decimal(Decimal("59.98")) == "59.98"
+        assert encode_decimal(Decimal("0.10")) == "0.10"
+        assert encode_decimal(Decimal("1E+2")) == "100"
+        assert encode_decimal(Decimal("12345678.91")) == "12345678.91"
+
+    def test_plain_content_uses_policy(self):
+        """Test that dicts with Decimals go through the same encoding"""
+        body = dumps({"total": Decimal("1E+2"), "items": [Decimal("29.99")]})
+        assert json.loads(body) == {"total": "100", "items": ["29.99"]}
+
+    def test_models_match_policy(self):
+        """Test that pydantic models serialize amounts as strings"""
+        cart = CartResponse(
+            customer_id="customer-123",
+            total_items=2,
+            subtotal=Decimal("29.99") * 2,
+            items=[CartItemResponse(
+                product_id="prod-1",
+                product_name="Product",
+                price=Decimal("29.99"),
+                quantity=2,
+                subtotal=Decimal("29.99") * 2
+            )]
+        )
+        payload = json.loads(dumps(cart))
+        assert payload["subtotal"] == "59.98"
+        assert payload["items"][0]["price"] == "29.99"
+        assert payload["items"][0]["subtotal"] == "59.98"
+
+
+class TestFastJSONResponse:
+    """Test the response class"""
+
+    def test_renders_model(self):
+        """Test rendering a checkout response"""
+        response = FastJSONResponse(CheckoutResponse(
+            success=True,
+            order_id="order-1",
+            total_amount=Decimal("59.98"),
+            message="Checkout completed successfully"
+        ))
+        assert response.media_type == "application/json"
+        assert json.loads(response.body)["total_amount"] == "59.98"
@@ -0,0 +1,94 @@
+"""
+Test suite for the integer-cents Money type
+"""
+
+import json
+import pytest
+from decimal import Decimal
+from pydantic import ValidationError
+from sqlalchemy import select, text
+
+from app.models.catalog_models import Product
+from app.models.money import Money
+from app.models.schemas import CartItemRequest, CartItemResponse
+from app.utils.json_response import dumps
+
+
+class TestMoney:
+    """Test parsing, formatting and arithmetic"""
+
+    def test_parse_is_exact(self):
+        assert Money.parse(Decimal("19.99")).cents == 1999
+        assert Money.parse("0.1").cents == 10
+        assert Money.parse(19.99).cents == 1999
+        assert Money.parse(5).cents == 500
+        assert Money.parse("1E+2").cents == 10000
+
+    @pytest.mark.parametrize("amount", ["1.005", "abc", "NaN", "Infinity", True, None])
+    def test_parse_rejects_non_amounts(self, amount):
+        with pytest.raises(ValueError):
+            Money.parse(amount)
+
+    def test_str_is_fixed_point(self):
+        assert str(Money(5998)) == "59.98"
+        assert str(Money(5)) == "0.05"
+        assert str(Money(-150)) == "-1.50"
+        assert repr(Money(100)) == "Money('1.00')"
+
+    def test_equals_decimal_of_same_value(self):
+        assert Money(5998) == Decimal("59.98")
+        assert Decimal("59.98") == Money(5998)
+        assert hash(Money(5998)) == hash(Decimal("59.98"))
+        assert Money(0) == 0
+        assert Money(1) > 0
+        assert Money(100) < Decimal("1.01")
+
+    def test_arithmetic_stays_in_cents(self):
+        assert Money(250) * 3 == Money(750)
+        assert 3 * Money(250) == Money(750)
+        assert Money(250) + Money(1) - Money(51) == Money(200)
+        assert sum([Money(1), Money(2)]) == Money(3)
+        with pytest.raises(TypeError):
+            Money(1) + Decimal("1")
+        with pytest.raises(TypeError):
+            Money(1) * 1.5
+
+
+class TestMoneySchemas:
+    """Test Money as a Pydantic field"""
+
+    def test_request_accepts_decimal_inputs(self):
+        for price in ("25.99", 25.99, Decimal("25.99")):
+            request = CartItemRequest(customer_id="c", product_id="p", product_name="P", price=price, quantity=1)
+            assert request.price == Money(2599)
+
+    @pytest.mark.parametrize("price", ["0", "-1.00", "1.999", "abc"])
+    def test_request_rejects_bad_prices(self, price):
+        with pytest.raises(ValidationError):
+            CartItemRequest(customer_id="c", product_id="p", product_name="P", price=price, quantity=1)
+
+    def test_serializes_as_fixed_point_string(self):
+        item = CartItemResponse(product_id="p", product_name="P", price=Money(1000), quantity=3, subtotal=Money(3000))
+        assert json.loads(item.model_dump_json())["subtotal"] == "30.00"
+        assert item.model_dump()["price"] == Money(1000)
+        assert json.loads(dumps({"total": Money(3000)})) == {"total": "30.00"}
+
+
+class TestMoneyColumn:
+    """Test Money columns store integer cents"""
+
+    @pytest.mark.asyncio
+    async def test_round_trip_and_filters(self, db_session):
+        db_session.add_all([
+            Product(id="a", name="A", price=Money(999), version=1),
+            Product(id="b", name="B", price=Decimal("10.00"), version=1),
+        ])
+        await db_session.commit()
+
+        stored = (await db_session.execute(select(Product.price).where(Product.id == "b"))).scalar_one()
+        assert isinstance(stored, Money) and stored.cents == 1000
+        raw = (await db_session.execute(text("SELECT price FROM products WHERE id = 'b'"))).scalar_one()
+        assert raw == 1000
+
+        cheap = (await db_session.execute(select(Product.id).where(Product.price < Decimal("10")))).scalars().all()
+        assert cheap == ["a"]
@@ -0,0 +1,196 @@
+"""
+Test suite for the checkout outbox and its worker
+"""
+
+import pytest
+import time
+from decimal import Decimal
+from sqlalchemy import select
+
+from app.models.cart_models import Cart
+from app.models.order_models import Order
+from app.models.outbox_models import OutboxEvent
+from app.models.schemas import CartItemRequest
+from app.services.cart_service import CartService
+from app.services.order_effects import OrderCreatedHandler, StubEmailSender, StubPaymentGateway
+from app.workers.outbox_worker import OutboxWorker, backoff_delay
+from conftest import FakeClock, add_to_catalog
+
+
+def worker_clock():
+    # Checkout stamps events with real time, so start from it
+    return FakeClock(time.time() + 1.0)
+
+
+async def place_order(session_factory, customer_id="customer-123", payment_method="card"):
+    async with session_factory() as db:
+        await add_to_catalog(db, {"prod-1": "29.99"})
+        await CartService(db).add_item_to_cart(CartItemRequest(
+            customer_id=customer_id,
+            product_id="prod-1",
+            product_name="Product prod-1",
+            price=Decimal("29.99"),
+            quantity=2
+        ))
+        order = await CartService(db).checkout(customer_id, payment_method=payment_method)
+        return order.id
+
+
+async def order_status(session_factory, order_id):
+    async with session_factory() as db:
+        return await db.scalar(select(Order.status).where(Order.id == order_id))
+
+
+async def outbox_rows(session_factory):
+    async with session_factory() as db:
+        return (await db.execute(select(OutboxEvent).order_by(OutboxEvent.id))).scalars().all()
+
+
+def make_worker(session_factory, clock, payments=None, email=None, **options):
+    handler = OrderCreatedHandler(session_factory, payments or StubPaymentGateway(), email or StubEmailSender())
+    return OutboxWorker(session_factory, {"order.created": handler}, clock=clock, **options)
+
+
+class TestOutbox:
+    """Test checkout side effects are queued and delivered"""
+
+    @pytest.mark.asyncio
+    async def test_checkout_queues_event(self, concurrent_session_factory):
+        """Test checkout commits the order as pending with one outbox event"""
+        order_id = await place_order(concurrent_session_factory)
+
+        assert await order_status(concurrent_session_factory, order_id) == "pending"
+        events = await outbox_rows(concurrent_session_factory)
+        assert len(events) == 1
+        assert events[0].event_type == "order.created"
+        assert events[0].payload["order_id"] == order_id
+        assert events[0].payload["total_amount"] == "59.98"
+        assert events[0].payload["items"] == [{"product_id": "prod-1", "quantity": 2}]
+
+    @pytest.mark.asyncio
+    async def test_failed_checkout_queues_nothing(self, concurrent_session_factory):
+        """Test an empty-cart checkout leaves no event behind"""
+        async with concurrent_session_factory() as db:
+            db.add(Cart(customer_id="customer-123"))
+            await db.commit()
+            with pytest.raises(ValueError):
+                await CartService(db).checkout("customer-123")
+
+        assert await outbox_rows(concurrent_session_factory) == []
+
+    @pytest.mark.asyncio
+    async def test_run_once_charges_and_emails(self, concurrent_session_factory):
+        """Test the worker pays the order and sends the confirmation"""
+        order_id = await place_order(concurrent_session_factory)
+        payments, email = StubPaymentGateway(), StubEmailSender()
+        worker = make_worker(concurrent_session_factory, worker_clock(), payments, email)
+
+        assert await worker.run_once() == 1
+        assert await worker.run_once() == 0
+
+        assert await order_status(concurrent_session_factory, order_id) == "paid"
+        assert payments.charges[order_id][0] == Decimal("59.98")
+        assert email.sent == [{"customer_id": "customer-123", "order_id": order_id, "total_amount": Decimal("59.98")}]
+        event = (await outbox_rows(concurrent_session_factory))[0]
+        assert (event.status, event.attempts) == ("done", 1)
+
+    @pytest.mark.asyncio
+    async def test_declined_payment(self, concurrent_session_factory):
+        """Test a declined charge fails the order without retrying"""
+        order_id = await place_order(concurrent_session_factory, payment_method="declined")
+        email = StubEmailSender()
+        worker = make_worker(concurrent_session_factory, worker_clock(), email=email)
+
+        await worker.run_once()
+
+        assert await order_status(concurrent_session_factory, order_id) == "payment_failed"
+        assert email.sent == []
+        assert (await outbox_rows(concurrent_session_factory))[0].status == "done"
+
+    @pytest.mark.asyncio
+    async def test_retry_with_backoff_then_fail(self, concurrent_session_factory):
+        """Test failing events are retried later and parked after max attempts"""
+        order_id = await place_order(concurrent_session_factory)
+        clock = worker_clock()
+        calls = []
+
+        async def flaky(payload):
+            calls.append(payload["order_id"])
+            raise ConnectionError("gateway unavailable")
+
+        worker = OutboxWorker(
+            concurrent_session_factory, {"order.created": flaky},
+            max_attempts=3, backoff_base=10.0, backoff_max=100.0, clock=clock
+        )
+
+        assert await worker.run_once() == 1
+        event = (await outbox_rows(concurrent_session_factory))[0]
+        assert (event.status, event.attempts) == ("pending", 1)
+        assert "gateway unavailable" in event.last_error
+        assert clock.now + 5.0 <= event.available_at <= clock.now + 10.0
+
+        # Not due yet
+        assert await worker.run_once() == 0
+
+        for _ in range(2):
+            clock.now += 100.0
+            assert await worker.run_once() == 1
+
+        event = (await outbox_rows(concurrent_session_factory))[0]
+        assert (event.status, event.attempts) == ("failed", 3)
+        assert calls == [order_id] * 3
+        assert worker.failed == 1
+        clock.now += 1000.0
+        assert await worker.run_once() == 0
+
+    @pytest.mark.asyncio
+    async def test_unknown_event_type_fails(self, concurrent_session_factory):
+        """Test events without a handler are not silently dropped"""
+        async with concurrent_session_factory() as db:
+            db.add(OutboxEvent(event_type="order.unknown", aggregate_id="1", payload={}, available_at=0.0))
+            await db.commit()
+
+        worker = OutboxWorker(concurrent_session_factory, {}, max_attempts=1, clock=worker_clock())
+        await worker.run_once()
+
+        event = (await outbox_rows(concurrent_session_factory))[0]
+        assert event.status == "failed"
+        assert "No handler" in event.last_error
+
+    @pytest.mark.asyncio
+    async def test_drains_in_batches(self, concurrent_session_factory):
+        """Test many events are delivered in batch_size chunks"""
+        order_ids = [
+            await place_order(concurrent_session_factory, customer_id=f"customer-{i}")
+            for i in range(12)
+        ]
+        payments = StubPaymentGateway()
+        worker = make_worker(concurrent_session_factory, worker_clock(), payments, batch_size=5, concurrency=3)
+
+        assert [await worker.run_once() for _ in range(4)] == [5, 5, 2, 0]
+        assert sorted(payments.charges) == sorted(order_ids)
+        assert worker.delivered == 12
+
+    @pytest.mark.asyncio
+    async def test_redelivery_does_not_charge_twice(self, concurrent_session_factory):
+        """Test a handler run twice for one order charges and pays once"""
+        order_id = await place_order(concurrent_session_factory)
+        payments = StubPaymentGateway()
+        handler = OrderCreatedHandler(concurrent_session_factory, payments, StubEmailSender())
+        event = (await outbox_rows(concurrent_session_factory))[0]
+
+        await handler(event.payload)
+        await handler(event.payload)
+
+        assert len(payments.charges) == 1
+        assert await order_status(concurrent_session_factory, order_id) == "paid"
+
+
+class TestBackoff:
+    """Test the retry delay schedule"""
+
+    def test_backoff_grows_and_is_capped(self):
+        """Test delays double per attempt, with jitter, up to the cap"""
+        for attempts, upper in [(1, 1.0), (2, 2.0), (3, 4.0), (10, 30.0)]:
+            delay = backoff_delay(attempts, 1.0, 30.0)
+            assert upper / 2 <= delay <= upper
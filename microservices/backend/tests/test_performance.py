@@ -0,0 +1,429 @@
+"""
+Performance benchmarks for Carthub Backend
+"""
+
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import pytest
+from decimal import Decimal
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select
+
+from app.models.inventory_models import Inventory
+from app.models.money import Money
+from app.models.schemas import BulkCartItemsRequest, CartItemResponse, CartOperationResponse, CartResponse
+from app.services.cart_service import CartService
+from app.services.cart_store import CartStore
+from app.services.catalog_service import CatalogService, encode_cursor
+from app.services.search_service import InvertedIndex
+from app.services.pricing_engine import BuyXGetY, FreeShipping, PercentOff, PricingEngine, RegionalTax, SpendTiers
+from app.services.inventory_service import InsufficientStock
+from app.utils.json_response import dumps
+from conftest import add_to_catalog
+
+
+def _time_per_op(fn, rounds: int = 2000, repeats: int = 5) -> float:
+    """Return the best-of-N mean time per call in seconds."""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            fn()
+        samples.append((time.perf_counter() - start) / rounds)
+    return min(samples)
+
+
+class TestInMemoryCartPerformance:
+    """Benchmark line operations through the in-memory cart store"""
+
+    SIZES = [1, 10, 100, 1000, 10000]
+
+    def _filled_store(self, lines: int) -> CartStore:
+        store = CartStore(num_shards=1, max_carts=1, max_lines_per_cart=lines + 1)
+        for i in range(lines):
+            store.add_item("user", {"id": f"sku-{i}", "price": 9.99, "quantity": 1})
+        return store
+
+    def test_line_operations_stay_flat(self):
+        """Test that add/update/remove latency does not grow with cart size"""
+        results = {}
+        for size in self.SIZES:
+            store = self._filled_store(size)
+
+            def cycle():
+                store.add_item("user", {"id": "bench", "price": 4.5, "quantity": 1})
+                store.update_quantity("user", "bench", 3)
+                store.remove_item("user", "bench")
+
+            results[size] = _time_per_op(cycle)
+
+        print("CartStore add+update+remove cycle:")
+        for size, seconds in results.items():
+            print(f"  {size:>6} lines: {seconds * 1e6:.2f}us")
+
+        # O(n) removal or a full snapshot per write would be ~10,000x slower at the top end
+        assert results[10000] < results[1] * 3, (
+            f"10k-line cycle {results[10000] * 1e6:.2f}us vs 1-line {results[1] * 1e6:.2f}us"
+        )
+
+
+class TestSerializationPerformance:
+    """Benchmark cart response serialization"""
+
+    SIZES = [1, 50, 1000]
+
+    def _envelope(self, lines: int) -> CartOperationResponse:
+        items = [
+            CartItemResponse(
+                product_id=f"sku-{i}",
+                product_name=f"Product {i}",
+                price=Decimal("29.99"),
+                quantity=2,
+                subtotal=Decimal("59.98")
+            )
+            for i in range(lines)
+        ]
+        cart = CartResponse(
+            customer_id="perf-customer",
+            total_items=2 * lines,
+            subtotal=Decimal("59.98") * lines,
+            items=items
+        )
+        return CartOperationResponse(success=True, message="Cart retrieved successfully", cart=cart)
+
+    def test_fast_path_beats_jsonable_encoder(self):
+        """Test that the response class serializes carts faster than the generic encoder"""
+        results = {}
+        for size in self.SIZES:
+            envelope = self._envelope(size)
+            assert json.loads(dumps(envelope)) == jsonable_encoder(envelope)
+
+            rounds = max(1, 2000 // size)
+            baseline = _time_per_op(lambda: json.dumps(jsonable_encoder(envelope)).encode(), rounds=rounds)
+            fast = _time_per_op(lambda: dumps(envelope), rounds=rounds)
+            results[size] = (baseline, fast)
+
+        print("Cart serialization (jsonable_encoder + json vs fast path):")
+        for size, (baseline, fast) in results.items():
+            print(f"  {size:>5} lines: {baseline * 1e6:9.1f}us -> {fast * 1e6:9.1f}us ({baseline / fast:.1f}x)")
+
+        for size in (50, 1000):
+            baseline, fast = results[size]
+            assert fast * 3 < baseline, f"{size} lines: {fast * 1e6:.1f}us vs {baseline * 1e6:.1f}us"
+
+
+class TestAsyncCartRoutesPerformance:
+    """Benchmark the async database path under concurrent load"""
+
+    CONCURRENCY = 200
+
+    @pytest.mark.asyncio
+    async def test_concurrent_reads_do_not_block_event_loop(self, api_client):
+        """Test p99 latency and event-loop lag for concurrent cart reads"""
+        for i in range(20):
+            await api_client.post("/api/v1/cart/items", json={
+                "customer_id": "perf-customer",
+                "product_id": f"perf-item-{i}",
+                "product_name": f"Performance Test Item {i}",
+                "price": "25.99",
+                "quantity": 1
+            })
+
+        lags = []
+        done = asyncio.Event()
+
+        async def heartbeat(interval=0.001):
+            while not done.is_set():
+                start = time.perf_counter()
+                await asyncio.sleep(interval)
+                lags.append(time.perf_counter() - start - interval)
+
+        async def timed_get():
+            start = time.perf_counter()
+            response = await api_client.get("/api/v1/cart/perf-customer")
+            assert response.status_code == 200
+            return time.perf_counter() - start
+
+        monitor = asyncio.create_task(heartbeat())
+        latencies = await asyncio.gather(*(timed_get() for _ in range(self.CONCURRENCY)))
+        done.set()
+        await monitor
+
+        p50 = statistics.median(latencies)
+        p99 = statistics.quantiles(latencies, n=100)[98]
+        print(f"Async cart reads x{self.CONCURRENCY}:")
+        print(f"  p50: {p50 * 1000:.1f}ms")
+        print(f"  p99: {p99 * 1000:.1f}ms")
+        print(f"  max event-loop lag: {max(lags) * 1000:.1f}ms")
+
+        # A blocking driver would hold the loop for the whole batch
+        assert max(lags) < sum(latencies) / self.CONCURRENCY * 10
+        assert p99 < 2.0, f"p99 read latency {p99:.3f}s too high"
+
+
+class TestCheckoutPerformance:
+    """Benchmark checkout throughput"""
+
+    CARTS = 200
+    LINES = 10
+
+    @pytest.mark.asyncio
+    async def test_checkouts_per_second(self, db_session):
+        """Test sequential checkout throughput of multi-line carts"""
+        await add_to_catalog(db_session, {f"sku-{i}": "9.99" for i in range(self.LINES)})
+        service = CartService(db_session)
+        for c in range(self.CARTS):
+            await service.add_items_to_cart(BulkCartItemsRequest(
+                customer_id=f"checkout-{c}",
+                items=[
+                    {"product_id": f"sku-{i}", "product_name": f"Item {i}", "price": "9.99", "quantity": 1}
+                    for i in range(self.LINES)
+                ]
+            ))
+
+        start = time.perf_counter()
+        for c in range(self.CARTS):
+            order = await service.checkout(f"checkout-{c}")
+            assert order.total_amount == Decimal("99.90")
+        elapsed = time.perf_counter() - start
+
+        rate = self.CARTS / elapsed
+        print(f"Checkout ({self.LINES} lines, SQLite): {rate:.0f} checkouts/sec, {elapsed / self.CARTS * 1000:.2f}ms each")
+        assert rate > 50, f"{rate:.0f} checkouts/sec"
+
+
+class TestInventoryContention:
+    """Benchmark checkouts racing for a few hot SKUs"""
+
+    CUSTOMERS = 60
+    HOT_SKUS = 3
+    STOCK = 30
+
+    @pytest.mark.asyncio
+    async def test_hot_skus_never_oversell(self, concurrent_session_factory):
+        """Test concurrent checkouts sell exactly the stock on hand
+
+        SQLite serializes writers through its busy handler, so the rate
+        printed here is a floor; on PostgreSQL buyers queue on the row locks
+        of the hot SKUs only.
+        """
+        async with concurrent_session_factory() as db:
+            for i in range(self.HOT_SKUS):
+                db.add(Inventory(product_id=f"hot-{i}", available=self.STOCK))
+            await db.commit()
+            await add_to_catalog(db, {
+                product_id: "9.99"
+                for product_id in [f"hot-{i}" for i in range(self.HOT_SKUS)] + [f"cold-{c}" for c in range(self.CUSTOMERS)]
+            })
+            for c in range(self.CUSTOMERS):
+                # Lines in varying order; reservations lock in product order regardless
+                hot = [f"hot-{(c + i) % self.HOT_SKUS}" for i in range(self.HOT_SKUS)]
+                await CartService(db).add_items_to_cart(BulkCartItemsRequest(
+                    customer_id=f"buyer-{c}",
+                    items=[
+                        {"product_id": product_id, "product_name": product_id, "price": "9.99", "quantity": 1}
+                        for product_id in hot + [f"cold-{c}"]
+                    ]
+                ))
+
+        async def buy(customer_id):
+            async with concurrent_session_factory() as db:
+                try:
+                    await CartService(db).checkout(customer_id)
+                    return True
+                except InsufficientStock:
+                    return False
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(buy(f"buyer-{c}") for c in range(self.CUSTOMERS)))
+        elapsed = time.perf_counter() - start
+
+        async with concurrent_session_factory() as db:
+            stock = dict((await db.execute(select(Inventory.product_id, Inventory.available))).all())
+        print(
+            f"Hot-SKU checkout x{self.CUSTOMERS} ({self.HOT_SKUS} SKUs, {self.STOCK} each, SQLite): "
+            f"{sum(results)} sold, {self.CUSTOMERS / elapsed:.0f} attempts/sec"
+        )
+        assert sum(results) == self.STOCK
+        assert stock == {f"hot-{i}": 0 for i in range(self.HOT_SKUS)}
+
+
+class TestProductListingPerformance:
+    """Benchmark keyset pagination depth"""
+
+    PRODUCTS = 20000
+    PAGE = 24
+
+    @pytest.mark.asyncio
+    async def test_last_page_costs_like_first(self, db_session):
+        """Test page time does not grow with how deep the page is"""
+        catalog = CatalogService(db_session)
+        for start in range(0, self.PRODUCTS, 1000):
+            await catalog.upsert_products([
+                {"id": f"sku-{i:06d}", "name": f"Product {i}", "category": f"cat-{i % 20}", "price": f"{i % 500}.99"}
+                for i in range(start, start + 1000)
+            ])
+        # Roughly 90% of the way through the price-sorted listing
+        deep = encode_cursor("price_asc", Decimal("450.99"), "")
+
+        async def page(cursor):
+            rows, _ = await catalog.list_products(sort="price_asc", limit=self.PAGE, cursor=cursor)
+            return rows
+
+        async def best_of(cursor, repeats=20):
+            samples = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                await page(cursor)
+                samples.append(time.perf_counter() - start)
+            return min(samples)
+
+        assert len(await page(deep)) == self.PAGE
+        first, last = await best_of(None), await best_of(deep)
+        print(f"Product listing ({self.PRODUCTS} products, SQLite): first page {first * 1000:.2f}ms, deep page {last * 1000:.2f}ms")
+        assert last < first * 3 + 0.002, f"deep page {last * 1000:.2f}ms vs first {first * 1000:.2f}ms"
+
+
+class TestSearchPerformance:
+    """Benchmark the in-process search index at catalog scale"""
+
+    PRODUCTS = 100_000
+    ADJECTIVES = ["classic", "slim", "vintage", "waterproof", "organic", "premium", "striped", "cozy", "sporty", "retro"]
+    MATERIALS = ["cotton", "leather", "wool", "denim", "linen", "suede", "canvas", "silk", "fleece", "nylon"]
+    NOUNS = ["sneaker", "boot", "jacket", "beanie", "tote", "wallet", "hoodie", "scarf", "sandal", "backpack",
+             "shirt", "skirt", "glove", "belt", "sock", "blazer", "parka", "loafer", "cap", "vest"]
+
+    def test_queries_stay_fast_at_100k(self):
+        """Test exact, prefix, typo and multi-word queries over 100k products"""
+        index = InvertedIndex()
+        start = time.perf_counter()
+        for i in range(self.PRODUCTS):
+            adjective = self.ADJECTIVES[i % 10]
+            material = self.MATERIALS[i // 10 % 10]
+            noun = self.NOUNS[i // 100 % 20]
+            index.add(
+                f"sku-{i:06d}",
+                f"{adjective.title()} {material.title()} {noun.title()} {i}",
+                noun,
+                f"A {adjective} {noun} in {material}, style {i % 997}"
+            )
+        build = time.perf_counter() - start
+
+        print(f"Search index: built {self.PRODUCTS} products in {build:.2f}s")
+        for query in ["parka", "vint", "lether", "waterproof suede loafer", "style 42"]:
+            assert index.search(query), query
+            elapsed = _time_per_op(lambda: index.search(query, 20), rounds=20, repeats=3)
+            print(f"  {query!r:28} {elapsed * 1000:8.2f}ms")
+            assert elapsed < 0.25, f"{query!r} took {elapsed * 1000:.1f}ms"
+
+
+class TestMoneyPerformance:
+    """Benchmark large-cart totals in integer cents against Decimal"""
+
+    LINES = 10_000
+
+    def test_cents_totals_beat_decimal(self):
+        """Test a 10k-line subtotal is faster as int cents than as Decimal(str(price)) * quantity"""
+        lines = [(Money(199 + i % 5000), 1 + i % 4) for i in range(self.LINES)]
+        decimal_lines = [(price.to_decimal(), quantity) for price, quantity in lines]
+
+        def decimal_subtotal():
+            return sum((Decimal(str(price)) * quantity for price, quantity in decimal_lines), Decimal("0.00"))
+
+        def cents_subtotal():
+            return Money(sum(price.cents * quantity for price, quantity in lines))
+
+        assert cents_subtotal() == decimal_subtotal()
+        baseline = _time_per_op(decimal_subtotal, rounds=5)
+        cents = _time_per_op(cents_subtotal, rounds=5)
+
+        print(f"Subtotal of {self.LINES} lines: Decimal {baseline * 1000:.2f}ms -> cents {cents * 1000:.2f}ms ({baseline / cents:.1f}x)")
+        assert cents * 2 < baseline, f"cents {cents * 1000:.2f}ms vs Decimal {baseline * 1000:.2f}ms"
+
+
+class TestPricingPerformance:
+    """Benchmark batch repricing against the per-cart engine"""
+
+    CARTS = 20_000
+
+    def test_batch_reprices_many_carts(self):
+        """Test batch repricing is exact and faster than pricing cart by cart"""
+        pytest.importorskip("numpy")
+        engine = PricingEngine([
+            PercentOff(Decimal("10")),
+            BuyXGetY(frozenset(f"p{i}" for i in range(0, 100, 3))),
+            SpendTiers(((Decimal("100"), Decimal("5")), (Decimal("250"), Decimal("10")))),
+            FreeShipping(Decimal("75"), Decimal("6.99")),
+            RegionalTax((("CA", Decimal("7.25")), ("NY", Decimal("8.875"))), default=Decimal("5")),
+        ])
+        carts = [
+            [(f"p{(i * 7 + j) % 100}", 199 + (i * 31 + j * 17) % 9000, 1 + (i + j) % 4) for j in range(i % 8)]
+            for i in range(self.CARTS)
+        ]
+        regions = [("CA", "NY", "TX")[i % 3] for i in range(self.CARTS)]
+
+        start = time.perf_counter()
+        totals = [engine.price(cart, region).total for cart, region in zip(carts, regions)]
+        scalar = time.perf_counter() - start
+        start = time.perf_counter()
+        batch = engine.price_batch(carts, regions)
+        vectorized = time.perf_counter() - start
+
+        print(f"Repricing {self.CARTS} carts: per-cart {scalar * 1000:.1f}ms, batch {vectorized * 1000:.1f}ms")
+        assert batch.total.tolist() == totals
+        assert vectorized < scalar
+
+
+class TestStartupPerformance:
+    """Benchmark application import time"""
+
+    IMPORT_BUDGET_SECONDS = 3.0
+
+    # Optional or heavy dependencies that must only be imported when first used
+    LAZY_MODULES = ("boto3", "redis", "numpy")
+
+    SCRIPT = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import app.main, app.routes.cart_routes, app.routes.health_routes, app.routes.product_routes\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"print(elapsed, *[m for m in {LAZY_MODULES!r} if m in sys.modules])\n"
+    )
+
+    def _import_once(self, env):
+        result = subprocess.run(
+            [sys.executable, "-c", self.SCRIPT],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=60
+        )
+        assert result.returncode == 0, result.stderr
+        elapsed, *loaded = result.stdout.split()
+        return float(elapsed), loaded
+
+    def test_import_does_not_resolve_credentials(self):
+        """Test that importing the app against Postgres makes no AWS calls"""
+        env = {k: v for k, v in os.environ.items() if not k.startswith(("DATABASE", "AWS"))}
+        env.update({
+            "DATABASE_HOST": "db.invalid",
+            "DATABASE_SECRET_ARN": "arn:aws:secretsmanager:us-east-1:000000000000:secret:none",
+            "AWS_REGION": "us-east-1"
+        })
+
+        timings = []
+        for _ in range(3):
+            elapsed, loaded = self._import_once(env)
+            assert not loaded, f"{', '.join(loaded)} imported at startup"
+            timings.append(elapsed)
+
+        print("Import app.main + routers:")
+        print(f"  best: {min(timings) * 1000:.0f}ms  worst: {max(timings) * 1000:.0f}ms")
+        assert min(timings) < self.IMPORT_BUDGET_SECONDS
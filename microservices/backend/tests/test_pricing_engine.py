@@ -0,0 +1,111 @@
+"""
+Test suite for the cart pricing engine
+"""
+
+import random
+import pytest
+from decimal import Decimal
+
+from app.models.schemas import CartItemResponse, CartResponse
+from app.services.pricing_engine import (
+    BuyXGetY, FreeShipping, PercentOff, PricingEngine, RegionalTax, SpendTiers,
+    cart_lines, percent_of
+)
+
+
+RULES = [
+    PercentOff(Decimal("10")),
+    PercentOff(Decimal("25"), frozenset({"shoes"})),
+    BuyXGetY(frozenset({"socks"})),
+    BuyXGetY(frozenset({"hat", "shoes"}), buy=2, get=1, percent=Decimal("50")),
+    SpendTiers(((Decimal("100.00"), Decimal("5")), (Decimal("250.00"), Decimal("10")))),
+    FreeShipping(threshold=Decimal("75.00"), rate=Decimal("6.99")),
+    RegionalTax((("CA", Decimal("7.25")), ("OR", Decimal("0")), ("NY", Decimal("8.875"))), default=Decimal("5.5")),
+]
+
+
+class TestRounding:
+    """Test percentages round half up to the cent"""
+
+    def test_percent_rounds_half_up(self):
+        assert percent_of(50, 100000) == 5
+        assert percent_of(5, 100000) == 1  # 0.5 cent rounds up
+        assert percent_of(4, 100000) == 0
+
+
+class TestRules:
+    """Test each rule and how they combine"""
+
+    def test_best_line_promotion_wins(self):
+        """Test percent-off and buy-X-get-Y do not stack on a line"""
+        engine = PricingEngine(RULES)
+        priced = engine.price([("shoes", 8000, 3), ("socks", 500, 3), ("mug", 1000, 1)], "OR")
+        # shoes: 25% of 240.00 = 60.00 beats half off one of three (40.00)
+        # socks: one free of three (5.00) beats 10% (1.50); mug: store-wide 10%
+        assert priced.line_discounts == (6000, 500, 100)
+        assert priced.subtotal == 26500
+
+    def test_spend_tier_applies_after_line_discounts(self):
+        engine = PricingEngine([SpendTiers(((Decimal("100.00"), Decimal("5")),)), PercentOff(Decimal("10"))])
+        assert engine.price([("a", 11000, 1)]).order_discount == 0  # 99.00 after 10% off
+        assert engine.price([("a", 12000, 1)]).order_discount == 540
+
+    def test_highest_tier_reached(self):
+        engine = PricingEngine([SpendTiers(((Decimal("250.00"), Decimal("10")), (Decimal("100.00"), Decimal("5"))))])
+        assert engine.price([("a", 9999, 1)]).order_discount == 0
+        assert engine.price([("a", 10000, 1)]).order_discount == 500
+        assert engine.price([("a", 30000, 1)]).order_discount == 3000
+
+    def test_free_shipping_threshold_and_tax(self):
+        engine = PricingEngine(RULES[-2:])
+        below = engine.price([("a", 7499, 1)], "CA")
+        assert below.shipping == 699
+        assert below.tax == percent_of(7499 + 699, 72500)
+        assert below.total == 7499 + 699 + below.tax
+
+        above = engine.price([("a", 7500, 1)], "TX")
+        assert above.shipping == 0
+        assert above.tax == percent_of(7500, 55000)
+
+    def test_untaxed_shipping(self):
+        engine = PricingEngine([FreeShipping(Decimal("50"), Decimal("5")), RegionalTax((("CA", Decimal("10")),), shipping_taxable=False)])
+        assert engine.price([("a", 1000, 1)], "CA").tax == 100
+
+    def test_empty_cart_costs_nothing(self):
+        priced = PricingEngine(RULES).price([], "CA")
+        assert priced.total == priced.shipping == priced.tax == 0
+
+    def test_unknown_rule_rejected(self):
+        with pytest.raises(TypeError):
+            PricingEngine([object()])
+
+    def test_cart_lines_from_response(self):
+        cart = CartResponse(
+            customer_id="c1",
+            items=[CartItemResponse(product_id="a", product_name="A", price=Decimal("2.50"), quantity=4, subtotal=Decimal("10.00"))],
+            total_items=4,
+            subtotal=Decimal("10.00")
+        )
+        assert cart_lines(cart) == [("a", 250, 4)]
+
+
+class TestBatch:
+    """Test vectorized repricing matches the per-cart engine"""
+
+    def test_batch_matches_scalar(self):
+        pytest.importorskip("numpy")
+        rng = random.Random(7)
+        products = ["shoes", "socks", "hat", "mug", "tee", "bag"]
+        carts = [
+            [(rng.choice(products), rng.randint(1, 40000), rng.randint(1, 7)) for _ in range(rng.randint(0, 6))]
+            for _ in range(2000)
+        ]
+        regions = [rng.choice(["CA", "OR", "NY", "TX", None]) for _ in carts]
+        engine = PricingEngine(RULES)
+
+        batch = engine.price_batch(carts, regions)
+        for i, (cart, region) in enumerate(zip(carts, regions)):
+            priced = engine.price(cart, region)
+            assert (batch.subtotal[i], batch.discount[i], batch.shipping[i], batch.tax[i], batch.total[i]) == (
+                priced.subtotal, priced.discount, priced.shipping, priced.tax, priced.total
+            ), cart
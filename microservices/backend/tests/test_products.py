@@ -0,0 +1,134 @@
+"""
+Test suite for the product listing API
+"""
+
+import pytest
+from decimal import Decimal
+
+from app.services.catalog_service import CatalogService, decode_cursor, encode_cursor, product_pages
+
+
+def make_products(count, category="shoes"):
+    return [
+        {
+            "id": f"{category}-{i:03d}",
+            "name": f"{category.title()} {i % 7}",
+            "category": category,
+            # Repeated prices so keyset ties on price are exercised
+            "price": f"{10 + i % 5}.00",
+        }
+        for i in range(count)
+    ]
+
+
+async def walk(api_client, **params):
+    """Follow next_cursor to the end; returns every product id seen, in order."""
+    ids, cursor = [], None
+    while True:
+        query = {**params, **({"cursor": cursor} if cursor else {})}
+        response = await api_client.get("/api/v1/products", params=query)
+        assert response.status_code == 200
+        body = response.json()
+        ids.extend(item["id"] for item in body["items"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+class TestProductListing:
+    """Test filtering, sorting and keyset pagination"""
+
+    @pytest.mark.asyncio
+    async def test_pages_cover_everything_once(self, api_client, db_session):
+        """Test walking the cursor visits every product once, in sort order, for each sort"""
+        products = make_products(23)
+        await CatalogService(db_session).upsert_products(products)
+        by_id = {p["id"]: p for p in products}
+
+        for sort, key, reverse in [
+            ("name", lambda p: (p["name"], p["id"]), False),
+            ("price_asc", lambda p: (Decimal(p["price"]), p["id"]), False),
+            ("price_desc", lambda p: (Decimal(p["price"]), p["id"]), True),
+        ]:
+            ids = await walk(api_client, sort=sort, limit=5)
+            assert ids == [p["id"] for p in sorted(by_id.values(), key=key, reverse=reverse)], sort
+
+    @pytest.mark.asyncio
+    async def test_filters(self, api_client, db_session):
+        """Test category and price range filters, and that inactive products are hidden"""
+        await CatalogService(db_session).upsert_products(
+            make_products(10, "shoes") + make_products(5, "hats")
+            + [{"id": "hats-old", "name": "Old", "category": "hats", "price": "11.00", "active": False}]
+        )
+
+        hats = await walk(api_client, category="hats", limit=2)
+        assert sorted(hats) == [f"hats-{i:03d}" for i in range(5)]
+
+        response = await api_client.get("/api/v1/products", params={
+            "min_price": "11", "max_price": "12.00", "sort": "price_asc", "limit": 100
+        })
+        prices = [Decimal(item["price"]) for item in response.json()["items"]]
+        assert prices and all(Decimal("11") <= price <= Decimal("12") for price in prices)
+        assert prices == sorted(prices)
+
+    @pytest.mark.asyncio
+    async def test_bad_cursor(self, api_client, db_session):
+        """Test garbage cursors and cursors from another sort are rejected"""
+        await CatalogService(db_session).upsert_products(make_products(3))
+
+        for cursor in ["garbage", encode_cursor("name", "Shoes 1", "shoes-001")]:
+            response = await api_client.get("/api/v1/products", params={"cursor": cursor, "sort": "price_asc"})
+            assert response.status_code == 400
+
+        with pytest.raises(ValueError, match="Invalid cursor"):
+            decode_cursor(encode_cursor("price_asc", "not-a-price", "x"), "price_asc")
+
+    @pytest.mark.asyncio
+    async def test_pages_are_cached_bytes_with_etag(self, api_client, db_session, assert_max_queries, pinned_price_cache):
+        """Test repeat pages cost no queries, 304 on If-None-Match, and change with the catalog"""
+        catalog = CatalogService(db_session)
+        await catalog.upsert_products(make_products(5))
+
+        first = await api_client.get("/api/v1/products")
+        assert first.headers["cache-control"].startswith("public, max-age=")
+        with assert_max_queries(0):
+            again = await api_client.get("/api/v1/products")
+        assert again.content == first.content
+
+        not_modified = await api_client.get("/api/v1/products", headers={"If-None-Match": first.headers["etag"]})
+        assert not_modified.status_code == 304
+
+        await catalog.upsert_products([{"id": "shoes-000", "name": "Renamed", "category": "shoes", "price": "99.00"}])
+        changed = await api_client.get("/api/v1/products", headers={"If-None-Match": first.headers["etag"]})
+        assert changed.status_code == 200
+        assert "Renamed" in changed.text
+
+    @pytest.mark.asyncio
+    async def test_not_modified_reads_no_products(self, api_client, db_session, assert_max_queries, pinned_price_cache):
+        """Test a matching If-None-Match is answered from the catalog version, even with the page evicted"""
+        await CatalogService(db_session).upsert_products(make_products(5))
+        first = await api_client.get("/api/v1/products", params={"sort": "price_asc"})
+        product_pages.clear()
+
+        with assert_max_queries(0):
+            not_modified = await api_client.get(
+                "/api/v1/products", params={"sort": "price_asc"}, headers={"If-None-Match": first.headers["etag"]}
+            )
+        assert not_modified.status_code == 304
+        assert not_modified.headers["etag"] == first.headers["etag"]
+
+    @pytest.mark.asyncio
+    async def test_deep_pages_cost_the_same(self, db_session, assert_max_queries):
+        """Test a page deep in the listing is still a single bounded query"""
+        catalog = CatalogService(db_session)
+        await catalog.upsert_products(make_products(300))
+
+        cursor = None
+        for _ in range(20):
+            _, cursor = await catalog.list_products(sort="price_desc", limit=10, cursor=cursor)
+
+        with assert_max_queries(1) as statements:
+            rows, _ = await catalog.list_products(sort="price_desc", limit=10, cursor=cursor)
+        assert len(rows) == 10
+        # Seeks past the cursor instead of skipping rows
+        assert "(products.price, products.id) < (" in statements[0]
@@ -0,0 +1,138 @@
+"""
+Test suite for product search
+"""
+
+import pytest
+import threading
+from sqlalchemy.dialects import postgresql
+
+from app.services.catalog_service import CatalogService
+from app.services.search_service import InvertedIndex, SearchService, prefix_tsquery
+
+
+def build_index():
+    index = InvertedIndex()
+    index.add("p1", "Running Sneaker", "shoes", "Lightweight trainer for road running")
+    index.add("p2", "Leather Boot", "shoes", "Waterproof boot")
+    index.add("p3", "Wool Beanie", "hats", "Warm knit hat, pairs with any sneaker")
+    return index
+
+
+class TestInvertedIndex:
+    """Test the in-process index used without Postgres"""
+
+    def test_exact_prefix_and_typo(self):
+        """Test terms match exactly, as prefixes, and with small typos"""
+        index = build_index()
+        assert index.search("boot") == ["p2"]
+        assert index.search("snea") == ["p1", "p3"]
+        assert index.search("sneakr") == ["p1", "p3"]
+        assert index.search("xyzzy") == []
+
+    def test_all_terms_must_match(self):
+        """Test multi-word queries intersect"""
+        index = build_index()
+        assert index.search("sneaker warm") == ["p3"]
+        assert index.search("boot sneaker") == []
+
+    def test_name_matches_rank_first(self):
+        """Test a match in the name outranks one in the description"""
+        assert build_index().search("sneaker") == ["p1", "p3"]
+        assert build_index().search("shoes")[:2] == ["p1", "p2"]
+
+    def test_updates_are_incremental(self):
+        """Test re-indexing and removing a product drops its old tokens"""
+        index = build_index()
+        index.add("p2", "Rain Boot", "shoes")
+        assert index.search("leather") == []
+        assert index.search("rain") == ["p2"]
+
+        index.remove("p2")
+        assert index.search("boot") == []
+        assert "rain" not in index._postings
+        assert "rain" not in index._vocabulary
+        assert len(index) == 2
+
+
+class TestSearchService:
+    """Test search against the catalog"""
+
+    @pytest.mark.asyncio
+    async def test_index_follows_catalog_changes(self, db_session, assert_max_queries):
+        """Test the index picks up only changed products on sync"""
+        catalog = CatalogService(db_session)
+        await catalog.upsert_products([
+            {"id": f"p{i}", "name": f"Plain Tee {i}", "category": "shirts", "price": "9.99"} for i in range(10)
+        ])
+        search = SearchService(db_session, InvertedIndex(check_interval=0))
+        assert len(await search.search("tee", limit=50)) == 10
+
+        await catalog.upsert_products([
+            {"id": "p3", "name": "Striped Polo", "category": "shirts", "price": "19.99"},
+            {"id": "p4", "name": "Plain Tee 4", "category": "shirts", "price": "9.99", "active": False},
+        ])
+        with assert_max_queries(3) as statements:
+            results = await search.search("polo")
+        assert "products.version >" in statements[1]
+        assert [row.id for row in results] == ["p3"]
+        assert {row.id for row in await search.search("tee", limit=50)} == {f"p{i}" for i in range(10)} - {"p3", "p4"}
+
+    @pytest.mark.asyncio
+    async def test_rebuild_happens_off_the_event_loop(self, db_session, monkeypatch):
+        """Test a full build runs in a worker thread and is swapped in only once complete"""
+        catalog = CatalogService(db_session)
+        await catalog.upsert_products([{"id": "a", "name": "Canvas Tote", "price": "15.00"}])
+        index = InvertedIndex(check_interval=3600)
+        await index.sync(db_session)
+
+        builds = []
+        apply = InvertedIndex._apply
+
+        def recording_apply(built, rows):
+            builds.append(threading.get_ident())
+            apply(built, rows)
+            assert index.search("tote") == ["a"] and index.search("wallet") == []
+
+        monkeypatch.setattr(InvertedIndex, "_apply", recording_apply)
+        await catalog.upsert_products([{"id": "b", "name": "Leather Wallet", "price": "30.00"}])
+        index.version = 99  # as if the catalog was reset under it, forcing a full rebuild
+        await index.sync(db_session, fresh=True)
+
+        assert builds and builds[0] != threading.get_ident()
+        assert index.search("wallet") == ["b"]
+        assert index.version == 2
+
+    @pytest.mark.asyncio
+    async def test_search_route(self, api_client, db_session):
+        """Test the search endpoint returns ranked products"""
+        await CatalogService(db_session).upsert_products([
+            {"id": "a", "name": "Canvas Tote", "category": "bags", "price": "15.00"},
+            {"id": "b", "name": "Leather Wallet", "category": "bags", "description": "Fits in any tote", "price": "30.00"},
+        ])
+
+        response = await api_client.get("/api/v1/products/search", params={"q": "tote"})
+        assert response.status_code == 200
+        assert [item["id"] for item in response.json()["items"]] == ["a", "b"]
+
+        assert (await api_client.get("/api/v1/products/search")).status_code == 422
+
+    def test_postgres_query_uses_tsvector(self):
+        """Test the Postgres path is a ranked tsquery match with a prefix on the last term"""
+        assert prefix_tsquery("Red  running-shoe") == "red & running & shoe:*"
+        assert prefix_tsquery("!!") is None
+
+        sql = str(SearchService.postgres_query("red & shoe:*", 20).compile(dialect=postgresql.dialect()))
+        assert "@@ to_tsquery(" in sql
+        assert "setweight(to_tsvector(" in sql
+        assert "ts_rank(" in sql
+
+    def test_postgres_query_matches_the_index_expression(self):
+        """Test the constants are inlined, as in idx_products_search, so the planner can use it"""
+        query = SearchService.postgres_query("red & shoe:*", 20)
+        sql = str(query.compile(dialect=postgresql.dialect()))
+        assert (
+            "setweight(to_tsvector('english', coalesce(products.name, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(products.category, '')), 'B')"
+        ) in sql
+        assert "to_tsquery('english', %(to_tsquery_1)s)" in sql
+        assert "red & shoe:*" in query.compile(dialect=postgresql.dialect()).params.values()
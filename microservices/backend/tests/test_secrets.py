@@ -0,0 +1,178 @@
+"""
+Test suite for lazy, cached database credential loading
+"""
+
+import json
+import pytest
+import threading
+import time
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+from app.config import database, secrets
+from app.config.database import _inject_cached_credentials
+from app.config.secrets import (
+    CachedCredentials,
+    DatabaseCredentials,
+    EnvCredentialProvider,
+    FileCredentialProvider,
+    SecretsManagerCredentialProvider,
+)
+from app.main import app
+from conftest import FakeClock
+
+
+class FakeProvider:
+    """Credential provider that records how often it is called"""
+
+    def __init__(self, password="first"):
+        self.password = password
+        self.calls = 0
+        self.fail = False
+
+    def fetch(self):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("provider unavailable")
+        return DatabaseCredentials(username="cartadmin", password=self.password)
+
+
+class TestCredentialProviders:
+    """Test the individual credential sources"""
+
+    def test_env_provider(self):
+        """Test reading credentials from a JSON environment variable"""
+        with patch.dict("os.environ", {"DATABASE_CREDENTIALS": '{"username": "u", "password": "p"}'}):
+            assert EnvCredentialProvider().fetch() == DatabaseCredentials("u", "p")
+
+    def test_file_provider(self, tmp_path):
+        """Test reading credentials from a mounted secret file"""
+        path = tmp_path / "db.json"
+        path.write_text(json.dumps({"username": "file-user", "password": "file-pass"}))
+        assert FileCredentialProvider(str(path)).fetch() == DatabaseCredentials("file-user", "file-pass")
+
+    @patch("boto3.Session")
+    def test_secrets_manager_client_is_created_once(self, mock_session):
+        """Test that the boto3 client is built lazily and reused"""
+        client = mock_session.return_value.client.return_value
+        client.get_secret_value.return_value = {"SecretString": '{"username": "sm", "password": "pw"}'}
+
+        provider = SecretsManagerCredentialProvider("secret-arn", "us-east-1")
+        assert mock_session.call_count == 0
+        provider.fetch()
+        provider.fetch()
+
+        assert mock_session.call_count == 1
+        client.get_secret_value.assert_called_with(SecretId="secret-arn")
+
+
+class TestCachedCredentials:
+    """Test caching, expiry and rotation"""
+
+    def test_fetches_once_within_ttl(self):
+        """Test that repeated reads are served from cache"""
+        provider, clock = FakeProvider(), FakeClock()
+        cache = CachedCredentials(provider, ttl=60, clock=clock)
+        assert provider.calls == 0  # nothing happens until first use
+
+        cache.get()
+        clock.now = 59
+        cache.get()
+        assert provider.calls == 1
+
+        clock.now = 61
+        cache.get()
+        assert provider.calls == 2
+
+    def test_serves_stale_value_when_refresh_fails(self):
+        """Test that a provider outage does not drop cached credentials"""
+        provider, clock = FakeProvider(), FakeClock()
+        cache = CachedCredentials(provider, ttl=60, clock=clock)
+        cache.get()
+
+        provider.fail = True
+        clock.now = 120
+        assert cache.get().password == "first"
+
+    def test_first_fetch_failure_raises(self):
+        """Test that there is no silent default inside the cache itself"""
+        provider = FakeProvider()
+        provider.fail = True
+        with pytest.raises(RuntimeError):
+            CachedCredentials(provider).get()
+
+    def test_background_refresh_picks_up_rotation(self):
+        """Test that a rotated password is seen without waiting for expiry"""
+        provider = FakeProvider()
+        cache = CachedCredentials(provider, ttl=3600)
+        assert cache.get().password == "first"
+
+        provider.password = "rotated"
+        cache.start_background_refresh(interval=0.01)
+        try:
+            deadline = time.monotonic() + 2
+            while cache.get().password != "rotated" and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            cache.stop_background_refresh()
+        assert cache.get().password == "rotated"
+
+    def test_module_fallback_for_local_development(self):
+        """Test that unreachable providers fall back to local defaults"""
+        failing = FakeProvider()
+        failing.fail = True
+        with patch.object(secrets, "_database_credentials", CachedCredentials(failing)):
+            assert secrets.get_database_credentials() == DatabaseCredentials("cartadmin", "password")
+
+
+class TestStartupLoading:
+    """Test credentials are fetched off the event loop and connects only read the cache"""
+
+    @pytest.mark.asyncio
+    async def test_load_fetches_in_a_worker_thread(self):
+        """Test the startup load runs the provider outside the event loop's thread"""
+        threads = []
+
+        class ThreadRecordingProvider(FakeProvider):
+            def fetch(self):
+                threads.append(threading.get_ident())
+                return super().fetch()
+
+        with patch.object(secrets, "_database_credentials", CachedCredentials(ThreadRecordingProvider())):
+            assert (await secrets.load_database_credentials()).password == "first"
+        assert threads and threads[0] != threading.get_ident()
+
+    def test_connect_reads_cache_only(self):
+        """Test the async engine's connect hook never calls the provider"""
+        provider, clock = FakeProvider(), FakeClock()
+        cache = CachedCredentials(provider, ttl=60, clock=clock)
+        with patch.object(secrets, "_database_credentials", cache):
+            cache.get()
+            clock.now = 120  # expired: the background refresh, not the connect, renews it
+            params = {}
+            _inject_cached_credentials(None, None, [], params)
+            assert params == {"user": "cartadmin", "password": "first"}
+            assert provider.calls == 1
+
+    def test_failed_load_falls_back_to_local_defaults(self):
+        provider = FakeProvider()
+        provider.fail = True
+        with patch.object(secrets, "_database_credentials", CachedCredentials(provider)):
+            assert secrets.get_database_credentials() == DatabaseCredentials("cartadmin", "password")
+            assert secrets.cached_database_credentials() == DatabaseCredentials("cartadmin", "password")
+            assert provider.calls == 1
+
+    def test_app_startup_loads_credentials(self):
+        """Test the app loads secret-backed credentials before serving, so the first connect finds them"""
+        provider = FakeProvider()
+        with patch.object(database, "USES_SECRET_CREDENTIALS", True), \
+                patch.object(secrets, "_database_credentials", CachedCredentials(provider)):
+            with TestClient(app) as client:
+                assert client.get("/health").status_code == 200
+                assert secrets.cached_database_credentials().password == "first"
+        assert provider.calls == 1
+
+    def test_connect_before_load_is_an_error(self):
+        with patch.object(secrets, "_database_credentials", None):
+            with pytest.raises(RuntimeError, match="not loaded"):
+                secrets.cached_database_credentials()
@@ -53,31 +53,55 @@ def create_tables(engine):
     CREATE TABLE IF NOT EXISTS carts (
         id SERIAL PRIMARY KEY,
         customer_id VARCHAR(255) NOT NULL UNIQUE,
+        version INTEGER NOT NULL DEFAULT 1,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     );
     """
     
+    # Optimistic concurrency version for carts created before the column existed
+    cart_version_sql = """
+    ALTER TABLE carts ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+    """
+    
     cart_items_table_sql = """
     CREATE TABLE IF NOT EXISTS cart_items (
         id SERIAL PRIMARY KEY,
-        cart_id INTEGER REFERENCES carts(id) ON DELETE CASCADE,
+        customer_id VARCHAR(255) NOT NULL REFERENCES carts(customer_id) ON DELETE CASCADE,
         product_id VARCHAR(255) NOT NULL,
         product_name VARCHAR(255) NOT NULL,
-        price DECIMAL(10, 2) NOT NULL,
+        price BIGINT NOT NULL,
         quantity INTEGER NOT NULL DEFAULT 1,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        UNIQUE(cart_id, product_id)
+        CONSTRAINT uq_cart_items_customer_product UNIQUE (customer_id, product_id)
     );
     """
     
+    # Cart items created when they were keyed by cart_id; the add-item upsert targets
+    # uq_cart_items_customer_product, so backfill customer_id and add the constraint
+    cart_items_customer_sql = """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'cart_items' AND column_name = 'customer_id') THEN
+            ALTER TABLE cart_items ADD COLUMN customer_id VARCHAR(255) REFERENCES carts(customer_id) ON DELETE CASCADE;
+            UPDATE cart_items SET customer_id = carts.customer_id FROM carts WHERE carts.id = cart_items.cart_id;
+            DELETE FROM cart_items WHERE customer_id IS NULL;
+            ALTER TABLE cart_items ALTER COLUMN customer_id SET NOT NULL;
+        END IF;
+        IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uq_cart_items_customer_product') THEN
+            ALTER TABLE cart_items ADD CONSTRAINT uq_cart_items_customer_product UNIQUE (customer_id, product_id);
+        END IF;
+    END $$;
+    """
+    
     # Orders table for checkout functionality
     orders_table_sql = """
     CREATE TABLE IF NOT EXISTS orders (
         id SERIAL PRIMARY KEY,
         customer_id VARCHAR(255) NOT NULL,
-        total_amount DECIMAL(10, 2) NOT NULL,
+        total_amount BIGINT NOT NULL,
         status VARCHAR(50) DEFAULT 'pending',
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
@@ -90,8 +114,101 @@ def create_tables(engine):
         order_id INTEGER REFERENCES orders(id) ON DELETE CASCADE,
         product_id VARCHAR(255) NOT NULL,
         product_name VARCHAR(255) NOT NULL,
-        price DECIMAL(10, 2) NOT NULL,
+        price BIGINT NOT NULL,
+        quantity INTEGER NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """
+    
+    # Idempotency-Key records for retried mutations (expires_at is a Unix timestamp)
+    idempotency_keys_table_sql = """
+    CREATE TABLE IF NOT EXISTS idempotency_keys (
+        scope VARCHAR(50) NOT NULL,
+        key VARCHAR(255) NOT NULL,
+        request_hash VARCHAR(64) NOT NULL,
+        status_code INTEGER,
+        response_body BYTEA,
+        response_headers JSON,
+        expires_at DOUBLE PRECISION NOT NULL,
+        PRIMARY KEY (scope, key)
+    );
+    """
+    
+    # Checkout side effects queued in the order transaction (available_at is a Unix timestamp)
+    outbox_events_table_sql = """
+    CREATE TABLE IF NOT EXISTS outbox_events (
+        id SERIAL PRIMARY KEY,
+        event_type VARCHAR(100) NOT NULL,
+        aggregate_id VARCHAR(255) NOT NULL,
+        payload JSON NOT NULL,
+        status VARCHAR(20) NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        available_at DOUBLE PRECISION NOT NULL,
+        last_error TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """
+    
+    # Product catalog: the server-side source of cart names and prices.
+    # version is the catalog_version value at which the row last changed
+    products_table_sql = """
+    CREATE TABLE IF NOT EXISTS products (
+        id VARCHAR(255) PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        description TEXT,
+        category VARCHAR(100),
+        price BIGINT NOT NULL,
+        image_url VARCHAR(500),
+        active BOOLEAN NOT NULL DEFAULT TRUE,
+        version INTEGER NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """
+    
+    # Single-row counter bumped by every catalog write (price cache invalidation)
+    catalog_version_table_sql = """
+    CREATE TABLE IF NOT EXISTS catalog_version (
+        id INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    );
+    """
+    
+    # Money columns hold integer cents; convert tables created when they were DECIMAL(10, 2)
+    money_columns = [
+        ("cart_items", "price"),
+        ("orders", "total_amount"),
+        ("order_items", "price"),
+        ("products", "price"),
+    ]
+    money_to_cents_sql = """
+    DO $$
+    BEGIN
+        IF (SELECT data_type FROM information_schema.columns
+            WHERE table_name = '{table}' AND column_name = '{column}') = 'numeric' THEN
+            ALTER TABLE {table} ALTER COLUMN {column} TYPE BIGINT USING ROUND({column} * 100)::BIGINT;
+        END IF;
+    END $$;
+    """
+    
+    # Stock per product; products without a row are not stock-tracked
+    inventory_table_sql = """
+    CREATE TABLE IF NOT EXISTS inventory (
+        product_id VARCHAR(255) PRIMARY KEY,
+        available INTEGER NOT NULL DEFAULT 0 CHECK (available >= 0),
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """
+    
+    # Stock held for orders at checkout (expires_at is a Unix timestamp)
+    inventory_reservations_table_sql = """
+    CREATE TABLE IF NOT EXISTS inventory_reservations (
+        id SERIAL PRIMARY KEY,
+        order_id INTEGER NOT NULL REFERENCES orders(id) ON DELETE CASCADE,
+        product_id VARCHAR(255) NOT NULL,
         quantity INTEGER NOT NULL,
+        status VARCHAR(20) NOT NULL DEFAULT 'held',
+        expires_at DOUBLE PRECISION NOT NULL,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     );
     """
@@ -99,11 +216,24 @@ def create_tables(engine):
     # Create indexes
     indexes_sql = [
         "CREATE INDEX IF NOT EXISTS idx_carts_customer_id ON carts(customer_id);",
-        "CREATE INDEX IF NOT EXISTS idx_cart_items_cart_id ON cart_items(cart_id);",
         "CREATE INDEX IF NOT EXISTS idx_cart_items_product_id ON cart_items(product_id);",
         "CREATE INDEX IF NOT EXISTS idx_orders_customer_id ON orders(customer_id);",
         "CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status);",
-        "CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items(order_id);"
+        "CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items(order_id);",
+        "CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires_at ON idempotency_keys(expires_at);",
+        "CREATE INDEX IF NOT EXISTS idx_outbox_events_status_available_at ON outbox_events(status, available_at);",
+        "CREATE INDEX IF NOT EXISTS idx_products_name_id ON products(name, id);",
+        "CREATE INDEX IF NOT EXISTS idx_products_price_id ON products(price, id);",
+        "CREATE INDEX IF NOT EXISTS idx_products_category_name_id ON products(category, name, id);",
+        "CREATE INDEX IF NOT EXISTS idx_products_category_price_id ON products(category, price, id);",
+        # Full-text search; the expression must match search_document() in the backend's search_service
+        "CREATE INDEX IF NOT EXISTS idx_products_search ON products USING GIN (("
+        "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(category, '')), 'B') || "
+        "setweight(to_tsvector('english', coalesce(description, '')), 'C')));",
+        "CREATE INDEX IF NOT EXISTS idx_products_version ON products(version);",
+        "CREATE INDEX IF NOT EXISTS idx_inventory_reservations_order_id ON inventory_reservations(order_id);",
+        "CREATE INDEX IF NOT EXISTS idx_inventory_reservations_status_expires_at ON inventory_reservations(status, expires_at);"
     ]
     
     # Update triggers for timestamps
@@ -130,14 +260,34 @@ def create_tables(engine):
     CREATE TRIGGER update_orders_updated_at 
         BEFORE UPDATE ON orders 
         FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+    
+    DROP TRIGGER IF EXISTS update_products_updated_at ON products;
+    CREATE TRIGGER update_products_updated_at 
+        BEFORE UPDATE ON products 
+        FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+    
+    DROP TRIGGER IF EXISTS update_inventory_updated_at ON inventory;
+    CREATE TRIGGER update_inventory_updated_at 
+        BEFORE UPDATE ON inventory 
+        FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
     """
     
     with engine.connect() as conn:
         # Create tables
         conn.execute(text(cart_table_sql))
+        conn.execute(text(cart_version_sql))
         conn.execute(text(cart_items_table_sql))
+        conn.execute(text(cart_items_customer_sql))
         conn.execute(text(orders_table_sql))
         conn.execute(text(order_items_table_sql))
+        conn.execute(text(idempotency_keys_table_sql))
+        conn.execute(text(outbox_events_table_sql))
+        conn.execute(text(products_table_sql))
+        conn.execute(text(catalog_version_table_sql))
+        conn.execute(text(inventory_table_sql))
+        conn.execute(text(inventory_reservations_table_sql))
+        for table, column in money_columns:
+            conn.execute(text(money_to_cents_sql.format(table=table, column=column)))
         
         # Create indexes
         for index_sql in indexes_sql: